@@ -0,0 +1,18 @@
+-- Generated from database.dbml by data/schema.py. Do not edit.
+-- dbml sha256: 8edb5c2bc89354ba23a0fd99a8359c12b641fb29a3249a57eb776a1a13f5ba2f, version: 1
+
+CREATE TABLE "posture" (
+  "id" INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE,
+  "user_id" INTEGER,
+  -- Proportion of frames where the user is aligned and posture is good. 
+  "prop_good" REAL,
+  -- Proportion of frames the user is aligned
+  "prop_in_frame" REAL,
+  "period_start" TIMESTAMP,
+  "period_end" TIMESTAMP,
+  FOREIGN KEY ("user_id") REFERENCES "user" ("id")
+);
+
+CREATE TABLE "user" (
+  "id" INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE
+);
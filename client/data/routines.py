@@ -2,16 +2,17 @@
 Module for interacting with SQLite database
 """
 
+import os
 import sqlite3
 from datetime import datetime
 from importlib import resources
 from typing import Any, Iterator, NamedTuple, Optional
 
 import numpy as np
-from pydbml import PyDBML
+
+from data.schema import migrate
 
 RESOURCES = resources.files("data.resources")
-DATABASE_DEFINITION = RESOURCES.joinpath("database.dbml")
 DATABASE_RESOURCE = RESOURCES.joinpath("database.db")
 FACES_FOLDER = RESOURCES.joinpath("faces")
 
@@ -49,23 +50,34 @@ class Posture(NamedTuple):
 
 def init_database() -> None:
     """
-    Initialise SQLite database if it does not already exist
-    When the database does not exist, expect this operation to take
-    approximately one minute on the Raspberry Pi.
+    Initialise SQLite database if it does not already exist, and bring its schema up to date if
+    it does. See data/schema.py.
     """
-    # Check if database exists
-    with resources.as_file(DATABASE_RESOURCE) as database_file:
-        if database_file.is_file():
-            return
+    with _connect() as connection:
+        migrate(connection)
 
-    parsed = PyDBML(DATABASE_DEFINITION)
-    init_script = parsed.sql
 
-    # Run init script
+def reset_database() -> None:
+    """Delete every record in the database, in a single transaction. Ids start again from 1.
+    Much faster than destroying and re-initialising the database.
+    """
     with _connect() as connection:
-        cursor = connection.cursor()
-        cursor.executescript(init_script)
-        connection.commit()
+        result = connection.execute(
+            "SELECT name FROM sqlite_schema WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )
+        script = "".join(f'DELETE FROM "{name}";\n' for (name,) in result.fetchall())
+
+        result = connection.execute(
+            "SELECT COUNT(*) FROM sqlite_schema WHERE name = 'sqlite_sequence'"
+        )
+        if result.fetchone()[0] != 0:
+            script += "DELETE FROM sqlite_sequence;\n"
+
+        try:
+            connection.executescript(f"BEGIN;\n{script}COMMIT;")
+        except sqlite3.Error:
+            connection.rollback()
+            raise
 
 
 def destroy_database() -> None:
@@ -208,6 +220,21 @@ def register_face_embeddings(user_id: int, face_embeddings: list[np.ndarray]) ->
         np.save(embedding_path, stacked_faces)
 
 
+def update_face_embeddings(user_id: int, face_embeddings: np.ndarray) -> None:
+    """Replace a registered user's face embeddings. The new file is written alongside the old one
+    and then swapped in, so the user's registration survives a crash part way through.
+
+    Args:
+        user_id: The user to update faces for.
+        face_embeddings: Face embeddings in the shape (N, D).
+    """
+    with resources.as_file(FACES_FOLDER) as faces_folder:
+        temporary_path = faces_folder / f"{user_id}.npy.tmp"
+        with open(temporary_path, "wb") as file:
+            np.save(file, face_embeddings)
+        os.replace(temporary_path, faces_folder / f"{user_id}.npy")
+
+
 def reset_registered_face_embeddings() -> None:
     """Clear all registered user faces."""
     with resources.as_file(FACES_FOLDER) as faces_folder:
@@ -215,6 +242,15 @@ def reset_registered_face_embeddings() -> None:
             user_embeddings_path.unlink()
 
 
+def face_embeddings_version() -> int:
+    """
+    Returns:
+        Number which changes whenever face embeddings are registered or reset.
+    """
+    with resources.as_file(FACES_FOLDER) as faces_folder:
+        return faces_folder.stat().st_mtime_ns
+
+
 def iter_face_embeddings() -> Iterator[tuple[int, list[np.ndarray]]]:
     """
     Returns:
@@ -223,7 +259,7 @@ def iter_face_embeddings() -> Iterator[tuple[int, list[np.ndarray]]]:
             embedded face for the user.
     """
     with resources.as_file(FACES_FOLDER) as faces_folder:
-        for user_embeddings_path in faces_folder.iterdir():
+        for user_embeddings_path in faces_folder.glob("*.npy"):
             user_id = int(user_embeddings_path.stem)
             yield user_id, list(np.load(user_embeddings_path))
 
@@ -0,0 +1,147 @@
+"""
+Database schema management.
+
+The schema is defined in database.dbml. Parsing DBML takes around a minute on the Raspberry Pi,
+so the SQL for it is generated ahead of time into schema.sql, tagged with the hash of the DBML
+it came from. If database.dbml is edited without regenerating, schema.sql is regenerated the next
+time a database is created.
+
+Databases record their schema version in `PRAGMA user_version`. Changes to the schema after
+release go in MIGRATIONS (and in database.dbml), so existing databases are upgraded in place.
+
+Regenerate schema.sql with:
+```bash
+python -m data.schema
+```
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+from importlib import resources
+from typing import NamedTuple
+
+RESOURCES = resources.files("data.resources")
+DATABASE_DEFINITION = RESOURCES.joinpath("database.dbml")
+SCHEMA_SQL = RESOURCES.joinpath("schema.sql")
+
+#: Incremental schema changes. MIGRATIONS[i] upgrades a database from version i + 1 to i + 2.
+#: Version 1 is the schema from before migrations were introduced.
+MIGRATIONS: tuple[str, ...] = ()
+#: Schema version of a fully migrated database.
+SCHEMA_VERSION = 1 + len(MIGRATIONS)
+
+_HEADER = "-- Generated from database.dbml by data/schema.py. Do not edit.\n"
+_HEADER_PATTERN = re.compile(r"^-- dbml sha256: ([0-9a-f]{64}), version: (\d+)$", re.M)
+
+logger = logging.getLogger(__name__)
+
+
+class GeneratedSchema(NamedTuple):
+    """SQL generated from database.dbml.
+
+    Attributes:
+        sql: Script creating every table.
+        dbml_hash: SHA-256 of the database.dbml the script was generated from.
+        version: Schema version the script creates.
+    """
+
+    sql: str
+    dbml_hash: str
+    version: int
+
+
+def dbml_hash() -> str:
+    """
+    Returns:
+        SHA-256 of database.dbml, as hex.
+    """
+    return hashlib.sha256(DATABASE_DEFINITION.read_bytes()).hexdigest()
+
+
+def generate_schema() -> GeneratedSchema:
+    """Parse database.dbml into SQL and save it to schema.sql. This is slow.
+
+    Returns:
+        The generated schema.
+    """
+    from pydbml import PyDBML
+
+    schema = GeneratedSchema(
+        PyDBML(DATABASE_DEFINITION).sql, dbml_hash(), SCHEMA_VERSION
+    )
+    header = (
+        f"{_HEADER}-- dbml sha256: {schema.dbml_hash}, version: {schema.version}\n\n"
+    )
+    with resources.as_file(SCHEMA_SQL) as schema_file:
+        schema_file.write_text(header + schema.sql + "\n")
+    return schema
+
+
+def load_schema() -> GeneratedSchema:
+    """Load schema.sql, regenerating it if database.dbml has changed since it was generated.
+
+    Returns:
+        The schema.
+    """
+    if SCHEMA_SQL.is_file():
+        sql = SCHEMA_SQL.read_text()
+        match = _HEADER_PATTERN.search(sql)
+        if match is not None and match.group(1) == dbml_hash():
+            return GeneratedSchema(sql, match.group(1), int(match.group(2)))
+
+    logger.warning("schema.sql is out of date with database.dbml, regenerating")
+    return generate_schema()
+
+
+def migrate(connection: sqlite3.Connection) -> int:
+    """Create the schema in an empty database, or bring an existing database up to
+    SCHEMA_VERSION. Each step runs in its own transaction.
+
+    Args:
+        connection: Connection to the database.
+
+    Returns:
+        Number of steps applied.
+    """
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    if version == 0:
+        tables = connection.execute(
+            "SELECT COUNT(*) FROM sqlite_schema WHERE type = 'table'"
+        ).fetchone()[0]
+        if tables == 0:
+            schema = load_schema()
+            _apply(connection, schema.sql, schema.version)
+            version = schema.version
+            applied = 1
+        else:
+            # Created before schema versions were recorded
+            version = 1
+            applied = 0
+    else:
+        applied = 0
+
+    for migration in MIGRATIONS[version - 1 :]:
+        version += 1
+        _apply(connection, migration, version)
+        applied += 1
+
+    return applied
+
+
+def _apply(connection: sqlite3.Connection, script: str, version: int) -> None:
+    try:
+        connection.executescript(
+            f"BEGIN;\n{script}\nPRAGMA user_version = {int(version)};\nCOMMIT;"
+        )
+    except sqlite3.Error:
+        connection.rollback()
+        raise
+    logger.debug("Database schema now at version %d", version)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    generated = generate_schema()
+    logger.info("Wrote schema.sql for version %d", generated.version)
@@ -0,0 +1,96 @@
+"""
+Negotiation of the camera overlord's capture rate and resolution.
+
+Each consumer of camera frames (posture tracking, login bursts) writes a small request file
+saying how many frames per second it wants and at what size. The camera overlord captures at the
+highest rate and largest size currently requested, and almost stops when there are no requests.
+
+Requests are leases: they expire unless renewed, so a consumer that crashes doesn't keep the
+camera running forever. Only the standard library is used, as the camera overlord runs under a
+different Python to the rest of the client.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+#: Directory of request files. On tmpfs, so requests don't wear the SD card.
+DEMAND_DIR = Path("/tmp/camera_demand")
+#: Seconds a request lasts unless renewed.
+DEFAULT_LEASE = 10.0
+
+#: Width and height of frames, in pixels.
+FrameSize = tuple[int, int]
+
+
+class Demand(NamedTuple):
+    """What the camera overlord should capture.
+
+    Attributes:
+        fps: Highest requested frames per second, or 0 if nobody wants frames.
+        size: Largest requested frame size, or None if nobody wants frames.
+        consumers: Names of the consumers with live requests.
+    """
+
+    fps: float
+    size: Optional[FrameSize]
+    consumers: list[str]
+
+
+def request_capture(
+    name: str, fps: float, size: FrameSize, lease: float = DEFAULT_LEASE
+) -> None:
+    """Ask the camera overlord for frames, replacing any earlier request under the same name.
+
+    Args:
+        name: Name of the consumer.
+        fps: Frames per second wanted.
+        size: Frame size wanted.
+        lease: Seconds until the request expires, unless made again.
+    """
+    DEMAND_DIR.mkdir(exist_ok=True)
+    request = {"fps": fps, "size": list(size), "expires": time.time() + lease}
+    temporary_path = DEMAND_DIR / f"{name}.tmp"
+    temporary_path.write_text(json.dumps(request))
+    os.replace(temporary_path, DEMAND_DIR / f"{name}.json")
+
+
+def cancel_capture(name: str) -> None:
+    """Withdraw a request made with request_capture().
+
+    Args:
+        name: Name of the consumer.
+    """
+    (DEMAND_DIR / f"{name}.json").unlink(missing_ok=True)
+
+
+def read_demand() -> Demand:
+    """Combine the live requests. Expired requests are deleted.
+
+    Returns:
+        The highest rate and largest size requested.
+    """
+    fps = 0.0
+    size: Optional[FrameSize] = None
+    consumers = []
+    now = time.time()
+    for path in DEMAND_DIR.glob("*.json"):
+        try:
+            request = json.loads(path.read_text())
+        except (OSError, ValueError):
+            # Cancelled while being read
+            continue
+
+        if request["expires"] < now:
+            path.unlink(missing_ok=True)
+            continue
+
+        consumers.append(path.stem)
+        fps = max(fps, request["fps"])
+        width, height = request["size"]
+        if size is None or width * height > size[0] * size[1]:
+            size = (width, height)
+
+    return Demand(fps, size, sorted(consumers))
@@ -1,17 +1,76 @@
 """
-This script periodically takes photos and saves them to a temporary file on ram. This
-allows multiple programs to access the camera feed at once.
+This script takes photos and saves them to a temporary file on ram. This allows multiple programs
+to access the camera feed at once.
+
+Photos are only taken as often, and as large, as the programs reading them have asked for through
+drivers.camera_demand. While nobody has asked, a heartbeat photo is taken now and then so the
+snapshot never gets very stale, and the camera otherwise sits idle.
+
+There are two modes:
+    still: Each photo is a full still capture, saved as a JPEG to SNAPSHOT_PATH.
+    stream: The camera streams video with a main and a low resolution stream, and each frame is
+        published uncompressed to drivers.frame_stream.FRAME_PATH with its sensor timestamp.
+        Frames from the low resolution stream are published while nobody wants anything bigger,
+        and stay in YUV420 until a consumer reads them. This reaches much higher frame rates for
+        far less CPU per frame.
 
 Exits gracefully with status INTERRUPTED and closes the camera if a sigint is received.
 """
 
+import argparse
 import logging
 import os
+import shutil
 import signal
 import time
 from enum import Enum
+from typing import Any, Optional
+
+try:
+    from drivers.camera_demand import FrameSize, read_demand
+    from drivers.frame_stream import (
+        FORMAT_BGR,
+        FORMAT_YUV420,
+        FRAME_PATH,
+        FrameHeader,
+        publish_frame,
+    )
+except ImportError:
+    # Run as a script under the system Python, where the client package isn't installed
+    from camera_demand import FrameSize, read_demand
+    from frame_stream import (
+        FORMAT_BGR,
+        FORMAT_YUV420,
+        FRAME_PATH,
+        FrameHeader,
+        publish_frame,
+    )
+
+#: File consumers read the latest photo from, in still mode.
+SNAPSHOT_PATH = "/tmp/snapshot.jpg"
+#: File a photo is copied to every BIG_BROTHER_INTERVAL seconds.
+BIG_BROTHER_PATH = "/tmp/big_brother.jpg"
+#: Frame size used until someone asks for one, and the main stream's size in stream mode.
+DEFAULT_SIZE = (640, 480)
+#: Size of the low resolution stream in stream mode. The width is a multiple of 64, so the
+#: stream's rows have no padding.
+LORES_SIZE = (320, 240)
+#: Seconds between checks for requests while nobody wants photos.
+IDLE_POLL = 0.25
+#: Seconds between photos while nobody wants them.
+HEARTBEAT_INTERVAL = 10.0
+#: In stream mode, seconds the camera keeps running after the last request lapses, so a
+#: consumer renewing its lease a little late doesn't stop and restart it.
+STOP_GRACE = 10.0
+#: Minimum seconds between copies of the snapshot to BIG_BROTHER_PATH.
+BIG_BROTHER_INTERVAL = 3.5
+#: JPEG quality of the photos.
+JPEG_QUALITY = 80
 
-from picamera2 import Picamera2
+#: Full still captures saved as JPEGs.
+STILL_MODE = "still"
+#: Video streaming with raw frames published.
+STREAM_MODE = "stream"
 
 
 class ExitCode(Enum):
@@ -27,31 +86,168 @@ def handle_quit(signo, frame):
     quit(ExitCode.INTERRUPTED.value)
 
 
+def configure(camera: Any, size: FrameSize) -> None:
+    """(Re)start the camera taking still photos of the given size.
+
+    Args:
+        camera: Picamera2, or a stand-in such as drivers.simulation.SimulatedPicamera2.
+        size: Width and height of the photos.
+    """
+    logger.info("Capturing stills at %dx%d", *size)
+    camera.stop()
+    camera.configure(camera.create_still_configuration({"size": size}))
+    camera.start()
+
+
+def capture_forever(camera: Any, frames: Optional[int] = None) -> None:
+    """Take still photos at the rate and size asked for, until interrupted.
+
+    Args:
+        camera: Picamera2, or a stand-in such as drivers.simulation.SimulatedPicamera2.
+        frames: Stop after this many photos. Runs forever if None.
+    """
+    configured: Optional[FrameSize] = None
+    next_heartbeat = 0.0
+    next_big_brother = 0.0
+    consumers: list[str] = []
+    captured = 0
+
+    while frames is None or captured < frames:
+        start = time.monotonic()
+        demand = read_demand()
+        if demand.consumers != consumers:
+            consumers = demand.consumers
+            logger.info("Consumers: %s, %.1f fps", consumers, demand.fps)
+
+        if demand.fps == 0 and start < next_heartbeat:
+            time.sleep(IDLE_POLL)
+            continue
+
+        size = demand.size or configured or DEFAULT_SIZE
+        if size != configured:
+            configure(camera, size)
+            configured = size
+
+        camera.capture_file("/tmp/snapshot2.jpg")
+        captured += 1
+        if start >= next_big_brother:
+            shutil.copyfile("/tmp/snapshot2.jpg", "/tmp/snapshot3.jpg")
+            os.replace("/tmp/snapshot3.jpg", BIG_BROTHER_PATH)
+            next_big_brother = start + BIG_BROTHER_INTERVAL
+        os.replace("/tmp/snapshot2.jpg", SNAPSHOT_PATH)
+
+        if demand.fps == 0:
+            next_heartbeat = start + HEARTBEAT_INTERVAL
+        else:
+            time.sleep(max(0.0, start + 1 / demand.fps - time.monotonic()))
+
+
+def stream_forever(camera: Any, frames: Optional[int] = None) -> None:
+    """Stream video, publishing frames at the rate and size asked for, until interrupted. The
+    camera is stopped once nobody has wanted frames for STOP_GRACE seconds, apart from heartbeats.
+
+    Args:
+        camera: Picamera2, or a stand-in such as drivers.simulation.SimulatedPicamera2.
+        frames: Stop after publishing this many frames. Runs forever if None.
+    """
+    logger.info("Streaming with main %dx%d, lores %dx%d", *DEFAULT_SIZE, *LORES_SIZE)
+    camera.configure(
+        camera.create_video_configuration(
+            main={"size": DEFAULT_SIZE, "format": "RGB888"},
+            lores={"size": LORES_SIZE, "format": "YUV420"},
+        )
+    )
+    running = False
+    next_heartbeat = 0.0
+    next_big_brother = 0.0
+    last_wanted = float("-inf")
+    consumers: list[str] = []
+    published = 0
+
+    while frames is None or published < frames:
+        start = time.monotonic()
+        demand = read_demand()
+        if demand.consumers != consumers:
+            consumers = demand.consumers
+            logger.info("Consumers: %s, %.1f fps", consumers, demand.fps)
+        if demand.fps > 0:
+            last_wanted = start
+
+        if demand.fps == 0 and start < next_heartbeat:
+            if running and start >= last_wanted + STOP_GRACE:
+                camera.stop()
+                running = False
+            time.sleep(IDLE_POLL)
+            continue
+
+        if not running:
+            camera.start()
+            running = True
+
+        request = camera.capture_request()
+        try:
+            _publish(request, demand.size)
+            if start >= next_big_brother:
+                request.save("main", "/tmp/snapshot3.jpg")
+                os.replace("/tmp/snapshot3.jpg", BIG_BROTHER_PATH)
+                next_big_brother = start + BIG_BROTHER_INTERVAL
+        finally:
+            request.release()
+        published += 1
+
+        if demand.fps == 0:
+            next_heartbeat = start + HEARTBEAT_INTERVAL
+        else:
+            time.sleep(max(0.0, start + 1 / demand.fps - time.monotonic()))
+
+    if running:
+        camera.stop()
+
+
+def _publish(request: Any, size: Optional[FrameSize]) -> None:
+    timestamp = request.get_metadata()["SensorTimestamp"]
+    if size is None or (size[0] <= LORES_SIZE[0] and size[1] <= LORES_SIZE[1]):
+        header = FrameHeader(timestamp, *LORES_SIZE, FORMAT_YUV420)
+        publish_frame(request.make_array("lores"), header)
+    else:
+        header = FrameHeader(timestamp, *DEFAULT_SIZE, FORMAT_BGR)
+        publish_frame(request.make_array("main"), header)
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--mode",
+        choices=(STILL_MODE, STREAM_MODE),
+        default=STILL_MODE,
+        help="Save JPEG stills, or stream raw frames.",
+    )
+    args = parser.parse_args()
+
+    from picamera2 import Picamera2
+
     picam2 = Picamera2()
-    config = picam2.create_still_configuration({"size": (640, 480)})
-    picam2.configure(config)
-    picam2.start()
-    picam2.options["quality"] = 80
+    picam2.options["quality"] = JPEG_QUALITY
 
     signal.signal(signal.SIGINT, handle_quit)
 
     try:
-        f = open("/tmp/snapshot.jpg", "x")
-        f.close()
-    except FileExistsError:
-        logger.debug("Snapshot already exists")
-
-    try:
-        f = open("/tmp/big_brother.jpg", "x")
+        f = open(BIG_BROTHER_PATH, "x")
         f.close()
     except FileExistsError:
         logger.debug("Big Brother already exists")
 
-    while True:
-        for _ in range(2 * 3):
-            picam2.capture_file("/tmp/snapshot2.jpg")
-            os.replace("/tmp/snapshot2.jpg", "/tmp/snapshot.jpg")
-            time.sleep(0.5)
-        picam2.capture_file("/tmp/snapshot3.jpg")
-        os.replace("/tmp/snapshot3.jpg", "/tmp/big_brother.jpg")
+    # Consumers read whichever of the snapshot and frame files exists, so remove the other
+    if args.mode == STREAM_MODE:
+        if os.path.exists(SNAPSHOT_PATH):
+            os.remove(SNAPSHOT_PATH)
+        stream_forever(picam2)
+    else:
+        if os.path.exists(FRAME_PATH):
+            os.remove(FRAME_PATH)
+        try:
+            f = open(SNAPSHOT_PATH, "x")
+            f.close()
+        except FileExistsError:
+            logger.debug("Snapshot already exists")
+        capture_forever(picam2)
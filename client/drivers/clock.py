@@ -0,0 +1,74 @@
+"""
+Injectable clocks, so session logic can run against simulated time.
+
+Code that reads the time or sleeps should take a Clock (defaulting to SYSTEM_CLOCK) instead
+of calling datetime.now() or time.sleep() directly. Swapping in a VirtualClock then lets a
+full working day of feedback behaviour run as fast as the CPU allows.
+"""
+
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+
+class Clock:
+    """Wall clock, monotonic clock and sleeper backed by the system."""
+
+    def now(self) -> datetime:
+        """
+        Returns:
+            The current local date and time.
+        """
+        return datetime.now()
+
+    def monotonic(self) -> float:
+        """
+        Returns:
+            Seconds from an arbitrary fixed point, which never goes backwards.
+        """
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        """Block for the given number of seconds."""
+        time.sleep(seconds)
+
+    def sleep_ms(self, milliseconds: float) -> None:
+        """Block for the given number of milliseconds."""
+        self.sleep(milliseconds / 1000)
+
+
+class VirtualClock(Clock):
+    """Clock where time only passes when something sleeps, and sleeping returns immediately.
+
+    Attributes:
+        start: Wall clock time at which the clock was created.
+    """
+
+    def __init__(self, start: Optional[datetime] = None) -> None:
+        """
+        Args:
+            start: Wall clock time to start from. Defaults to the current time.
+        """
+        self.start = datetime.now() if start is None else start
+        self._elapsed = 0.0
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self._elapsed)
+
+    def monotonic(self) -> float:
+        return self._elapsed
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        """Move time forward without sleeping.
+
+        Args:
+            seconds: How far to move forward. Negative values are ignored.
+        """
+        self._elapsed += max(seconds, 0.0)
+
+
+#: Clock backed by the real system time.
+SYSTEM_CLOCK = Clock()
@@ -6,19 +6,25 @@ Author:
 """
 
 import logging
-import time
-from datetime import datetime
 from math import pi, sin
 from queue import Queue
-from typing import List
+from typing import TYPE_CHECKING, Callable, List, Optional
 
-from PiicoDev_Servo import PiicoDev_Servo, PiicoDev_Servo_Driver
-from PiicoDev_SSD1306 import *
-from PiicoDev_Switch import PiicoDev_Switch
+from drivers.clock import SYSTEM_CLOCK, Clock
+from drivers.hardware_backend import HardwareBackend
+from drivers.text_cache import DISPLAY_HEIGHT as HEIGHT, DISPLAY_WIDTH as WIDTH
+from drivers.text_cache import TextLineCache
+from models.pose_detection.frame_capturer import FrameCapturer
+
+if TYPE_CHECKING:
+    from PiicoDev_Servo import PiicoDev_Servo
+    from PiicoDev_SSD1306 import PiicoDev_SSD1306
+    from PiicoDev_Switch import PiicoDev_Switch
 
 #: Sentinel value for an invalid user.
 EMPTY_USER_ID = -1
 
+NO_BUTTON = -1
 LEFT_BUTTON = 0
 RIGHT_BUTTON = 1
 DOUBLE_RIGHT_BUTTON = 2
@@ -36,9 +42,6 @@ class ControlledData:
         _failed: True if this data is incomplete.
         _user_id: ID of current user.
         _posture_data: Data updated through ML models, used for feedback
-        _last_snapshot_time: Time of the last successful pull of posture data from the SQLite database
-        _last_cushion_time: Time of the last successful cushion feedback event.
-        _last_plant_time: Time of the last successful plant feedback event.
 
     Class invariant:
         self._failed ==> (all other variables are default values)
@@ -47,9 +50,6 @@ class ControlledData:
     _failed: bool
     _user_id: int
     _posture_data: Queue[float]
-    _last_snapshot_time: datetime
-    _last_cushion_time: datetime
-    _last_plant_time: datetime
 
     # SECTION: Constructors
 
@@ -60,9 +60,6 @@ class ControlledData:
         self._failed = True
         self._user_id = EMPTY_USER_ID
         self._posture_data = Queue()
-        self._last_snapshot_time = datetime.now()
-        self._last_cushion_time = datetime.now()
-        self._last_plant_time = datetime.now()
         self._DEBUG_current_graph_list_index = 0
         self._DEBUG_current_graph_function = lambda x: 30 * (
             1 + sin(2 * pi * x / WIDTH)
@@ -80,9 +77,6 @@ class ControlledData:
         return_me._failed = False
         return_me._user_id = user_id
         return_me._posture_data = Queue()
-        return_me._last_snapshot_time = datetime.now()
-        return_me._last_cushion_time = datetime.now()
-        return_me._last_plant_time = datetime.now()
         logger.debug(
             "<!> Made a new empty ControlledData() with user_id %d", return_me._user_id
         )
@@ -97,9 +91,6 @@ class ControlledData:
         return_me._failed = True
         return_me._user_id = EMPTY_USER_ID
         return_me._posture_data = Queue()
-        return_me._last_snapshot_time = datetime.now()
-        return_me._last_cushion_time = datetime.now()
-        return_me._last_plant_time = datetime.now()
         return return_me
 
     # SECTION: Getters/Setters
@@ -122,45 +113,6 @@ class ControlledData:
         """
         return self._posture_data
 
-    def get_last_snapshot_time(self) -> datetime:
-        """
-        Returns the last time that the internal posture data was updated.
-        """
-        return self._last_snapshot_time
-
-    def set_last_snapshot_time(self, time: datetime) -> None:
-        """
-        Args:
-            time: the last time that the internal posture data was updated.
-        """
-        self._last_snapshot_time = time
-
-    def get_last_cushion_time(self) -> datetime:
-        """
-        Returns the last time that the user was provided cushion feedback.
-        """
-        return self._last_cushion_time
-
-    def set_last_cushion_time(self, time: datetime) -> None:
-        """
-        Args:
-            time: the last time that the user was provided cushion feedback.
-        """
-        self._last_cushion_time = time
-
-    def get_last_plant_time(self) -> datetime:
-        """
-        Returns the last time that the user was provided plant feedback.
-        """
-        return self._last_plant_time
-
-    def set_last_plant_time(self, time: datetime) -> None:
-        """
-        Args:
-            time: the last time that the user was provided plant feedback.
-        """
-        self._last_plant_time = time
-
     def accept_new_posture_data(self, posture_data: List[float]) -> None:
         """
         Update the internal store of posture data for the OLED display.
@@ -176,7 +128,8 @@ class ControlledData:
 
 class HardwareComponents:
     """
-    Hardware components packaged together into a class.
+    Hardware components packaged together into a class. The devices themselves come from a
+    HardwareBackend, so these may be simulated.
 
     Attributes:
         button0: A button with address switches set to [0, 0, 0, 0]
@@ -189,6 +142,11 @@ class HardwareComponents:
         posture_graph_from: y-coordinate from which the posture graph begins, or `None`
                             if no posture graph is active.
 
+        text_cache: Pre-rendered text lines, blitted into the display's framebuffer by
+                    oled_display_text() instead of drawing each glyph pixel by pixel.
+        frame_capturer: Camera used for login and registration photos.
+        clock: Sleeper used while waiting on the hardware.
+
         plant_mover: Continuous rotation servo driving the I. Jensen Plant Mover 10000.
                      Its `midpoint_us` is `1600`.
         plant_height: Height of the plant, With a maximum given by
@@ -220,13 +178,16 @@ class HardwareComponents:
                                TODO: Check this value indeed drives the plant DOWN, not UP.
     """
 
-    button0: PiicoDev_Switch
-    button1: PiicoDev_Switch
-    display: PiicoDev_SSD1306
-    posture_graph: PiicoDev_SSD1306.graph2D | None
+    button0: "PiicoDev_Switch"
+    button1: "PiicoDev_Switch"
+    display: "PiicoDev_SSD1306"
+    posture_graph: "PiicoDev_SSD1306.graph2D | None"
     posture_graph_from: int | None
+    text_cache: TextLineCache
+    frame_capturer: FrameCapturer
+    clock: Clock
 
-    plant_mover: PiicoDev_Servo
+    plant_mover: "PiicoDev_Servo"
     plant_height: int
     _PLANT_SHAFT_TURNS: int = 13
     _PLANT_SHAFT_SAFETY_BUFFER_TURNS: int = 3
@@ -239,29 +200,39 @@ class HardwareComponents:
     # SECTION: Constructors
 
     @classmethod
-    def make_fresh(cls):
+    def make_fresh(cls, backend: HardwareBackend):
         """
         Create a new instance of HardwareComponents, set up according to the hardware that we expect
         to be plugged in.
+
+        Args:
+            backend: Provides the (real or simulated) devices.
         """
         DOUBLE_PRESS_DURATION = 400  # Milliseconds
         return HardwareComponents(
-            PiicoDev_Switch(
+            backend.create_switch(
                 id=[0, 0, 0, 0], double_press_duration=DOUBLE_PRESS_DURATION
             ),  # WARNING: 2024-09-01 17:12 Gabe: I think this produces an "I2C is not enabled" warning. No idea why.
-            PiicoDev_Switch(
+            backend.create_switch(
                 id=[0, 0, 0, 1], double_press_duration=DOUBLE_PRESS_DURATION
             ),  # WARNING: 2024-09-01 17:12 Gabe: I think this produces an "I2C is not enabled" warning. No idea why.
-            create_PiicoDev_SSD1306(),  # This is the constructor; ignore the "is not defined" error message.
-            PiicoDev_Servo(PiicoDev_Servo_Driver(), 1, midpoint_us=1600, range_us=1800),
+            backend.create_display(),
+            backend.create_servo(1, 1600, 1800),
+            backend.frame_capturer(),
+            backend.clock,
         )
 
-    def __init__(self, button0, button1, display, plant_mover):
+    def __init__(
+        self, button0, button1, display, plant_mover, frame_capturer, clock=SYSTEM_CLOCK
+    ):
         self.button0: PiicoDev_Switch = button0
         self.button1: PiicoDev_Switch = button1
         self.display: PiicoDev_SSD1306 = display
         self.posture_graph: PiicoDev_SSD1306.graph2D | None = None
         self.posture_graph_from: int | None = None
+        self.text_cache: TextLineCache = TextLineCache()
+        self.frame_capturer: FrameCapturer = frame_capturer
+        self.clock: Clock = clock
         self.plant_mover: PiicoDev_Servo = plant_mover
         self.plant_height: int = 0
         self.plant_mover.speed = 0  # Stop the plant mover from spinning.
@@ -328,7 +299,7 @@ class HardwareComponents:
         Unwind the plant to its maximum height, by making 15 full turns (we have 13 turns total).
         """
         self.plant_mover.speed = self._FULL_SPEED_UPWARDS
-        time.sleep(15 * self._PLANT_MOVER_PERIOD * self._PLANT_GEAR_RATIO / 1000)
+        self.clock.sleep(15 * self._PLANT_MOVER_PERIOD * self._PLANT_GEAR_RATIO / 1000)
         self.plant_height = (
             self._PLANT_SHAFT_TURNS - self._PLANT_SHAFT_SAFETY_BUFFER_TURNS
         )
@@ -372,14 +343,16 @@ class HardwareComponents:
             return
         if new_height > self.plant_height:
             self.plant_mover.speed = self._FULL_SPEED_UPWARDS
-            time.sleep(
+            self.clock.sleep(
                 distance * self._PLANT_MOVER_PERIOD * self._PLANT_GEAR_RATIO / 1000
             )
             self.plant_mover.speed = 0
             self.plant_height = new_height
             return
         self.plant_mover.speed = self._FULL_SPEED_DOWNWARDS
-        time.sleep(distance * self._PLANT_MOVER_PERIOD * self._PLANT_GEAR_RATIO / 1000)
+        self.clock.sleep(
+            distance * self._PLANT_MOVER_PERIOD * self._PLANT_GEAR_RATIO / 1000
+        )
         self.plant_mover.speed = 0
         self.plant_height = new_height
         return
@@ -401,10 +374,9 @@ class HardwareComponents:
         """
         LINE_HEIGHT = 15  # pixels
         LINE_WIDTH = 16  # characters
-        chunks = [text[i : i + LINE_WIDTH] for i in range(0, len(text), LINE_WIDTH)]
-        for index, chunk in enumerate(chunks):
-            self.display.text(chunk, x, y + index * LINE_HEIGHT, colour)
-        return y + len(chunks) * LINE_HEIGHT
+        return self.text_cache.draw(
+            self.display, text, x, y, colour, LINE_WIDTH, LINE_HEIGHT
+        )
 
     def oled_display_texts(self, texts: List[str], x: int, y: int, colour: int) -> int:
         """
@@ -442,17 +414,22 @@ class HardwareComponents:
                 text, 0, 0 + display_height_offset, 1
             )
         self.display.show()
-        time.sleep(message_time)
+        self.clock.sleep(message_time)
 
-    def wait_for_button_press(self) -> int:
+    def wait_for_button_press(
+        self, interrupt: Optional[Callable[[], bool]] = None
+    ) -> int:
         """Waits for a button to be pressed and then returns the button number.
 
+        Args:
+            interrupt: Checked while waiting. Stop waiting if it returns True.
+
         Returns:
-            The number of the button pressed.
+            The number of the button pressed, or NO_BUTTON if interrupted.
         """
         self._clear_buttons()
         while True:
-            pressed_button = -1
+            pressed_button = NO_BUTTON
 
             # Checking double press first as double press implies single press
             if self.button1.was_double_pressed:
@@ -462,11 +439,14 @@ class HardwareComponents:
             elif self.button1.was_pressed:
                 pressed_button = RIGHT_BUTTON
 
-            if pressed_button != -1:
+            if pressed_button != NO_BUTTON:
                 self._clear_buttons()
                 return pressed_button
 
-            time.sleep(0.5)
+            if interrupt is not None and interrupt():
+                return NO_BUTTON
+
+            self.clock.sleep(0.5)
 
     def _clear_buttons(self) -> None:
         """Clear pressed status from all buttons."""
@@ -0,0 +1,104 @@
+"""
+Raw camera frames shared through a file on tmpfs.
+
+In streaming mode, the camera overlord publishes each frame uncompressed, as it came out of the
+camera, along with the sensor's timestamp. That skips a JPEG encode in the camera overlord and a
+JPEG decode in every consumer. Low resolution frames stay in the camera's YUV420 format until a
+consumer actually reads them.
+
+A frame file is a header followed by the pixels. Files are written beside the published path and
+then renamed over it, so readers never see half a frame. Only numpy and the standard library are
+needed to publish, as the camera overlord runs under a different Python to the rest of the client.
+"""
+
+import os
+import struct
+from typing import NamedTuple
+
+import numpy as np
+
+#: File the latest frame is published to.
+FRAME_PATH = "/tmp/frame.raw"
+
+#: Pixels are rows of blue, green, red bytes, as in Picamera2's "RGB888" format.
+FORMAT_BGR = 0
+#: Pixels are a full resolution Y plane followed by quarter resolution U and V planes (I420).
+FORMAT_YUV420 = 1
+
+#: Magic number, sensor timestamp (ns), width, height, format.
+_HEADER = struct.Struct("<4sqHHB")
+_MAGIC = b"SDGF"
+
+
+class FrameHeader(NamedTuple):
+    """Description of a published frame.
+
+    Attributes:
+        timestamp: Sensor timestamp of the frame, in nanoseconds.
+        width: Width of the image, in pixels.
+        height: Height of the image, in pixels.
+        format: FORMAT_BGR or FORMAT_YUV420.
+    """
+
+    timestamp: int
+    width: int
+    height: int
+    format: int
+
+
+def publish_frame(
+    pixels: np.ndarray, header: FrameHeader, path: str = FRAME_PATH
+) -> None:
+    """Replace the published frame.
+
+    Args:
+        pixels: Frame as returned by the camera: HxWx3 for FORMAT_BGR, or (H * 3 / 2)xW for
+            FORMAT_YUV420.
+        header: Description of the frame.
+        path: File to publish to.
+    """
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(_HEADER.pack(_MAGIC, *header))
+        file.write(np.ascontiguousarray(pixels).data)
+    os.replace(temporary_path, path)
+
+
+def read_frame(path: str = FRAME_PATH) -> tuple[np.ndarray, FrameHeader]:
+    """
+    Args:
+        path: File the frame was published to.
+
+    Returns:
+        (pixels, header), with pixels as they were published.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+
+    magic, *fields = _HEADER.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError(f"{path} is not a published frame")
+    header = FrameHeader(*fields)
+
+    if header.format == FORMAT_YUV420:
+        shape: tuple[int, ...] = (header.height * 3 // 2, header.width)
+    else:
+        shape = (header.height, header.width, 3)
+    pixels = np.frombuffer(data, np.uint8, offset=_HEADER.size).reshape(shape)
+    return pixels, header
+
+
+def to_rgb(pixels: np.ndarray, header: FrameHeader) -> np.ndarray:
+    """
+    Args:
+        pixels: Frame from read_frame().
+        header: Description of the frame.
+
+    Returns:
+        The frame in the shape HxWxC where (C)hannels are in RGB
+    """
+    import cv2
+
+    if header.format == FORMAT_YUV420:
+        return cv2.cvtColor(pixels, cv2.COLOR_YUV2RGB_I420)
+    return cv2.cvtColor(pixels, cv2.COLOR_BGR2RGB)
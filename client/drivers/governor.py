@@ -0,0 +1,181 @@
+"""
+Thermal and load governor for the posture loop.
+
+A Pi running posture tracking flat out heats up until the firmware throttles the CPU, and then
+everything on it slows down, including the OLED and logins. The governor watches the SoC
+temperature and the load average and sets the rate posture tracking should run at: it halves the
+rate while either is over its ceiling, then drops to smaller frame sizes (tiers) once the rate is
+at its floor, and undoes both in reverse order, a step at a time, once there is headroom again.
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+#: File the SoC temperature is read from, in thousandths of a degree Celsius.
+THERMAL_ZONE = Path("/sys/class/thermal/thermal_zone0/temp")
+#: Temperature in degrees Celsius to stay below. The Pi's firmware starts throttling at 80.
+TEMPERATURE_CEILING = 70.0
+#: Degrees below the temperature ceiling before the rate is raised again.
+TEMPERATURE_HEADROOM = 5.0
+#: One minute load average per CPU to stay below.
+LOAD_CEILING = 0.8
+#: Load per CPU below the load ceiling before the rate is raised again.
+LOAD_HEADROOM = 0.2
+#: Factor the rate is multiplied by when over a ceiling.
+BACKOFF = 0.5
+#: Frames per second the rate is raised by when there is headroom.
+RECOVERY_STEP = 0.25
+
+logger = logging.getLogger(__name__)
+
+
+class Reading(NamedTuple):
+    """System state the governor decides from.
+
+    Attributes:
+        temperature: SoC temperature in degrees Celsius, or None if it can't be read.
+        load: One minute load average per CPU.
+    """
+
+    temperature: Optional[float]
+    load: float
+
+
+class GovernorDecision(NamedTuple):
+    """What the governor decided after a reading.
+
+    Attributes:
+        fps: Frames per second to run at.
+        tier: Index of the frame size to use, 0 being the largest.
+        reading: Reading the decision was made from.
+        action: What was done: "throttle", "downgrade", "upgrade", "recover", "hold" or
+            "floor" (over a ceiling, with nothing left to give up).
+    """
+
+    fps: float
+    tier: int
+    reading: Reading
+    action: str
+
+
+class GovernorStats(NamedTuple):
+    """What the governor has done so far.
+
+    Attributes:
+        fps: Current frames per second.
+        tier: Current frame size tier.
+        reading: Last reading, or None if there hasn't been one.
+        actions: Number of decisions of each kind.
+    """
+
+    fps: float
+    tier: int
+    reading: Optional[Reading]
+    actions: dict[str, int]
+
+
+class Governor:
+    """Sets a loop's frame rate and frame size tier to keep the system below a temperature and
+    load ceiling. Call update() periodically, and run at the rate and tier it returns.
+
+    Attributes:
+        fps: Frames per second to run at.
+        tier: Index of the frame size to use, 0 being the largest.
+    """
+
+    def __init__(
+        self,
+        max_fps: float,
+        min_fps: float,
+        tiers: int = 1,
+        source: Optional[Callable[[], Reading]] = None,
+        temperature_ceiling: float = TEMPERATURE_CEILING,
+        load_ceiling: float = LOAD_CEILING,
+    ) -> None:
+        """
+        Args:
+            max_fps: Frames per second to run at when there is headroom.
+            min_fps: Frames per second below which the rate is never lowered.
+            tiers: Number of frame sizes to choose from.
+            source: Returns the current system state. Reads the system if None; replace it to
+                test the governor.
+            temperature_ceiling: Temperature in degrees Celsius to stay below.
+            load_ceiling: One minute load average per CPU to stay below.
+        """
+        self.fps = max_fps
+        self.tier = 0
+        self._max_fps = max_fps
+        self._min_fps = min_fps
+        self._tiers = tiers
+        self._source = source or read_system
+        self._temperature_ceiling = temperature_ceiling
+        self._load_ceiling = load_ceiling
+        self._reading: Optional[Reading] = None
+        self._actions: dict[str, int] = {}
+
+    def update(self) -> GovernorDecision:
+        """Take a reading and adjust the rate and tier.
+
+        Returns:
+            The new rate and tier, and why.
+        """
+        reading = self._source()
+        self._reading = reading
+        temperature = reading.temperature
+        hot = reading.load >= self._load_ceiling or (
+            temperature is not None and temperature >= self._temperature_ceiling
+        )
+        cool = reading.load < self._load_ceiling - LOAD_HEADROOM and (
+            temperature is None
+            or temperature < self._temperature_ceiling - TEMPERATURE_HEADROOM
+        )
+
+        if hot and self.fps > self._min_fps:
+            self.fps = max(self._min_fps, self.fps * BACKOFF)
+            action = "throttle"
+        elif hot and self.tier < self._tiers - 1:
+            self.tier += 1
+            action = "downgrade"
+        elif hot:
+            action = "floor"
+        elif cool and self.tier > 0:
+            self.tier -= 1
+            action = "upgrade"
+        elif cool and self.fps < self._max_fps:
+            self.fps = min(self._max_fps, self.fps + RECOVERY_STEP)
+            action = "recover"
+        else:
+            action = "hold"
+
+        self._actions[action] = self._actions.get(action, 0) + 1
+        if action != "hold":
+            logger.info(
+                "Governor %s: %.2f fps, tier %d (%s C, load %.2f)",
+                action,
+                self.fps,
+                self.tier,
+                "?" if temperature is None else f"{temperature:.1f}",
+                reading.load,
+            )
+        return GovernorDecision(self.fps, self.tier, reading, action)
+
+    def stats(self) -> GovernorStats:
+        """
+        Returns:
+            The current rate and tier, last reading and counts of each kind of decision.
+        """
+        return GovernorStats(self.fps, self.tier, self._reading, dict(self._actions))
+
+
+def read_system() -> Reading:
+    """
+    Returns:
+        The SoC temperature, if this is a Linux machine with a thermal zone, and the load.
+    """
+    try:
+        temperature: Optional[float] = int(THERMAL_ZONE.read_text()) / 1000
+    except (OSError, ValueError):
+        temperature = None
+    return Reading(temperature, os.getloadavg()[0] / (os.cpu_count() or 1))
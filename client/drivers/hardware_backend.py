@@ -0,0 +1,130 @@
+"""
+Pluggable hardware backends for the Raspberry Pi client.
+
+The "pi" backend talks to the real RPi.GPIO and PiicoDev devices. The "sim" backend uses
+the stand-ins in drivers/simulation.py so the whole control loop can run headless.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional, Type
+
+from drivers.clock import SYSTEM_CLOCK, Clock, VirtualClock
+from models.pose_detection.frame_capturer import FrameCapturer
+
+PI_BACKEND = "pi"
+SIMULATED_BACKEND = "sim"
+BACKENDS = (PI_BACKEND, SIMULATED_BACKEND)
+
+logger = logging.getLogger(__name__)
+
+
+class HardwareBackend(NamedTuple):
+    """Factories for every hardware device the client uses.
+
+    Attributes:
+        name: One of BACKENDS.
+        gpio: Module (or object) with the RPi.GPIO interface.
+        create_switch: Called with PiicoDev_Switch keyword arguments (`id`,
+            `double_press_duration`) to make a button.
+        create_display: Called with no arguments to make the OLED display.
+        create_servo: Called with (channel, midpoint_us, range_us) to make a servo.
+        frame_capturer: Class reference to the camera's FrameCapturer.
+        clock: Source of the time, and sleeper, for the control loop.
+    """
+
+    name: str
+    gpio: Any
+    create_switch: Callable[..., Any]
+    create_display: Callable[[], Any]
+    create_servo: Callable[[int, int, int], Any]
+    frame_capturer: Type[FrameCapturer]
+    clock: Clock
+
+
+def load_backend(
+    name: str,
+    events_file: Optional[Path] = None,
+    frame_dir: Optional[Path] = None,
+    virtual_time: bool = False,
+) -> HardwareBackend:
+    """Load a hardware backend. Device libraries are only imported for the chosen backend.
+
+    Args:
+        name: One of BACKENDS.
+        events_file: Simulated backend only. JSON file mapping "button0"/"button1" to lists
+            of [seconds after start, "press" | "double_press"] pairs to replay.
+        frame_dir: Simulated backend only. Directory to dump every displayed frame to.
+        virtual_time: Simulated backend only. Use a VirtualClock, so sleeping returns
+            immediately and time advances as fast as the CPU allows.
+
+    Returns:
+        The backend.
+    """
+    if name == PI_BACKEND:
+        return _load_pi_backend()
+    if name == SIMULATED_BACKEND:
+        return _load_simulated_backend(events_file, frame_dir, virtual_time)
+    raise ValueError(f"Unknown hardware backend: {name}")
+
+
+def _load_pi_backend() -> HardwareBackend:
+    import RPi.GPIO as GPIO
+    from models.pose_detection.frame_capturer import RaspCapturer
+    from PiicoDev_Servo import PiicoDev_Servo, PiicoDev_Servo_Driver
+    from PiicoDev_SSD1306 import create_PiicoDev_SSD1306
+    from PiicoDev_Switch import PiicoDev_Switch
+
+    def create_servo(channel: int, midpoint_us: int, range_us: int) -> PiicoDev_Servo:
+        return PiicoDev_Servo(
+            PiicoDev_Servo_Driver(), channel, midpoint_us=midpoint_us, range_us=range_us
+        )
+
+    return HardwareBackend(
+        name=PI_BACKEND,
+        gpio=GPIO,
+        create_switch=PiicoDev_Switch,
+        create_display=create_PiicoDev_SSD1306,
+        create_servo=create_servo,
+        frame_capturer=RaspCapturer,
+        clock=SYSTEM_CLOCK,
+    )
+
+
+def _load_simulated_backend(
+    events_file: Optional[Path], frame_dir: Optional[Path], virtual_time: bool
+) -> HardwareBackend:
+    from drivers.simulation import (
+        SimulatedDisplay,
+        SimulatedGPIO,
+        SimulatedServo,
+        SimulatedSwitch,
+    )
+    from models.pose_detection.frame_capturer import SimulatedCapturer
+
+    clock = VirtualClock() if virtual_time else SYSTEM_CLOCK
+
+    events: dict[str, list[tuple[float, str]]] = {}
+    if events_file is not None:
+        events = json.loads(events_file.read_text())
+    # Buttons are created in order: button0, then button1
+    switch_events = iter([events.get("button0", []), events.get("button1", [])])
+
+    def create_switch(**kwargs) -> SimulatedSwitch:
+        script = [tuple(event) for event in next(switch_events, [])]
+        return SimulatedSwitch(events=script, clock=clock, **kwargs)
+
+    def create_servo(channel: int, midpoint_us: int, range_us: int) -> SimulatedServo:
+        return SimulatedServo(channel, midpoint_us, range_us, clock=clock)
+
+    logger.info("Using simulated hardware (virtual time: %s)", virtual_time)
+    return HardwareBackend(
+        name=SIMULATED_BACKEND,
+        gpio=SimulatedGPIO(clock),
+        create_switch=create_switch,
+        create_display=lambda: SimulatedDisplay(frame_dir),
+        create_servo=create_servo,
+        frame_capturer=SimulatedCapturer,
+        clock=clock,
+    )
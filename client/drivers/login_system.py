@@ -10,13 +10,23 @@ from data.routines import create_user, next_user_id
 from drivers.data_structures import (
     HardwareComponents,
     LEFT_BUTTON,
+    NO_BUTTON,
     RIGHT_BUTTON,
     DOUBLE_RIGHT_BUTTON,
 )
-from models.face_recognition.recognition import Status, get_face_match, register_faces
-from models.pose_detection.frame_capturer import RaspCapturer
+from models.face_recognition.recognition import Status
+from models.face_recognition.worker import RecognitionWorker
 
 NUM_FACES = 5
+#: Number of frames captured per photo. Only the best of them is encoded.
+BURST_SIZE = 3
+#: Frames per second requested from the camera while logging in or registering, so bursts are
+#: made of distinct frames.
+LOGIN_CAPTURE_FPS = 15
+#: Frame size requested from the camera while logging in or registering.
+LOGIN_CAPTURE_SIZE = (640, 480)
+#: Name login requests camera frames under.
+LOGIN_CONSUMER = "login"
 QUIT = -6
 RESET = -5
 BAD_STATUS_MESSAGES = {
@@ -24,37 +34,42 @@ BAD_STATUS_MESSAGES = {
     Status.TOO_MANY_FACES.value: "Too many faces detected",
     Status.NO_MATCH.value: "Could not match face",
     Status.ALREADY_REGISTERED.value: "Face already registered",
+    Status.TIMED_OUT.value: "Face check timed out",
 }
 QUIT_INSTRUCTIONS = "Right: quit"
 
-Action = Callable[[HardwareComponents], int]
+Action = Callable[[HardwareComponents, RecognitionWorker], int]
 
 logger = logging.getLogger(__name__)
 
 
-def handle_authentication(hardware: HardwareComponents) -> int:
+def handle_authentication(
+    hardware: HardwareComponents, recogniser: RecognitionWorker
+) -> int:
     """Run authentication loop until user either registers or logs in.
 
     Args:
         hardware: connected RPI hardware
+        recogniser: process running face recognition
 
     Returns:
         id of logged in user.
     """
+    # In memory budget mode, face recognition is stopped while nobody is logging in
+    recogniser.start()
+
     while True:
         _log_and_send(
             hardware,
-            ["Left: login",
-            "Right: register",
-            "Double press right: reset data"]
+            ["Left: login", "Right: register", "Double press right: reset data"],
         )
         button = hardware.wait_for_button_press()
 
         if button == RIGHT_BUTTON:
-            status = _loop_action(hardware, _attempt_register)
+            status = _loop_action(hardware, recogniser, _attempt_register)
 
         if button == LEFT_BUTTON:
-            status = _loop_action(hardware, _attempt_login)
+            status = _loop_action(hardware, recogniser, _attempt_login)
 
         if button == DOUBLE_RIGHT_BUTTON:
             return RESET
@@ -68,61 +83,91 @@ def handle_authentication(hardware: HardwareComponents) -> int:
             raise error
 
 
-def _loop_action(hardware: HardwareComponents, action: Action) -> int:
+def _loop_action(
+    hardware: HardwareComponents, recogniser: RecognitionWorker, action: Action
+) -> int:
     """Loop action until appropriate status is returned"""
-    while True:
-        status = action(hardware)
+    # Only have the camera take photos quickly while they might be wanted
+    hardware.frame_capturer.subscribe(
+        LOGIN_CONSUMER, LOGIN_CAPTURE_FPS, LOGIN_CAPTURE_SIZE
+    )
+    try:
+        while True:
+            status = action(hardware, recogniser)
 
-        if status == QUIT:
-            return QUIT
+            if status == QUIT:
+                return QUIT
 
-        if _is_status_id(status):
-            return status
+            if _is_status_id(status):
+                return status
+    finally:
+        hardware.frame_capturer.unsubscribe(LOGIN_CONSUMER)
 
 
-def _attempt_login(hardware: HardwareComponents) -> int:
-    capturer = RaspCapturer()
+def _attempt_login(hardware: HardwareComponents, recogniser: RecognitionWorker) -> int:
+    capturer = hardware.frame_capturer
     messages = ["Left: take photo", f"{QUIT_INSTRUCTIONS}"]
     _log_and_send(hardware, messages, message_time=0)
 
     button_pressed = hardware.wait_for_button_press()
     if button_pressed == LEFT_BUTTON:
-        face, _ = capturer.get_frame()
+        faces = [frame for frame, _ in capturer.get_burst(BURST_SIZE)]
 
     if button_pressed == RIGHT_BUTTON:
         return QUIT
 
     _log_and_send(hardware, ["Trying login..."], message_time=0)
-    status = get_face_match(face)
+    status = recogniser.match_best_face(faces)
     _handle_status_message(hardware, status)
 
     return status
 
 
-def _attempt_register(hardware: HardwareComponents) -> int:
-    capturer = RaspCapturer()
-
-    # Capture NUM_FACES faces
-    faces: list[np.ndarray] = []
-    for i in range(NUM_FACES):
-        messages = [
-            f"Left: take photo {i + 1}/{NUM_FACES}",
-            f"{QUIT_INSTRUCTIONS}"
-        ]
-        _log_and_send(hardware, messages, message_time=0)
-
-        button_pressed = hardware.wait_for_button_press()
-        if button_pressed == RIGHT_BUTTON:
-            return QUIT
+def _attempt_register(
+    hardware: HardwareComponents, recogniser: RecognitionWorker
+) -> int:
+    capturer = hardware.frame_capturer
+
+    # Capture NUM_FACES faces. Each one is encoded while the user lines up the next, and only
+    # photos without exactly one face are retaken.
+    embeddings: list[np.ndarray] = []
+    encoding = False
+    while len(embeddings) < NUM_FACES:
+        photo = len(embeddings) + int(encoding) + 1
+        button_pressed = NO_BUTTON
+        if photo <= NUM_FACES:
+            messages = [f"Left: take photo {photo}/{NUM_FACES}", f"{QUIT_INSTRUCTIONS}"]
+            _log_and_send(hardware, messages, message_time=0)
+
+            # Stop waiting when the previous photo is encoded, in case it needs retaking
+            interrupt = recogniser.encoding_ready if encoding else None
+            button_pressed = hardware.wait_for_button_press(interrupt)
+            if button_pressed == RIGHT_BUTTON:
+                if encoding:
+                    recogniser.collect_encoding()
+                return QUIT
+
+            if button_pressed == LEFT_BUTTON:
+                burst = [frame for frame, _ in capturer.get_burst(BURST_SIZE)]
+        else:
+            _log_and_send(hardware, [f"Checking photo {NUM_FACES}..."], message_time=0)
+
+        if encoding:
+            encoding = False
+            status, embedding = recogniser.collect_encoding()
+            if embedding is None:
+                _handle_rejected_photo(hardware, status, len(embeddings) + 1)
+            else:
+                embeddings.append(embedding)
 
         if button_pressed == LEFT_BUTTON:
-            frame, _ = capturer.get_frame()
-            faces.append(frame)
+            recogniser.start_encoding(burst)
+            encoding = True
 
     # Try register faces
     _log_and_send(hardware, ["Registering..."])
     user_id = next_user_id()
-    status = register_faces(user_id, faces)
+    status = recogniser.register_embeddings(user_id, embeddings)
 
     if status == Status.OK.value:
         create_user()
@@ -143,6 +188,15 @@ def _handle_status_message(hardware: HardwareComponents, status: int) -> None:
         _log_and_send(hardware, BAD_STATUS_MESSAGES[status])
 
 
+def _handle_rejected_photo(
+    hardware: HardwareComponents, status: int, photo: int
+) -> None:
+    messages = [f"Photo {photo}/{NUM_FACES} rejected"]
+    if status in BAD_STATUS_MESSAGES:
+        messages.append(BAD_STATUS_MESSAGES[status])
+    _log_and_send(hardware, messages)
+
+
 def _log_and_send(
     hardware: HardwareComponents, messages: list[str], message_time: int = 1
 ) -> None:
@@ -0,0 +1,103 @@
+"""
+Resident memory accounting for the garden's processes.
+
+The overlord, posture tracker and face recognition worker each load large models. On a Pi with
+1 GB of RAM, letting them all stay resident pushes the system into swap and slows the posture
+loop, so the overlord tracks how much memory each process holds and, in memory budget mode,
+shuts down the face recognition worker when the total goes over budget.
+"""
+
+import resource
+from typing import Callable, NamedTuple, Optional
+
+#: Bytes per page of memory.
+PAGE_SIZE = resource.getpagesize()
+#: Bytes per mebibyte, the unit budgets are given in.
+MIB = 1024 * 1024
+
+
+class MemoryReport(NamedTuple):
+    """Resident memory of the tracked processes at one point in time.
+
+    Shared pages (such as libraries loaded before a fork) count towards every process using
+    them, so the total is an overestimate, which errs on the safe side of the budget.
+
+    Attributes:
+        processes: Resident bytes of each tracked process that is running, by name.
+        budget: Maximum total resident bytes, or None if there is no budget.
+    """
+
+    processes: dict[str, int]
+    budget: Optional[int]
+
+    @property
+    def total(self) -> int:
+        """Total resident bytes of the running processes."""
+        return sum(self.processes.values())
+
+    @property
+    def over_budget(self) -> bool:
+        """Whether the total is over the budget."""
+        return self.budget is not None and self.total > self.budget
+
+    def describe(self) -> str:
+        """
+        Returns:
+            Resident memory of each process and the total, in MiB, for logging.
+        """
+        parts = [f"{name} {rss / MIB:.0f}" for name, rss in self.processes.items()]
+        budget = "" if self.budget is None else f" of {self.budget / MIB:.0f}"
+        return f"{', '.join(parts)}; total {self.total / MIB:.0f}{budget} MiB"
+
+
+class MemoryAccountant:
+    """Measures the resident memory of a set of named processes.
+
+    Processes are given as functions returning their current pid, so processes that are started
+    and stopped over time (returning None while stopped) can be tracked.
+    """
+
+    def __init__(self, budget: Optional[int] = None) -> None:
+        """
+        Args:
+            budget: Maximum total resident bytes, or None to only measure.
+        """
+        self.budget = budget
+        self._processes: dict[str, Callable[[], Optional[int]]] = {}
+
+    def track(self, name: str, pid: Callable[[], Optional[int]]) -> None:
+        """Include a process in reports.
+
+        Args:
+            name: Name to report the process under.
+            pid: Returns the process id, or None if the process isn't running.
+        """
+        self._processes[name] = pid
+
+    def report(self) -> MemoryReport:
+        """
+        Returns:
+            Current resident memory of each tracked process.
+        """
+        processes = {}
+        for name, get_pid in self._processes.items():
+            pid = get_pid()
+            rss = None if pid is None else resident_bytes(pid)
+            if rss is not None:
+                processes[name] = rss
+        return MemoryReport(processes, self.budget)
+
+
+def resident_bytes(pid: int) -> Optional[int]:
+    """
+    Args:
+        pid: Id of a process.
+
+    Returns:
+        Resident set size of the process, or None if it has exited or this isn't Linux.
+    """
+    try:
+        with open(f"/proc/{pid}/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
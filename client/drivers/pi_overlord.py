@@ -7,23 +7,39 @@ Author:
 
 import argparse
 import logging
-import time
-from datetime import datetime, timedelta
+import os
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
 
-import RPi.GPIO as GPIO
 from data.routines import (
     init_database,
-    destroy_database,
+    reset_database,
     reset_registered_face_embeddings,
     get_user_postures,
     Posture,
 )
 from drivers.data_structures import ControlledData, HardwareComponents
+from drivers.hardware_backend import (
+    BACKENDS,
+    PI_BACKEND,
+    SIMULATED_BACKEND,
+    HardwareBackend,
+    load_backend,
+)
 from drivers.login_system import RESET, handle_authentication
-from models.pose_detection.frame_capturer import RaspCapturer
-from PiicoDev_SSD1306 import *
-from PiicoDev_Switch import *
-from PiicoDev_Unified import sleep_ms
+from drivers.memory_budget import MIB, MemoryAccountant
+from drivers.process_tuning import (
+    OVERLORD,
+    POSTURE,
+    RECOGNITION,
+    ProcessTuning,
+    load_tuning,
+)
+from drivers.scheduler import Scheduler
+from models.face_recognition.detection import DetectionConfig
+from models.face_recognition.worker import RecognitionWorker
+from models.pose_detection.posture_process import PostureProcess
 
 #: Pin to which the vibration motor is attached. This is D8 on the PiicoDev header.
 CUSHION_GPIO_PIN = 8
@@ -43,24 +59,43 @@ POSTURE_GRAPH_DATUM_WIDTH = 5
 #: The number of data points to split the total data into, collected each time we read from the SQLite database.
 NUM_DATA_POINTS_PER_TIMEOUT = 3
 
-#: Minimum delay between consecutive uses of the vibration motor. Used in handle_feedback().
+#: Minimum delay between consecutive uses of the vibration motor. Used in create_session_scheduler().
 HANDLE_CUSHION_FEEDBACK_TIMEOUT = timedelta(milliseconds=15000)
 #: Length of time for which the vibration motor should vibrate. Used in handle_cushion_feedback().
 CUSHION_ACTIVE_INTERVAL = timedelta(milliseconds=2000)
 #: Threshold for vibration cushion feedback. If the proportion of "good" sitting posture is below this, the cushion will vibrate.
 CUSHION_PROPORTION_GOOD_THRESHOLD = 0.5
 
-#: Minimum delay between consecutive uses of the plant-controlling servos. Used in handle_feedback().
+#: Minimum delay between consecutive uses of the plant-controlling servos. Used in create_session_scheduler().
 HANDLE_PLANT_FEEDBACK_TIMEOUT = timedelta(milliseconds=7500)
 #: Threshold for I. Jensen Plant Mover 10000 feedback. If the proportion of "good" sitting posture is below this,
 #: the plant will move down.
 PLANT_PROPORTION_GOOD_THRESHOLD = 0.6
 
-#: Number of milliseconds between each loop iteration in run_user_session().
-USER_SESSION_INTERVAL = 100
+#: Minimum delay between checks for the user logging out in run_user_session(). The switch latches
+#: presses, so this only affects how quickly logout responds.
+LOGOUT_POLL_INTERVAL = timedelta(milliseconds=250)
+#: Maximum amount by which each feedback job's deadline is randomly moved, so the cushion and plant
+#: feedback don't keep landing on the same wakeup.
+FEEDBACK_JITTER = timedelta(milliseconds=500)
+
+#: In memory budget mode, time after the last face recognition request before the face recognition
+#: process is stopped.
+RECOGNITION_IDLE_TIMEOUT = timedelta(seconds=60)
+#: In memory budget mode, delay between checks of the memory used by each process.
+MEMORY_CHECK_INTERVAL = timedelta(seconds=30)
 
 logger = logging.getLogger(__name__)
 
+#: Hardware backend selected at startup, in main().
+backend: HardwareBackend
+#: Connected (or simulated) hardware components, set up in main().
+hardware: HardwareComponents
+#: Process running face recognition, started in main().
+recogniser: RecognitionWorker
+#: Memory used by each process, in memory budget mode. None otherwise.
+memory: Optional[MemoryAccountant] = None
+
 
 def main():
     """
@@ -72,26 +107,133 @@ def main():
         action="store_true",
         help="Whether to run the posture model. Useful for debugging.",
     )
+    parser.add_argument(
+        "--no-prefilter",
+        action="store_true",
+        help="Landmark every frame, even those that show nothing new.",
+    )
+    parser.add_argument(
+        "--autotune-posture",
+        action="store_true",
+        help="Run the posture model with the fastest delegate and thread count for this device, "
+        "timing them on the first start.",
+    )
+    parser.add_argument(
+        "--hardware",
+        choices=BACKENDS,
+        default=PI_BACKEND,
+        help="Hardware backend. Use 'sim' to run without a Raspberry Pi.",
+    )
+    parser.add_argument(
+        "--sim-events",
+        type=Path,
+        help="JSON file of scripted button presses for the simulated hardware.",
+    )
+    parser.add_argument(
+        "--sim-frame-dir",
+        type=Path,
+        help="Directory to save every simulated OLED frame to.",
+    )
+    parser.add_argument(
+        "--virtual-time",
+        action="store_true",
+        help="Run simulated hardware against a virtual clock that never sleeps.",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        help="Total resident memory in MiB to keep the garden's processes under. Face "
+        "recognition then only runs around logins.",
+    )
+    parser.add_argument(
+        "--recognition-idle",
+        type=float,
+        default=RECOGNITION_IDLE_TIMEOUT.total_seconds(),
+        help="Seconds of inactivity before face recognition is stopped, with --memory-budget.",
+    )
+    parser.add_argument(
+        "--face-detection-scale",
+        type=float,
+        default=DetectionConfig().scale,
+        help="Factor frames are resized by before looking for faces. Smaller is faster but "
+        "misses faces further from the camera.",
+    )
+    parser.add_argument(
+        "--face-detection-model",
+        choices=("hog", "cnn"),
+        default=DetectionConfig().model,
+        help="dlib face detector. 'cnn' is more accurate but far slower.",
+    )
+    parser.add_argument(
+        "--tuning",
+        type=Path,
+        help="JSON file of CPU affinity, priority and thread counts for each process. See "
+        "drivers/process_tuning.py.",
+    )
     args = parser.parse_args()
+    if args.virtual_time and args.hardware != SIMULATED_BACKEND:
+        parser.error("--virtual-time requires --hardware sim")
 
     logging.basicConfig(level=logging.DEBUG)
     logger.debug("Running main")
 
+    tuning: dict[str, ProcessTuning] = {}
+    if args.tuning is not None:
+        tuning = load_tuning(args.tuning)
+        # Before starting any children, which inherit whatever their own tuning doesn't set
+        if OVERLORD in tuning:
+            tuning[OVERLORD].apply()
+
+    global backend, hardware, recogniser, memory
+    backend = load_backend(
+        args.hardware, args.sim_events, args.sim_frame_dir, args.virtual_time
+    )
+    hardware = initialise_hardware()
+
     logger.debug("Initialising database")
     init_database()
 
+    detection = DetectionConfig(
+        scale=args.face_detection_scale, model=args.face_detection_model
+    )
+    if args.memory_budget is None:
+        # Load the face recognition models in the background, ready for the first login
+        logger.debug("Initialising face recognition process")
+        recogniser = RecognitionWorker(
+            block=False, tuning=tuning.get(RECOGNITION), detection=detection
+        )
+    else:
+        # Only keep the face recognition models loaded around logins
+        recogniser = RecognitionWorker(
+            block=False,
+            idle_timeout=args.recognition_idle,
+            clock=backend.clock,
+            tuning=tuning.get(RECOGNITION),
+            detection=detection,
+        )
+        memory = MemoryAccountant(int(args.memory_budget * MIB))
+        memory.track("overlord", os.getpid)
+        memory.track("recognition", lambda: recogniser.pid)
+
     # Spin up the posture tracking process
+    # The model loads in the background while the user logs in
     if not args.no_posture_model:
-        from models.pose_detection.routines import PostureProcess
-
         logger.debug("Initialising posture tracking process")
-        posture_process = PostureProcess(frame_capturer=RaspCapturer)
+        posture_process = PostureProcess(
+            frame_capturer=backend.frame_capturer,
+            block=False,
+            prefilter=not args.no_prefilter,
+            tuning=tuning.get(POSTURE),
+            autotune=args.autotune_posture,
+        )
+        if memory is not None:
+            memory.track("posture", lambda: posture_process.pid)
 
     # Handle user login/registration, posture tracking, and running the user session
     # Under normal circumstances, this loop shouldn't exit
     while True:
         # Attempt to login an existing user or register a new user
-        user_id = handle_authentication(hardware)
+        user_id = handle_authentication(hardware, recogniser)
 
         # Handle a "hard" reset, which resets the database, all registered faces,
         # and the hardware
@@ -131,11 +273,12 @@ def initialise_hardware() -> HardwareComponents:
 
     """
     logger.debug("<!> initialise_hardware()")
-    return_me = HardwareComponents.make_fresh()
+    return_me = HardwareComponents.make_fresh(backend)
     # Clear button queues
     return_me.button0.was_pressed
     return_me.button1.was_pressed
     # Set up GPIO pins
+    GPIO = backend.gpio
     GPIO.setmode(GPIO.BCM)  # Same pin numbering convention as the PiicoDev header
     GPIO.setup(CUSHION_GPIO_PIN, GPIO.OUT)
     # Write low to stop buzzer from mistakenly buzzing, if necessary
@@ -171,7 +314,7 @@ def run_user_session(user: ControlledData) -> None:
     hardware.display.fill(0)
     hardware.oled_display_text(LOGIN_MESSAGE, 0, 0, 1)
     hardware.display.show()
-    sleep_ms(LOGIN_SUCCESS_DELAY)
+    backend.clock.sleep_ms(LOGIN_SUCCESS_DELAY)
 
     # Clear button queues
     hardware.button0.was_pressed
@@ -183,23 +326,87 @@ def run_user_session(user: ControlledData) -> None:
     )
     hardware.display.show()
 
-    while True:
-        # Check for user logout
+    # Run core functionality until the user logs out
+    scheduler = create_session_scheduler(user)
+    scheduler.run()
+    scheduler.log_stats()
+
+    hardware.display.fill(0)
+    hardware.oled_display_text(LOGOUT_MESSAGE, 0, 0, 1)
+    hardware.display.show()
+    backend.clock.sleep_ms(LOGOUT_SUCCESS_DELAY)
+    logger.debug("<!> END run_user_session()")
+    hardware.unwind_plant()
+
+
+def create_session_scheduler(user: ControlledData) -> Scheduler:
+    """
+    Schedule the periodic work for a logged-in user: checking for logout, updating the posture
+    graph, and giving cushion and plant feedback. The scheduler's run() returns on logout.
+
+    Args:
+        user: data encapsulating the current state of the program.
+
+    Returns:
+        Scheduler with the session's jobs registered.
+
+    Requires:
+        ! user.is_failed()
+    """
+    scheduler = Scheduler(backend.clock)
+
+    def check_logout() -> None:
         if hardware.button0.was_pressed:
-            hardware.display.fill(0)
-            hardware.oled_display_text(LOGOUT_MESSAGE, 0, 0, 1)
-            hardware.display.show()
-            sleep_ms(LOGOUT_SUCCESS_DELAY)
-            logger.debug("<!> END run_user_session()")
-            hardware.unwind_plant()
-            return
-
-        # Run core functionality
-        update_display_screen(user)
+            scheduler.stop()
+
+    def update_posture_graph() -> None:
         handle_posture_graph(user)
-        handle_feedback(user)
+        update_display_screen(user)
+
+    scheduler.add_job(
+        "logout", LOGOUT_POLL_INTERVAL.total_seconds(), check_logout, delay=0
+    )
+    scheduler.add_job(
+        "posture_graph",
+        GET_POSTURE_DATA_TIMEOUT.total_seconds(),
+        update_posture_graph,
+        delay=0,
+    )
+    scheduler.add_job(
+        "cushion_feedback",
+        HANDLE_CUSHION_FEEDBACK_TIMEOUT.total_seconds(),
+        lambda: handle_cushion_feedback(user),
+        jitter=FEEDBACK_JITTER.total_seconds(),
+    )
+    scheduler.add_job(
+        "plant_feedback",
+        HANDLE_PLANT_FEEDBACK_TIMEOUT.total_seconds(),
+        lambda: handle_plant_feedback(user),
+        jitter=FEEDBACK_JITTER.total_seconds(),
+    )
+    if memory is not None:
+        scheduler.add_job("memory", MEMORY_CHECK_INTERVAL.total_seconds(), check_memory)
+    return scheduler
 
-        sleep_ms(USER_SESSION_INTERVAL)
+
+def check_memory() -> None:
+    """
+    Log the memory used by each process. Stop the face recognition process if it has been idle
+    long enough, or straight away if the processes are over the memory budget.
+
+    Requires:
+        memory is not None
+    """
+    report = memory.report()
+    logger.debug("<!> memory: %s", report.describe())
+
+    if report.over_budget and recogniser.pid is not None:
+        logger.warning(
+            "Over memory budget (%s), stopping face recognition", report.describe()
+        )
+        recogniser.stop()
+    else:
+        recogniser.stop_if_idle()
 
 
 def update_display_screen(user: ControlledData) -> bool:
@@ -253,106 +460,77 @@ def handle_posture_graph(user: ControlledData) -> bool:
     Ensures:
         ! user.is_failed()
     """
-    now = datetime.now()
-
-    if now > user.get_last_snapshot_time() + GET_POSTURE_DATA_TIMEOUT:
-        # Get the most recent posture data for the user
-        recent_posture_data = get_user_postures(
-            user.get_user_id(),
-            num=-1,
-            period_start=now - GET_POSTURE_DATA_TIMEOUT,
-            period_end=now,
-        )
+    now = backend.clock.now()
 
-        # Exit if no data
-        if len(recent_posture_data) == 0:
-            logger.debug(
-                "<!> Exiting handle_posture_monitoring_new() early: Not enough data"
-            )
-            return True
-
-        # Exit if person not in frame enough
-        average_prop_in_frame = sum(
-            [posture.prop_in_frame for posture in recent_posture_data]
-        ) / len(recent_posture_data)
-        if average_prop_in_frame < PROPORTION_IN_FRAME_THRESHOLD:
-            logger.debug(
-                "<!> Exiting handle_posturing_monitoring_new() early: Not in frame for a high enough proportion of time."
-            )
-            user.set_last_snapshot_time(datetime.now())
-            return True
-
-        # Sort the list by period_start
-        recent_posture_data = sorted(
-            recent_posture_data, key=lambda posture: posture.period_start
+    # Get the most recent posture data for the user
+    recent_posture_data = get_user_postures(
+        user.get_user_id(),
+        num=-1,
+        period_start=now - GET_POSTURE_DATA_TIMEOUT,
+        period_end=now,
+    )
+
+    # Exit if no data
+    if len(recent_posture_data) == 0:
+        logger.debug(
+            "<!> Exiting handle_posture_monitoring_new() early: Not enough data"
         )
+        return True
 
-        # Calculate total time span
-        start_time = recent_posture_data[0].period_start
-        end_time = recent_posture_data[-1].period_end
-        total_time = end_time - start_time
-
-        # Calculate the interval length
-        interval = total_time / NUM_DATA_POINTS_PER_TIMEOUT
-
-        # Setup sublists, where each sublist is a portion of the overall data
-        split_posture_lists: list[list[Posture]]
-        split_posture_lists = [[] for _ in range(NUM_DATA_POINTS_PER_TIMEOUT)]
-
-        # What is in each sublist is determined by period_start
-        # We want an approximately equal amount of data in each sublist
-        for posture in recent_posture_data:
-            index = min(
-                NUM_DATA_POINTS_PER_TIMEOUT - 1,
-                int((posture.period_start - start_time) // interval),
-            )
-            split_posture_lists[index].append(posture)
-
-        new_prop_good_data = []
-        # Enqueue the average good posture for each data point for the graph to use
-        for posture_list in split_posture_lists:
-            if len(posture_list) == 0:
-                continue
-            logger.debug(f"<!> {posture_list=}")
-            average_prop_good = sum(
-                [posture.prop_good for posture in posture_list]
-            ) / len(posture_list)
-            new_prop_good_data += [average_prop_good] * POSTURE_GRAPH_DATUM_WIDTH
-        user.accept_new_posture_data(new_prop_good_data)
-
-        user.set_last_snapshot_time(now)
+    # Exit if person not in frame enough
+    average_prop_in_frame = sum(
+        [posture.prop_in_frame for posture in recent_posture_data]
+    ) / len(recent_posture_data)
+    if average_prop_in_frame < PROPORTION_IN_FRAME_THRESHOLD:
+        logger.debug(
+            "<!> Exiting handle_posturing_monitoring_new() early: Not in frame for a high enough proportion of time."
+        )
+        return True
 
-    return True
+    # Sort the list by period_start
+    recent_posture_data = sorted(
+        recent_posture_data, key=lambda posture: posture.period_start
+    )
 
+    # Calculate total time span
+    start_time = recent_posture_data[0].period_start
+    end_time = recent_posture_data[-1].period_end
+    total_time = end_time - start_time
 
-def handle_feedback(user: ControlledData) -> bool:
-    """
-    Provide feedback to the user if necessary.
+    # Calculate the interval length
+    interval = total_time / NUM_DATA_POINTS_PER_TIMEOUT
 
-    Args:
-        user: Data encapsulating the current state of the program.
-    Returns:
-        (bool): True, always. If you get a False return value, then something has gone VERY wrong.
+    # Setup sublists, where each sublist is a portion of the overall data
+    split_posture_lists: list[list[Posture]]
+    split_posture_lists = [[] for _ in range(NUM_DATA_POINTS_PER_TIMEOUT)]
 
-    Requires:
-        ! user.is_failed()
+    # What is in each sublist is determined by period_start
+    # We want an approximately equal amount of data in each sublist
+    for posture in recent_posture_data:
+        index = min(
+            NUM_DATA_POINTS_PER_TIMEOUT - 1,
+            int((posture.period_start - start_time) // interval),
+        )
+        split_posture_lists[index].append(posture)
 
-    Ensures:
-        ! user.is_failed()
-    """
-    if datetime.now() > user.get_last_cushion_time() + HANDLE_CUSHION_FEEDBACK_TIMEOUT:
-        if not handle_cushion_feedback(user):
-            return False
-    if datetime.now() > user.get_last_plant_time() + HANDLE_PLANT_FEEDBACK_TIMEOUT:
-        if not handle_plant_feedback(user):
-            return False
+    new_prop_good_data = []
+    # Enqueue the average good posture for each data point for the graph to use
+    for posture_list in split_posture_lists:
+        if len(posture_list) == 0:
+            continue
+        logger.debug(f"<!> {posture_list=}")
+        average_prop_good = sum([posture.prop_good for posture in posture_list]) / len(
+            posture_list
+        )
+        new_prop_good_data += [average_prop_good] * POSTURE_GRAPH_DATUM_WIDTH
+    user.accept_new_posture_data(new_prop_good_data)
 
     return True
 
 
 def handle_cushion_feedback(user: ControlledData) -> bool:
     """
-    Vibrate cushion (if necessary), and update the timestamp of when cushion feedback was last given.
+    Vibrate cushion (if necessary).
 
     Args:
         user: Data encapsulating the current state of the program.
@@ -369,7 +547,7 @@ def handle_cushion_feedback(user: ControlledData) -> bool:
     logger.debug("<!> handle_cushion_feedback()")
 
     # Load posture records within the last HANDLE_CUSHION_FEEDBACK_TIMEOUT
-    now = datetime.now()
+    now = backend.clock.now()
     recent_posture_data = get_user_postures(
         user.get_user_id(),
         num=-1,
@@ -380,7 +558,6 @@ def handle_cushion_feedback(user: ControlledData) -> bool:
     # Exit if no data
     if len(recent_posture_data) == 0:
         logger.debug("<!> Exiting handle_cushion_feedback() early: No data")
-        user.set_last_cushion_time(datetime.now())
         return True
     # Exit if person not in frame enough
     average_prop_in_frame = sum(
@@ -390,7 +567,6 @@ def handle_cushion_feedback(user: ControlledData) -> bool:
         logger.debug(
             "<!> Exiting handle_cushion_feedback() early: Not in frame for a high enough proportion of time."
         )
-        user.set_last_cushion_time(datetime.now())
         return True
 
     # Get average proportion of good posture
@@ -399,27 +575,25 @@ def handle_cushion_feedback(user: ControlledData) -> bool:
     ) / len(recent_posture_data)
     if average_prop_good >= CUSHION_PROPORTION_GOOD_THRESHOLD:
         logger.debug("<!> Exiting handle_cushion_feedback() early: You sat well :)")
-        user.set_last_cushion_time(datetime.now())
         return True
 
     # If posture not good enough, turn buzzer on
-    buzzer_start_time = datetime.now()
+    GPIO = backend.gpio
+    buzzer_start_time = backend.clock.now()
     GPIO.output(CUSHION_GPIO_PIN, GPIO.HIGH)
     logger.debug("<!> buzzer on")
-    while datetime.now() < buzzer_start_time + CUSHION_ACTIVE_INTERVAL:
-        sleep_ms(100)
+    while backend.clock.now() < buzzer_start_time + CUSHION_ACTIVE_INTERVAL:
+        backend.clock.sleep_ms(100)
     # Turn buzzer off
     GPIO.output(CUSHION_GPIO_PIN, GPIO.LOW)
     logger.debug("<!> buzzer off")
 
-    user.set_last_cushion_time(datetime.now())
     return True
 
 
 def handle_plant_feedback(user: ControlledData) -> bool:
     """
-    Set the plant height according to short-term current session data, and update the timestamp
-    of when plant feedback was last given.
+    Set the plant height according to short-term current session data.
 
     Args:
         user: Data encapsulating the current state of the program.
@@ -434,46 +608,41 @@ def handle_plant_feedback(user: ControlledData) -> bool:
     """
     logger.debug("<!> handle_plant_feedback()")
 
-    now = datetime.now()
+    now = backend.clock.now()
+
+    # Get the most recent posture data for the user
+    recent_posture_data = get_user_postures(
+        user.get_user_id(),
+        num=-1,
+        period_start=now - GET_POSTURE_DATA_TIMEOUT,
+        period_end=now,
+    )
+
+    # Exit if no data
+    if len(recent_posture_data) == 0:
+        logger.debug("<!> Exiting handle_plant_feedback() early: No data")
+        return True
 
-    if now > user.get_last_plant_time() + HANDLE_PLANT_FEEDBACK_TIMEOUT:
-        # Get the most recent posture data for the user
-        recent_posture_data = get_user_postures(
-            user.get_user_id(),
-            num=-1,
-            period_start=now - GET_POSTURE_DATA_TIMEOUT,
-            period_end=now,
+    # Exit if person not in frame enough
+    average_prop_in_frame = sum(
+        [posture.prop_in_frame for posture in recent_posture_data]
+    ) / len(recent_posture_data)
+    if average_prop_in_frame < PROPORTION_IN_FRAME_THRESHOLD:
+        logger.debug(
+            "<!> Exiting handle_plant_feedback() early: Not in frame for a high enough proportion of time."
         )
+        return True
+
+    # Calculate average proportion of good posture
+    average_prop_good = sum(
+        [posture.prop_good for posture in recent_posture_data]
+    ) / len(recent_posture_data)
 
-        # Exit if no data
-        if len(recent_posture_data) == 0:
-            logger.debug("<!> Exiting handle_plant_feedback() early: No data")
-            user.set_last_plant_time(datetime.now())
-            return True
-
-        # Exit if person not in frame enough
-        average_prop_in_frame = sum(
-            [posture.prop_in_frame for posture in recent_posture_data]
-        ) / len(recent_posture_data)
-        if average_prop_in_frame < PROPORTION_IN_FRAME_THRESHOLD:
-            logger.debug(
-                "<!> Exiting handle_plant_feedback() early: Not in frame for a high enough proportion of time."
-            )
-            user.set_last_plant_time(datetime.now())
-            return True
-
-        # Calculate average proportion of good posture
-        average_prop_good = sum(
-            [posture.prop_good for posture in recent_posture_data]
-        ) / len(recent_posture_data)
-
-        # Raise plant 1 'level' if posture is good, otherwise lower it 1.
-        if average_prop_good >= PLANT_PROPORTION_GOOD_THRESHOLD:
-            hardware.set_plant_height(hardware.plant_height + 1)
-        else:
-            hardware.set_plant_height(hardware.plant_height - 1)
-
-        user.set_last_plant_time(datetime.now())
+    # Raise plant 1 'level' if posture is good, otherwise lower it 1.
+    if average_prop_good >= PLANT_PROPORTION_GOOD_THRESHOLD:
+        hardware.set_plant_height(hardware.plant_height + 1)
+    else:
+        hardware.set_plant_height(hardware.plant_height - 1)
 
     return True
 
@@ -484,9 +653,8 @@ def _reset_garden() -> None:
 
     global hardware
 
-    destroy_database()
-    logger.debug("\t<!> initialising database anew...")
-    init_database()
+    logger.debug("\t<!> clearing database...")
+    reset_database()
     logger.debug("\t<!> resetting face embeddings...")
     reset_registered_face_embeddings()
     logger.debug("\t<!> initialising hardware...")
@@ -497,5 +665,4 @@ def _reset_garden() -> None:
 # LAUNCH
 
 if __name__ == "__main__":
-    hardware = initialise_hardware()
     main()
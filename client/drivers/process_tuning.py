@@ -0,0 +1,157 @@
+"""
+CPU affinity, priority and thread count settings for the garden's processes.
+
+Left alone, the posture model, face recognition and the UI loop all compete for every core at
+the same priority, so a burst of inference makes the OLED and buttons stutter. A tuning file
+gives each role of process the CPUs it may run on, its niceness and scheduling policy, and how
+many threads its numerical libraries may start, for example:
+
+    {
+        "overlord": {"cpus": [0], "nice": -5},
+        "camera": {"cpus": [0, 1]},
+        "posture": {"cpus": [2, 3], "nice": 5, "policy": "batch", "threads": 2},
+        "recognition": {"cpus": [1], "nice": 10, "policy": "batch", "threads": 1}
+    }
+
+Settings are applied by each process to itself as it starts, and are inherited by programs it
+runs. The pose model's inference threads aren't set here, but by its InferenceConfig (see
+models/pose_detection/autotune.py); without one they are bounded by the CPUs the process may run
+on. Only the standard library is used, as overlord_overlord.py may run under a different Python
+to the rest of the client.
+"""
+
+import json
+import logging
+import os
+import sys
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+#: Role of pi_overlord.py, which runs the UI loop.
+OVERLORD = "overlord"
+#: Role of camera_overlord.py.
+CAMERA = "camera"
+#: Role of the posture tracking process.
+POSTURE = "posture"
+#: Role of the face recognition worker.
+RECOGNITION = "recognition"
+#: Every role that can be tuned.
+ROLES = (OVERLORD, CAMERA, POSTURE, RECOGNITION)
+
+#: Scheduling policies by name. "batch" marks CPU-bound work the kernel may delay slightly for
+#: interactive processes, and "idle" only runs when nothing else wants the CPU.
+POLICIES = {
+    "other": getattr(os, "SCHED_OTHER", None),
+    "batch": getattr(os, "SCHED_BATCH", None),
+    "idle": getattr(os, "SCHED_IDLE", None),
+}
+#: Environment variables that limit the threads started by OpenMP and BLAS libraries. They must
+#: be set before those libraries are loaded.
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+logger = logging.getLogger(__name__)
+
+
+class ProcessTuning(NamedTuple):
+    """Scheduling settings for one role of process. Unset settings are inherited.
+
+    Attributes:
+        cpus: CPUs the process may run on.
+        nice: Niceness, from -20 (highest priority, needs root) to 19 (lowest).
+        policy: Name of a scheduling policy in POLICIES.
+        threads: Most threads the process's numerical libraries may each start.
+    """
+
+    cpus: Optional[frozenset[int]] = None
+    nice: Optional[int] = None
+    policy: Optional[str] = None
+    threads: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, settings: dict) -> "ProcessTuning":
+        """
+        Args:
+            settings: One role's settings from a tuning file.
+
+        Returns:
+            The settings, validated.
+
+        Raises:
+            ValueError: A setting is unknown or out of range.
+        """
+        unknown = set(settings) - set(cls._fields)
+        if unknown:
+            raise ValueError(f"Unknown process tuning settings {sorted(unknown)}")
+
+        tuning = cls(
+            cpus=frozenset(settings["cpus"]) if "cpus" in settings else None,
+            nice=settings.get("nice"),
+            policy=settings.get("policy"),
+            threads=settings.get("threads"),
+        )
+        if tuning.nice is not None and not -20 <= tuning.nice <= 19:
+            raise ValueError(f"Niceness {tuning.nice} is outside -20 to 19")
+        if tuning.policy is not None and tuning.policy not in POLICIES:
+            raise ValueError(f"Scheduling policy must be one of {list(POLICIES)}")
+        if tuning.threads is not None and tuning.threads < 1:
+            raise ValueError("Thread count must be at least 1")
+        return tuning
+
+    def environment(self) -> dict[str, str]:
+        """
+        Returns:
+            Environment variables limiting library thread pools, to set before they are loaded.
+        """
+        if self.threads is None:
+            return {}
+        return {variable: str(self.threads) for variable in THREAD_VARIABLES}
+
+    def apply(self) -> None:
+        """Apply the settings to the calling process, and to the threads and processes it starts
+        from now on. Settings the platform or the process's privileges don't allow are skipped
+        with a warning.
+        """
+        os.environ.update(self.environment())
+
+        if self.cpus is not None:
+            try:
+                os.sched_setaffinity(0, self.cpus)
+            except (AttributeError, OSError) as error:
+                logger.warning("Couldn't pin to CPUs %s: %s", sorted(self.cpus), error)
+
+        if self.policy is not None:
+            policy = POLICIES[self.policy]
+            try:
+                os.sched_setscheduler(0, policy, os.sched_param(0))
+            except (AttributeError, TypeError, OSError) as error:
+                logger.warning("Couldn't use the %s policy: %s", self.policy, error)
+
+        # After the policy, as changing policy can reset the niceness
+        if self.nice is not None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, 0, self.nice)
+            except OSError as error:
+                logger.warning("Couldn't set niceness %d: %s", self.nice, error)
+
+        # OpenCV sizes its pool from the CPUs it may run on when loaded, so only needs telling
+        # if it already has been
+        if self.threads is not None and "cv2" in sys.modules:
+            sys.modules["cv2"].setNumThreads(self.threads)
+
+
+def load_tuning(path: Path) -> dict[str, ProcessTuning]:
+    """
+    Args:
+        path: JSON tuning file, mapping roles in ROLES to their settings.
+
+    Returns:
+        Settings by role. Roles missing from the file aren't included.
+
+    Raises:
+        ValueError: The file has an unknown role or an invalid setting.
+    """
+    settings = json.loads(path.read_text())
+    unknown = set(settings) - set(ROLES)
+    if unknown:
+        raise ValueError(f"Unknown process roles {sorted(unknown)}")
+    return {role: ProcessTuning.from_dict(values) for role, values in settings.items()}
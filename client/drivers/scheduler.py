@@ -0,0 +1,214 @@
+"""
+Periodic job scheduler for the user session loop.
+
+Jobs are kept in a heap ordered by their next monotonic deadline, so the loop can sleep
+exactly until there is work to do instead of waking on a fixed tick to check timestamps.
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from drivers.clock import SYSTEM_CLOCK, Clock
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobStats:
+    """Run time and punctuality of a scheduled job. Times are in seconds.
+
+    Attributes:
+        runs: Number of times the job has run.
+        total_time: Total time spent running the job, according to the scheduler's clock.
+        cpu_time: Total process CPU time spent running the job.
+        max_time: Longest single run of the job.
+        max_lateness: Longest delay between a deadline and the job starting.
+        overruns: Number of deadlines skipped because the job fell a whole interval behind.
+    """
+
+    runs: int = 0
+    total_time: float = 0.0
+    cpu_time: float = 0.0
+    max_time: float = 0.0
+    max_lateness: float = 0.0
+    overruns: int = 0
+
+    @property
+    def mean_time(self) -> float:
+        """Mean time spent per run of the job."""
+        return self.total_time / self.runs if self.runs else 0.0
+
+
+@dataclass
+class Job:
+    """A periodic job.
+
+    Attributes:
+        name: Unique name for the job.
+        interval: Seconds between consecutive deadlines.
+        callback: Function run at each deadline.
+        jitter: Each deadline is moved by up to this many seconds either way.
+        stats: Run time and punctuality of the job.
+    """
+
+    name: str
+    interval: float
+    callback: Callable[[], object]
+    jitter: float = 0.0
+    stats: JobStats = field(default_factory=JobStats)
+    #: Deadline before jitter is applied, so jitter does not accumulate.
+    _nominal_deadline: float = 0.0
+
+
+class Scheduler:
+    """Runs periodic jobs at their deadlines, sleeping in between."""
+
+    def __init__(self, clock: Clock = SYSTEM_CLOCK) -> None:
+        """
+        Args:
+            clock: Clock providing deadlines and sleep.
+        """
+        self._clock = clock
+        self._jobs: dict[str, Job] = {}
+        self._queue: list[tuple[float, int, Job]] = []
+        self._counter = itertools.count()
+        self._running = False
+
+    @property
+    def stats(self) -> dict[str, JobStats]:
+        """Run time and punctuality of each job, by name."""
+        return {name: job.stats for name, job in self._jobs.items()}
+
+    def add_job(
+        self,
+        name: str,
+        interval: float,
+        callback: Callable[[], object],
+        jitter: float = 0.0,
+        delay: Optional[float] = None,
+    ) -> None:
+        """Register a periodic job.
+
+        Args:
+            name: Unique name for the job.
+            interval: Seconds between consecutive runs.
+            callback: Function to run.
+            jitter: Move each deadline by a random amount of up to this many seconds.
+            delay: Seconds until the first run. Defaults to one interval.
+        """
+        if name in self._jobs:
+            raise ValueError(f"Job already scheduled: {name}")
+        if interval <= 0:
+            raise ValueError("Job interval must be positive")
+
+        job = Job(name, interval, callback, jitter)
+        job._nominal_deadline = self._clock.monotonic() + (
+            interval if delay is None else delay
+        )
+        self._jobs[name] = job
+        self._push(job)
+
+    def remove_job(self, name: str) -> None:
+        """Unregister a job. Its pending deadline is discarded lazily."""
+        self._jobs.pop(name, None)
+
+    def time_until_next(self) -> Optional[float]:
+        """
+        Returns:
+            Seconds until the next deadline (0 if one has passed), or None if there are no jobs.
+        """
+        self._discard_removed()
+        if len(self._queue) == 0:
+            return None
+        return max(self._queue[0][0] - self._clock.monotonic(), 0.0)
+
+    def run_pending(self) -> int:
+        """Run every job whose deadline has passed, earliest deadline first.
+
+        Returns:
+            Number of jobs run.
+        """
+        ran = 0
+        while True:
+            self._discard_removed()
+            if len(self._queue) == 0 or self._queue[0][0] > self._clock.monotonic():
+                return ran
+
+            deadline, _, job = heapq.heappop(self._queue)
+            self._run(job, deadline)
+            ran += 1
+
+            # The job may have removed itself
+            if self._jobs.get(job.name) is job:
+                self._reschedule(job)
+
+    def run(self) -> None:
+        """Run jobs until stop() is called or no jobs are left, sleeping between deadlines."""
+        self._running = True
+        while self._running:
+            self.run_pending()
+            if not self._running:
+                break
+            wait = self.time_until_next()
+            if wait is None:
+                break
+            self._clock.sleep(wait)
+        self._running = False
+
+    def stop(self) -> None:
+        """Make run() return once the current job finishes."""
+        self._running = False
+
+    def log_stats(self) -> None:
+        """Log run time and punctuality statistics for each job."""
+        for name, stats in self.stats.items():
+            logger.debug(
+                "<!> job %s: %d runs, mean %.1f ms, max %.1f ms, max late %.1f ms, %d overruns",
+                name,
+                stats.runs,
+                1000 * stats.mean_time,
+                1000 * stats.max_time,
+                1000 * stats.max_lateness,
+                stats.overruns,
+            )
+
+    def _run(self, job: Job, deadline: float) -> None:
+        start = self._clock.monotonic()
+        cpu_start = time.process_time()
+        job.callback()
+        cpu_end = time.process_time()
+        end = self._clock.monotonic()
+
+        stats = job.stats
+        stats.runs += 1
+        stats.total_time += end - start
+        stats.cpu_time += cpu_end - cpu_start
+        stats.max_time = max(stats.max_time, end - start)
+        stats.max_lateness = max(stats.max_lateness, start - deadline)
+
+    def _reschedule(self, job: Job) -> None:
+        job._nominal_deadline += job.interval
+        now = self._clock.monotonic()
+        if job._nominal_deadline <= now:
+            # Fell at least a whole interval behind; skip the missed runs
+            missed = int((now - job._nominal_deadline) // job.interval) + 1
+            job.stats.overruns += missed
+            job._nominal_deadline += missed * job.interval
+        self._push(job)
+
+    def _push(self, job: Job) -> None:
+        jitter = random.uniform(-job.jitter, job.jitter) if job.jitter > 0 else 0.0
+        deadline = job._nominal_deadline + jitter
+        heapq.heappush(self._queue, (deadline, next(self._counter), job))
+
+    def _discard_removed(self) -> None:
+        while (
+            self._queue
+            and self._jobs.get(self._queue[0][2].name) is not self._queue[0][2]
+        ):
+            heapq.heappop(self._queue)
@@ -0,0 +1,566 @@
+"""
+Simulated stand-ins for the Raspberry Pi hardware, so the control loop can run (and be
+profiled) on any Linux machine. Each class mirrors the parts of the RPi.GPIO / PiicoDev /
+Picamera2 API that the client uses.
+"""
+
+import logging
+from collections import deque
+from importlib import resources
+from pathlib import Path
+from struct import pack_into
+from typing import Any, Iterable, NamedTuple, Optional
+
+import numpy as np
+
+from drivers.clock import SYSTEM_CLOCK, Clock
+from drivers.text_cache import DISPLAY_HEIGHT, DISPLAY_WIDTH, FONT_FILE
+
+#: Scripted switch event for a single press.
+PRESS = "press"
+#: Scripted switch event for a double press. Like the real switch, this also counts as a press.
+DOUBLE_PRESS = "double_press"
+
+logger = logging.getLogger(__name__)
+
+
+class GPIOEvent(NamedTuple):
+    """A logged call to the simulated GPIO module.
+
+    Attributes:
+        time: Clock.monotonic() timestamp of the call.
+        function: Name of the GPIO function called.
+        channel: Pin the call applied to, or None for module-wide calls.
+        value: Value written or mode set, if any.
+    """
+
+    time: float
+    function: str
+    channel: Optional[int]
+    value: Optional[int]
+
+
+class SimulatedGPIO:
+    """Logs calls in place of the RPi.GPIO module. Constants match RPi.GPIO.
+
+    Attributes:
+        log: Every call made, in order.
+    """
+
+    BOARD = 10
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self, clock: Clock = SYSTEM_CLOCK) -> None:
+        self.log: list[GPIOEvent] = []
+        self._clock = clock
+        self._levels: dict[int, int] = {}
+
+    def setmode(self, mode: int) -> None:
+        self._log("setmode", None, mode)
+
+    def setwarnings(self, flag: bool) -> None:
+        self._log("setwarnings", None, int(flag))
+
+    def setup(self, channel: int, direction: int, initial: int = LOW) -> None:
+        self._levels[channel] = initial
+        self._log("setup", channel, direction)
+
+    def output(self, channel: int, value: int) -> None:
+        self._levels[channel] = int(value)
+        self._log("output", channel, int(value))
+
+    def input(self, channel: int) -> int:
+        value = self._levels.get(channel, self.LOW)
+        self._log("input", channel, value)
+        return value
+
+    def cleanup(self) -> None:
+        self._levels.clear()
+        self._log("cleanup", None, None)
+
+    def _log(self, function: str, channel: Optional[int], value: Optional[int]) -> None:
+        logger.debug("<sim> GPIO.%s(%s, %s)", function, channel, value)
+        self.log.append(GPIOEvent(self._clock.monotonic(), function, channel, value))
+
+
+class SimulatedSwitch:
+    """Stands in for a PiicoDev_Switch, replaying scripted presses.
+
+    Presses become visible once their scheduled time has passed, and are cleared on read in
+    the same way as the real switch's `was_pressed` and `was_double_pressed`.
+    """
+
+    def __init__(
+        self,
+        id: Optional[list[int]] = None,
+        double_press_duration: int = 300,
+        events: Iterable[tuple[float, str]] = (),
+        clock: Clock = SYSTEM_CLOCK,
+        **kwargs,
+    ) -> None:
+        """
+        Args:
+            id: Address switch positions, kept for logging only.
+            double_press_duration: Kept for parity with PiicoDev_Switch.
+            events: (seconds after creation, PRESS or DOUBLE_PRESS) pairs to replay.
+            clock: Clock the event times are measured against.
+        """
+        self.id = id
+        self.double_press_duration = double_press_duration
+        self.led = True
+        self._clock = clock
+        self._start = clock.monotonic()
+        self._events = deque(sorted(events))
+        self._press_count = 0
+        self._was_pressed = False
+        self._was_double_pressed = False
+
+    def press(self) -> None:
+        """Press the switch now."""
+        logger.debug("<sim> switch %s pressed", self.id)
+        self._press_count += 1
+        self._was_pressed = True
+
+    def double_press(self) -> None:
+        """Double press the switch now."""
+        logger.debug("<sim> switch %s double pressed", self.id)
+        self._press_count += 2
+        self._was_pressed = True
+        self._was_double_pressed = True
+
+    @property
+    def is_pressed(self) -> bool:
+        return False
+
+    @property
+    def press_count(self) -> int:
+        self._replay_due_events()
+        count, self._press_count = self._press_count, 0
+        return count
+
+    @property
+    def was_pressed(self) -> bool:
+        self._replay_due_events()
+        pressed, self._was_pressed = self._was_pressed, False
+        return pressed
+
+    @property
+    def was_double_pressed(self) -> bool:
+        self._replay_due_events()
+        pressed, self._was_double_pressed = self._was_double_pressed, False
+        return pressed
+
+    def _replay_due_events(self) -> None:
+        elapsed = self._clock.monotonic() - self._start
+        while self._events and self._events[0][0] <= elapsed:
+            _, event = self._events.popleft()
+            if event == DOUBLE_PRESS:
+                self.double_press()
+            else:
+                self.press()
+
+
+class ServoMove(NamedTuple):
+    """A period over which the simulated servo ran at a constant non-zero speed.
+
+    Attributes:
+        start: Clock.monotonic() timestamp the speed was set.
+        end: Clock.monotonic() timestamp the speed was changed.
+        speed: Speed the servo ran at.
+    """
+
+    start: float
+    end: float
+    speed: float
+
+
+class SimulatedServo:
+    """Stands in for a continuous rotation PiicoDev_Servo, recording how long it ran for.
+
+    Attributes:
+        moves: Every completed period of non-zero speed, in order.
+    """
+
+    def __init__(
+        self,
+        channel: int,
+        midpoint_us: Optional[int] = None,
+        range_us: Optional[int] = None,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        self.channel = channel
+        self.midpoint_us = midpoint_us
+        self.range_us = range_us
+        self.moves: list[ServoMove] = []
+        self._clock = clock
+        self._speed = 0.0
+        self._angle: Optional[float] = None
+        self._since = clock.monotonic()
+
+    @property
+    def speed(self) -> float:
+        return self._speed
+
+    @speed.setter
+    def speed(self, speed: float) -> None:
+        now = self._clock.monotonic()
+        if self._speed != 0:
+            self.moves.append(ServoMove(self._since, now, self._speed))
+            logger.debug(
+                "<sim> servo %d ran at %.3f for %.3fs",
+                self.channel,
+                self._speed,
+                now - self._since,
+            )
+        self._speed = speed
+        self._since = now
+
+    @property
+    def angle(self) -> Optional[float]:
+        return self._angle
+
+    @angle.setter
+    def angle(self, angle: float) -> None:
+        self._angle = angle
+
+    def release(self) -> None:
+        self.speed = 0
+
+    def running_time(self, direction: int = 0) -> float:
+        """Total time (seconds) spent moving.
+
+        Args:
+            direction: 1 for positive speeds only, -1 for negative speeds only, 0 for both.
+        """
+        return sum(
+            move.end - move.start
+            for move in self.moves
+            if direction == 0 or (move.speed > 0) == (direction > 0)
+        )
+
+
+class SimulatedDisplay:
+    """Stands in for a PiicoDev_SSD1306, drawing into the same page-ordered framebuffer.
+
+    Drawing follows PiicoDev's Linux framebuffer code, including counting the I2C commands
+    it would have sent, so timings are comparable with the real driver minus the bus.
+
+    Attributes:
+        buffer: SSD1306 framebuffer; byte x + 128 * page holds rows 8 * page to 8 * page + 7.
+        commands: Number of I2C commands that would have been sent.
+        frames: Number of times show() has been called.
+        frame_dir: If set, every shown frame is saved here as a PBM image.
+    """
+
+    width = DISPLAY_WIDTH
+    height = DISPLAY_HEIGHT
+
+    class graph2D:
+        def __init__(
+            self,
+            originX=0,
+            originY=DISPLAY_HEIGHT - 1,
+            width=DISPLAY_WIDTH,
+            height=DISPLAY_HEIGHT,
+            minValue=0,
+            maxValue=255,
+            c=1,
+            bars=False,
+        ):
+            self.minValue = minValue
+            self.maxValue = maxValue
+            self.originX = originX
+            self.originY = originY
+            self.width = width
+            self.height = height
+            self.c = c
+            self.m = (1 - height) / (maxValue - minValue)
+            self.offset = originY - self.m * minValue
+            self.bars = bars
+            self.data = []
+
+    def __init__(self, frame_dir: Optional[Path] = None) -> None:
+        self.buffer = bytearray(DISPLAY_WIDTH * DISPLAY_HEIGHT // 8)
+        self.commands = 0
+        self.frames = 0
+        self.frame_dir = frame_dir
+        if frame_dir is not None:
+            frame_dir.mkdir(parents=True, exist_ok=True)
+
+    def write_cmd(self, cmd: int) -> None:
+        self.commands += 1
+
+    def poweroff(self) -> None:
+        self.write_cmd(0xAE)
+
+    def poweron(self) -> None:
+        self.write_cmd(0xAF)
+
+    def setContrast(self, contrast: int) -> None:
+        self.write_cmd(0x81)
+        self.write_cmd(contrast)
+
+    def invert(self, invert: int) -> None:
+        self.write_cmd(0xA6 | (invert & 1))
+
+    def rotate(self, rotate: int) -> None:
+        self.write_cmd(0xC0 | ((rotate & 1) << 3))
+        self.write_cmd(0xA0 | (rotate & 1))
+
+    def show(self) -> None:
+        for _ in range(6):
+            self.write_cmd(0)
+        self.frames += 1
+        if self.frame_dir is not None:
+            self.save_image(self.frame_dir / f"frame_{self.frames:06d}.pbm")
+
+    def fill(self, c: int = 0) -> None:
+        for i in range(len(self.buffer)):
+            self.buffer[i] = 0xFF if c > 0 else 0x00
+
+    def pixel(self, x: int, y: int, color: int) -> None:
+        x = x & (DISPLAY_WIDTH - 1)
+        y = y & (DISPLAY_HEIGHT - 1)
+        page, shift_page = divmod(y, 8)
+        ind = x + page * DISPLAY_WIDTH
+        b = (
+            self.buffer[ind] | (1 << shift_page)
+            if color
+            else self.buffer[ind] & ~(1 << shift_page)
+        )
+        pack_into(">B", self.buffer, ind, b)
+        # PiicoDev sets the RAM position after every pixel
+        self.write_cmd(0xB0 | page)
+        self.write_cmd(0x00 | (x * 2 & 0x0F))
+        self.write_cmd(0x10 | (x >> 3))
+
+    def line(self, x1: int, y1: int, x2: int, y2: int, c: int) -> None:
+        steep = abs(y2 - y1) > abs(x2 - x1)
+        if steep:
+            x1, y1 = y1, x1
+            x2, y2 = y2, x2
+        if x1 > x2:
+            x1, x2 = x2, x1
+            y1, y2 = y2, y1
+
+        dx = x2 - x1
+        dy = abs(y2 - y1)
+        err = dx / 2
+        ystep = 1 if y1 < y2 else -1
+        while x1 <= x2:
+            if steep:
+                self.pixel(y1, x1, c)
+            else:
+                self.pixel(x1, y1, c)
+            err -= dy
+            if err < 0:
+                y1 += ystep
+                err += dx
+            x1 += 1
+
+    def hline(self, x: int, y: int, l: int, c: int) -> None:
+        self.line(x, y, x + l, y, c)
+
+    def vline(self, x: int, y: int, h: int, c: int) -> None:
+        self.line(x, y, x, y + h, c)
+
+    def rect(self, x: int, y: int, w: int, h: int, c: int) -> None:
+        self.hline(x, y, w, c)
+        self.hline(x, y + h, w, c)
+        self.vline(x, y, h, c)
+        self.vline(x + w, y, h, c)
+
+    def fill_rect(self, x: int, y: int, w: int, h: int, c: int) -> None:
+        for i in range(y, y + h):
+            self.hline(x, i, w, c)
+
+    def text(self, text: str, x: int, y: int, c: int = 1) -> None:
+        # PiicoDev re-reads the font on every call
+        with resources.as_file(FONT_FILE) as font_file:
+            font = font_file.read_bytes()
+        for text_index in range(len(text)):
+            for col in range(8):
+                column = font[(ord(text[text_index]) - 32) * 8 + col]
+                for i in range(7):
+                    if column & 1 << i != 0:
+                        x_coordinate = x + col + text_index * 8
+                        y_coordinate = y + i
+                        if (
+                            x_coordinate < DISPLAY_WIDTH
+                            and y_coordinate < DISPLAY_HEIGHT
+                        ):
+                            self.pixel(x_coordinate, y_coordinate, c)
+
+    def updateGraph2D(self, graph: "SimulatedDisplay.graph2D", value: float) -> None:
+        graph.data.insert(0, value)
+        if len(graph.data) > graph.width:
+            graph.data.pop()
+        x = graph.originX + graph.width - 1
+        for value in graph.data:
+            y = round(graph.m * value + graph.offset)
+            low, high = graph.originY - graph.height, graph.originY
+            in_x = graph.originX <= x < graph.originX + graph.width
+            if graph.bars:
+                for idx in range(y, graph.originY + 1):
+                    if in_x and low < idx <= high:
+                        self.pixel(x, idx, graph.c)
+            elif in_x and low < y <= high:
+                self.pixel(x, y, graph.c)
+            x -= 1
+
+    def get_pixel(self, x: int, y: int) -> int:
+        """
+        Returns:
+            1 if the pixel at (x, y) is lit, 0 otherwise.
+        """
+        page, shift = divmod(y, 8)
+        return (self.buffer[x + page * DISPLAY_WIDTH] >> shift) & 1
+
+    def save_image(self, path: Path) -> None:
+        """Save the current framebuffer as a binary PBM image.
+
+        Args:
+            path: File to write.
+        """
+        rows = bytearray()
+        for y in range(DISPLAY_HEIGHT):
+            for x_byte in range(0, DISPLAY_WIDTH, 8):
+                packed = 0
+                for x in range(x_byte, x_byte + 8):
+                    packed = (packed << 1) | self.get_pixel(x, y)
+                rows.append(packed)
+        header = f"P4\n{DISPLAY_WIDTH} {DISPLAY_HEIGHT}\n".encode()
+        path.write_bytes(header + bytes(rows))
+
+
+class SimulatedCameraRequest:
+    """Stands in for a picamera2 CompletedRequest holding one synthetic frame."""
+
+    def __init__(
+        self, streams: dict[str, dict[str, Any]], index: int, timestamp: int
+    ) -> None:
+        self._streams = streams
+        self._index = index
+        self._timestamp = timestamp
+
+    def make_array(self, name: str) -> np.ndarray:
+        """
+        Args:
+            name: Stream to get, "main" or "lores".
+
+        Returns:
+            Horizontal gradient which moves one pixel per frame, in the stream's format: HxWx3
+                BGR for "RGB888", or (H * 3 / 2)xW I420 for "YUV420".
+        """
+        stream = self._streams[name]
+        width, height = stream["size"]
+        row = ((np.arange(width) + self._index) % 256).astype(np.uint8)
+        if stream.get("format") == "YUV420":
+            pixels = np.full((height * 3 // 2, width), 128, dtype=np.uint8)
+            pixels[:height] = row
+            return pixels
+        return np.repeat(np.tile(row, (height, 1))[:, :, np.newaxis], 3, axis=2)
+
+    def get_metadata(self) -> dict[str, Any]:
+        """
+        Returns:
+            Frame metadata, with the sensor timestamp in nanoseconds.
+        """
+        return {"SensorTimestamp": self._timestamp}
+
+    def save(self, name: str, path: str) -> None:
+        """Save a stream as a JPEG.
+
+        Args:
+            name: Stream to save.
+            path: File to write.
+        """
+        import cv2
+
+        pixels = self.make_array(name)
+        if pixels.ndim == 2:
+            pixels = cv2.cvtColor(pixels, cv2.COLOR_YUV2BGR_I420)
+        cv2.imwrite(path, pixels)
+
+    def release(self) -> None:
+        """Return the buffers to the camera. Nothing to do for synthetic frames."""
+
+
+class SimulatedPicamera2:
+    """Stands in for a Picamera2, producing synthetic frames at the sensor's frame rate.
+
+    Attributes:
+        options: Picamera2 options, such as JPEG "quality".
+        frames: Number of frames captured.
+    """
+
+    def __init__(self, frame_rate: float = 30.0, clock: Clock = SYSTEM_CLOCK) -> None:
+        """
+        Args:
+            frame_rate: Frames per second the simulated sensor produces.
+            clock: Clock to pace frames with.
+        """
+        self.options: dict[str, Any] = {}
+        self.frames = 0
+        self._frame_time = 1 / frame_rate
+        self._clock = clock
+        self._streams: dict[str, dict[str, Any]] = {}
+        self._started = False
+        self._next_frame = 0.0
+
+    def create_still_configuration(
+        self, main: Optional[dict[str, Any]] = None
+    ) -> dict[str, Any]:
+        return {"main": {"format": "RGB888", **(main or {})}}
+
+    def create_video_configuration(
+        self,
+        main: Optional[dict[str, Any]] = None,
+        lores: Optional[dict[str, Any]] = None,
+    ) -> dict[str, Any]:
+        config = {"main": {"format": "RGB888", **(main or {})}}
+        if lores is not None:
+            config["lores"] = {"format": "YUV420", **lores}
+        return config
+
+    def configure(self, config: dict[str, Any]) -> None:
+        self._streams = config
+
+    def start(self) -> None:
+        self._started = True
+        self._next_frame = self._clock.monotonic()
+
+    def stop(self) -> None:
+        self._started = False
+
+    def close(self) -> None:
+        self.stop()
+
+    def capture_request(self) -> SimulatedCameraRequest:
+        """Wait for the next frame from the sensor.
+
+        Returns:
+            The frame.
+        """
+        if not self._started:
+            raise RuntimeError("Camera must be started before capturing")
+
+        now = self._clock.monotonic()
+        if now < self._next_frame:
+            self._clock.sleep(self._next_frame - now)
+            now = self._next_frame
+        # Frames that nobody waited for are dropped, like the real camera's buffer queue
+        self._next_frame = now + self._frame_time
+
+        self.frames += 1
+        return SimulatedCameraRequest(self._streams, self.frames, int(now * 1e9))
+
+    def capture_file(self, path: str) -> None:
+        """Capture a frame of the main stream to a JPEG."""
+        request = self.capture_request()
+        request.save("main", path)
+        request.release()
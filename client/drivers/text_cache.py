@@ -0,0 +1,183 @@
+"""
+Cache of pre-rendered text lines for the OLED display.
+
+The PiicoDev SSD1306 driver draws text one pixel at a time, re-reading the font file and
+issuing I2C position commands for every lit pixel. The control messages and login prompts
+are the same handful of strings on every refresh, so we rasterise each wrapped line once
+into column bytes and copy them straight into the display's framebuffer afterwards.
+"""
+
+from collections import OrderedDict
+from importlib import resources
+from typing import NamedTuple
+
+#: Font used by PiicoDev_SSD1306.text(). Eight column bytes per glyph, starting at " ".
+FONT_FILE = resources.files("drivers").joinpath("font-pet-me-128.dat")
+#: Width (in pixels) of a single glyph.
+GLYPH_WIDTH = 8
+#: PiicoDev only draws the first 7 rows of each glyph; mask off the 8th.
+GLYPH_ROW_MASK = 0x7F
+#: Default number of rendered texts to keep around.
+DEFAULT_MAX_ENTRIES = 64
+
+#: Dimensions of the PiicoDev OLED display, in pixels.
+DISPLAY_WIDTH = 128
+DISPLAY_HEIGHT = 64
+DISPLAY_PAGES = DISPLAY_HEIGHT // 8
+
+# Translation tables for splitting a column byte across two pages when y is not page aligned.
+_LOW_PAGE_TABLES = [bytes((b << s) & 0xFF for b in range(256)) for s in range(8)]
+_HIGH_PAGE_TABLES = [bytes(b >> (8 - s) for b in range(256)) for s in range(8)]
+_GLYPH_ROW_TABLE = bytes(b & GLYPH_ROW_MASK for b in range(256))
+
+
+class RenderedText(NamedTuple):
+    """A text rasterised into wrapped lines.
+
+    Attributes:
+        lines: Column bytes for each wrapped line. Bit i of a byte is row i of that column.
+        colour: 0 (black) or 1 (white).
+    """
+
+    lines: tuple[bytes, ...]
+    colour: int
+
+
+class TextLineCache:
+    """LRU cache of rendered text lines keyed by (text, colour, line width).
+
+    Attributes:
+        hits: Number of lookups served from the cache.
+        misses: Number of lookups that had to rasterise the text.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        """
+        Args:
+            max_entries: Maximum number of rendered texts to keep.
+        """
+        self.hits = 0
+        self.misses = 0
+        self._max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, int, int], RenderedText] = OrderedDict()
+        with resources.as_file(FONT_FILE) as font_file:
+            self._font = font_file.read_bytes()
+
+    def render(self, text: str, colour: int, line_width: int) -> RenderedText:
+        """Get the rendered lines for a text, rasterising it if it isn't cached.
+
+        Args:
+            text: String to render.
+            colour: 0 (black), 1 (white).
+            line_width: Number of characters per line before wrapping.
+
+        Returns:
+            The rendered text.
+        """
+        key = (text, colour, line_width)
+        rendered = self._entries.get(key)
+        if rendered is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return rendered
+
+        self.misses += 1
+        chunks = [text[i : i + line_width] for i in range(0, len(text), line_width)]
+        rendered = RenderedText(
+            tuple(self._rasterise(chunk) for chunk in chunks), colour
+        )
+        self._entries[key] = rendered
+        if len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+        return rendered
+
+    def draw(
+        self,
+        display,
+        text: str,
+        x: int,
+        y: int,
+        colour: int,
+        line_width: int,
+        line_height: int,
+    ) -> int:
+        """Draw text on the display, wrapping lines if necessary.
+
+        Falls back to `display.text()` when the display has no SSD1306 framebuffer, or
+        the text or position is something the font blit does not handle.
+
+        Args:
+            display: PiicoDev_SSD1306 (or compatible) display to draw on.
+            text: String to write to the display.
+            x: Horizontal coordinate from left side of screen.
+            y: Vertical coordinate from top side of screen.
+            colour: 0 (black), 1 (white).
+            line_width: Number of characters per line before wrapping.
+            line_height: Number of pixels between the tops of consecutive lines.
+
+        Returns:
+            The y-value at which any subsequent lines should start printing from.
+        """
+        if not self._can_blit(display, text, x, y):
+            chunks = [text[i : i + line_width] for i in range(0, len(text), line_width)]
+            for index, chunk in enumerate(chunks):
+                display.text(chunk, x, y + index * line_height, colour)
+            return y + len(chunks) * line_height
+
+        rendered = self.render(text, colour, line_width)
+        for index, line in enumerate(rendered.lines):
+            _blit(display.buffer, line, x, y + index * line_height, rendered.colour)
+        return y + len(rendered.lines) * line_height
+
+    def clear(self) -> None:
+        """Drop all cached texts and reset the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _can_blit(self, display, text: str, x: int, y: int) -> bool:
+        buffer = getattr(display, "buffer", None)
+        if (
+            not isinstance(buffer, bytearray)
+            or len(buffer) != DISPLAY_WIDTH * DISPLAY_PAGES
+        ):
+            return False
+        if x < 0 or y < 0:
+            return False
+        max_char = 32 + len(self._font) // GLYPH_WIDTH
+        return all(32 <= ord(char) < max_char for char in text)
+
+    def _rasterise(self, chunk: str) -> bytes:
+        columns = bytearray()
+        for char in chunk:
+            start = (ord(char) - 32) * GLYPH_WIDTH
+            columns += self._font[start : start + GLYPH_WIDTH]
+        return bytes(columns).translate(_GLYPH_ROW_TABLE)
+
+
+def _blit(buffer: bytearray, columns: bytes, x: int, y: int, colour: int) -> None:
+    """Merge a rendered line into an SSD1306 page-ordered framebuffer, clipping at the edges."""
+    page, shift = divmod(y, 8)
+    width = min(len(columns), DISPLAY_WIDTH - x)
+    if width <= 0 or page >= DISPLAY_PAGES:
+        return
+    columns = columns[:width]
+
+    _merge(
+        buffer,
+        page * DISPLAY_WIDTH + x,
+        columns.translate(_LOW_PAGE_TABLES[shift]),
+        colour,
+    )
+    if shift != 0 and page + 1 < DISPLAY_PAGES:
+        offset = (page + 1) * DISPLAY_WIDTH + x
+        _merge(buffer, offset, columns.translate(_HIGH_PAGE_TABLES[shift]), colour)
+
+
+def _merge(buffer: bytearray, offset: int, mask: bytes, colour: int) -> None:
+    """Set (colour 1) or clear (colour 0) the bits of mask in buffer, starting at offset."""
+    end = offset + len(mask)
+    current = int.from_bytes(buffer[offset:end], "little")
+    bits = int.from_bytes(mask, "little")
+    current = current | bits if colour else current & ~bits
+    buffer[offset:end] = current.to_bytes(len(mask), "little")
@@ -0,0 +1,233 @@
+"""
+Interchangeable face detection and embedding models.
+
+A backend finds faces in a frame, turns each face into an embedding, and says how far apart two
+embeddings of the same person can be. Everything else in face recognition (caching, indexing,
+template updates) works in terms of Euclidean distance between embeddings, so backends whose
+model is meant to be compared by cosine distance return unit length embeddings and express their
+threshold as the equivalent Euclidean distance.
+
+Each backend imports its libraries the first time it is used, so choosing one doesn't load the
+others. Embeddings from different backends can't be compared, so users have to register again
+after the backend is changed.
+"""
+
+import math
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+import numpy as np
+
+from models.face_recognition.detection import (
+    DetectionConfig,
+    FaceLocation,
+    detect_faces,
+)
+
+#: Backend used unless another is chosen.
+DEFAULT_BACKEND = "face_recognition-small"
+
+#: Side length of the blank image used to load a backend's models.
+_WARM_UP_SIZE = 64
+
+
+class EmbeddingBackend(ABC):
+    """Face detector and encoder.
+
+    Attributes:
+        name: Name of the backend in BACKENDS.
+        dimensions: Length of each embedding.
+        threshold: Embeddings of the same face are at most this Euclidean distance apart.
+    """
+
+    name: str
+    dimensions: int
+    threshold: float
+
+    @abstractmethod
+    def detect(self, frame: np.ndarray) -> list[FaceLocation]:
+        """Find faces in a frame.
+
+        Args:
+            frame: Image in the shape HxWxC where (C)hannels are in RGB
+
+        Returns:
+            Boxes around each face found.
+        """
+
+    @abstractmethod
+    def encode(
+        self, frame: np.ndarray, locations: list[FaceLocation]
+    ) -> list[np.ndarray]:
+        """Compute embeddings of faces.
+
+        Args:
+            frame: Image in the shape HxWxC where (C)hannels are in RGB
+            locations: Boxes around the faces to encode, from detect().
+
+        Returns:
+            Embedding of each face.
+        """
+
+    def distances(self, known: np.ndarray, embedding: np.ndarray) -> np.ndarray:
+        """
+        Args:
+            known: Embeddings in the shape (N, dimensions).
+            embedding: Embedding to compare them to.
+
+        Returns:
+            Distance from each known embedding to the given one, comparable to threshold.
+        """
+        return np.linalg.norm(known - embedding, axis=1)
+
+    def warm_up(self) -> None:
+        """Load the backend's models, which otherwise happens on the first detection."""
+        blank = np.zeros((_WARM_UP_SIZE, _WARM_UP_SIZE, 3), dtype=np.uint8)
+        self.detect(blank)
+        self.encode(blank, [(0, _WARM_UP_SIZE, _WARM_UP_SIZE, 0)])
+
+
+class FaceRecognitionBackend(EmbeddingBackend):
+    """dlib's HOG detector and ResNet encoder, through the face_recognition library.
+
+    Attributes:
+        detection: Scale, detector and upsampling faces are searched for with.
+    """
+
+    dimensions = 128
+
+    def __init__(
+        self,
+        model: str = "small",
+        threshold: float = 0.3,
+        detection: DetectionConfig = DetectionConfig(),
+    ) -> None:
+        """
+        Args:
+            model: Landmark model used to align faces, "small" (5 points) or "large" (68).
+            threshold: Maximum distance between embeddings of the same face. face_recognition
+                suggests 0.6, which lets too many similar looking people in.
+            detection: Scale, detector and upsampling to search for faces with.
+        """
+        self.name = f"face_recognition-{model}"
+        self.threshold = threshold
+        self.detection = detection
+        self._model = model
+
+    def detect(self, frame: np.ndarray) -> list[FaceLocation]:
+        return detect_faces(
+            frame,
+            scale=self.detection.scale,
+            model=self.detection.model,
+            upsample=self.detection.upsample,
+        )
+
+    def encode(
+        self, frame: np.ndarray, locations: list[FaceLocation]
+    ) -> list[np.ndarray]:
+        import face_recognition
+
+        return face_recognition.face_encodings(
+            frame, known_face_locations=locations, model=self._model
+        )
+
+
+class DeepFaceBackend(EmbeddingBackend):
+    """One of deepface's recognition models, compared by cosine distance."""
+
+    def __init__(
+        self,
+        model_name: str,
+        dimensions: int,
+        cosine_threshold: float,
+        detector: str = "opencv",
+    ) -> None:
+        """
+        Args:
+            model_name: deepface model, such as "SFace" or "GhostFaceNet".
+            dimensions: Length of the model's embeddings.
+            cosine_threshold: Maximum cosine distance between embeddings of the same face, from
+                deepface's verification thresholds for the model.
+            detector: deepface detector backend, such as "opencv" or "yunet".
+        """
+        self.name = f"deepface-{model_name}"
+        self.dimensions = dimensions
+        # For unit vectors, |a - b|^2 = 2 - 2 cos(a, b) = 2 * cosine distance
+        self.threshold = math.sqrt(2 * cosine_threshold)
+        self._model_name = model_name
+        self._detector = detector
+
+    def detect(self, frame: np.ndarray) -> list[FaceLocation]:
+        from deepface import DeepFace
+
+        height, width = frame.shape[:2]
+        faces = DeepFace.extract_faces(
+            # deepface expects arrays in OpenCV's BGR order
+            frame[..., ::-1],
+            detector_backend=self._detector,
+            enforce_detection=False,
+            align=False,
+        )
+
+        locations = []
+        for face in faces:
+            area = face["facial_area"]
+            # Without enforce_detection, the whole frame comes back when no face is found
+            if area["w"] >= width and area["h"] >= height:
+                continue
+            locations.append(
+                (area["y"], area["x"] + area["w"], area["y"] + area["h"], area["x"])
+            )
+        return locations
+
+    def encode(
+        self, frame: np.ndarray, locations: list[FaceLocation]
+    ) -> list[np.ndarray]:
+        from deepface import DeepFace
+
+        embeddings = []
+        for top, right, bottom, left in locations:
+            represented = DeepFace.represent(
+                np.ascontiguousarray(frame[top:bottom, left:right, ::-1]),
+                model_name=self._model_name,
+                detector_backend="skip",
+                enforce_detection=False,
+            )
+            embedding = np.asarray(represented[0]["embedding"])
+            embeddings.append(embedding / np.linalg.norm(embedding))
+        return embeddings
+
+
+#: Available backends by name. Thresholds for deepface models are deepface's own.
+BACKENDS: dict[str, Callable[[], EmbeddingBackend]] = {
+    "face_recognition-small": lambda: FaceRecognitionBackend("small"),
+    "face_recognition-large": lambda: FaceRecognitionBackend("large"),
+    "deepface-SFace": lambda: DeepFaceBackend("SFace", 128, 0.593),
+    "deepface-Facenet": lambda: DeepFaceBackend("Facenet", 128, 0.40),
+    "deepface-GhostFaceNet": lambda: DeepFaceBackend("GhostFaceNet", 512, 0.65),
+}
+
+
+def create_backend(
+    name: str, detection: Optional[DetectionConfig] = None
+) -> EmbeddingBackend:
+    """
+    Args:
+        name: One of BACKENDS.
+        detection: Scale, detector and upsampling to search for faces with, for face_recognition
+            backends. Their defaults if None.
+
+    Returns:
+        The backend, with no models loaded yet.
+
+    Raises:
+        ValueError: The backend is unknown, or is given a detection config it can't use.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown face embedding backend: {name}")
+    backend = BACKENDS[name]()
+    if detection is not None:
+        if not isinstance(backend, FaceRecognitionBackend):
+            raise ValueError(f"The {name} backend has its own face detection settings")
+        backend.detection = detection
+    return backend
@@ -0,0 +1,104 @@
+"""
+Face detection front-end for face recognition.
+
+dlib's detectors are the slowest part of encoding a face, and their cost grows with the number
+of pixels searched. Detection here runs on a downscaled copy of the frame, optionally cropped to a
+region of interest first. The face boxes it finds are mapped back to the full resolution frame, so
+they can be passed to `face_recognition.face_encodings(known_face_locations=...)` and the encoding
+itself still uses native resolution pixels.
+
+The scale, detector and upsampling trade accuracy for speed differently on each camera and board,
+so backends take them as a DetectionConfig that deployments can tune.
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+#: Factor frames are resized by before detection. 1 searches the full frame.
+DETECTION_SCALE = 0.5
+#: dlib detector to use, "hog" or "cnn". "cnn" is far more accurate and far too slow on a Pi.
+DETECTION_MODEL = "hog"
+#: Number of times to upsample the (downscaled) frame when looking for faces. dlib's HOG detector
+#: can't find faces smaller than about 80 pixels, so each upsample halves the smallest face found.
+DETECTION_UPSAMPLE = 1
+
+#: Face box in pixels, in face_recognition's (top, right, bottom, left) order.
+FaceLocation = tuple[int, int, int, int]
+
+
+class DetectionConfig(NamedTuple):
+    """How faces are searched for.
+
+    Attributes:
+        scale: Factor to resize the frame (or region of interest) by before detection.
+        model: dlib detector to use, "hog" or "cnn".
+        upsample: Number of times to upsample the resized frame when looking for faces.
+    """
+
+    scale: float = DETECTION_SCALE
+    model: str = DETECTION_MODEL
+    upsample: int = DETECTION_UPSAMPLE
+
+
+def detect_faces(
+    frame: np.ndarray,
+    scale: float = DETECTION_SCALE,
+    model: str = DETECTION_MODEL,
+    roi: Optional[FaceLocation] = None,
+    upsample: int = DETECTION_UPSAMPLE,
+) -> list[FaceLocation]:
+    """Find faces in a frame.
+
+    Args:
+        frame: Image in the shape HxWxC where (C)hannels are in RGB
+        scale: Factor to resize the frame (or region of interest) by before detection.
+        model: dlib detector to use, "hog" or "cnn".
+        roi: Only look for faces in this part of the frame.
+        upsample: Number of times to upsample the resized frame when looking for faces.
+
+    Returns:
+        Boxes around each face found, in full resolution frame coordinates.
+    """
+    import face_recognition
+
+    height, width = frame.shape[:2]
+    top, left = 0, 0
+    if roi is not None:
+        top, right, bottom, left = _clip(roi, height, width)
+        frame = frame[top:bottom, left:right]
+
+    search = frame
+    if scale != 1:
+        import cv2
+
+        search = cv2.resize(
+            frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+        )
+
+    locations = face_recognition.face_locations(
+        search, number_of_times_to_upsample=upsample, model=model
+    )
+    return [
+        _clip(
+            (
+                top + round(face_top / scale),
+                left + round(face_right / scale),
+                top + round(face_bottom / scale),
+                left + round(face_left / scale),
+            ),
+            height,
+            width,
+        )
+        for face_top, face_right, face_bottom, face_left in locations
+    ]
+
+
+def _clip(location: FaceLocation, height: int, width: int) -> FaceLocation:
+    top, right, bottom, left = location
+    return (
+        min(max(top, 0), height),
+        min(max(right, 0), width),
+        min(max(bottom, 0), height),
+        min(max(left, 0), width),
+    )
@@ -0,0 +1,166 @@
+"""
+Cache of face detections and encodings, keyed by a fingerprint of the frame.
+
+The camera overlord only writes a new snapshot every half second, so repeated login attempts
+often send the same frame again. Frames are fingerprinted by a tiny block-averaged greyscale
+thumbnail. Frames share cached results only if every block of their thumbnails barely differs, so
+sensor noise between otherwise identical frames doesn't cause a miss, but a different face in
+front of an unchanged background always does.
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from models.face_recognition.backends import EmbeddingBackend
+from models.face_recognition.detection import FaceLocation
+
+#: Default maximum number of frames to keep results for.
+DEFAULT_MAX_ENTRIES = 32
+#: Side of the square blocks of pixels averaged into each fingerprint pixel.
+FINGERPRINT_BLOCK = 16
+#: Frames match if no pixel of their fingerprints differs by more than this. Averaging a block
+#: smooths sensor noise to well under this, while a face covers whole blocks, so it is the largest
+#: difference rather than the mean that has to be bounded.
+FINGERPRINT_TOLERANCE = 4.0
+
+
+class CachedFaces(NamedTuple):
+    """Results for one frame.
+
+    Attributes:
+        locations: Faces found by the backend's detector.
+        encodings: Encodings of those faces, or None if they haven't been computed.
+    """
+
+    locations: list[FaceLocation]
+    encodings: Optional[list[np.ndarray]] = None
+
+
+class _Entry(NamedTuple):
+    backend: str
+    fingerprint: np.ndarray
+    faces: CachedFaces
+
+
+class EncodingCache:
+    """LRU cache of face detections and encodings keyed by frame fingerprint. Lookups compare
+    against every entry, which is cheap for the small number of entries kept.
+
+    Attributes:
+        hits: Number of lookups served from the cache.
+        misses: Number of lookups that had to run detection or encoding.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        """
+        Args:
+            max_entries: Maximum number of frames to keep results for.
+        """
+        self.hits = 0
+        self.misses = 0
+        self._max_entries = max_entries
+        # Most recently used last
+        self._entries: list[_Entry] = []
+
+    def detect(
+        self, frame: np.ndarray, backend: EmbeddingBackend
+    ) -> list[FaceLocation]:
+        """Find faces in a frame, unless the backend has seen a matching frame.
+
+        Args:
+            frame: Image in the shape HxWxC where (C)hannels are in RGB
+            backend: Backend to detect faces with.
+
+        Returns:
+            Boxes around each face found.
+        """
+        key = fingerprint(frame)
+        cached = self._get(backend.name, key)
+        if cached is not None:
+            self.hits += 1
+            return cached.locations
+
+        self.misses += 1
+        locations = backend.detect(frame)
+        self._put(backend.name, key, CachedFaces(locations))
+        return locations
+
+    def encode(
+        self,
+        frame: np.ndarray,
+        locations: list[FaceLocation],
+        backend: EmbeddingBackend,
+    ) -> list[np.ndarray]:
+        """Encode the faces at the given locations, unless the backend has encoded a matching
+        frame.
+
+        Args:
+            frame: Image in the shape HxWxC where (C)hannels are in RGB
+            locations: Faces to encode.
+            backend: Backend to encode faces with.
+
+        Returns:
+            Encoding of each face.
+        """
+        key = fingerprint(frame)
+        cached = self._get(backend.name, key)
+        if (
+            cached is not None
+            and cached.encodings is not None
+            and cached.locations == locations
+        ):
+            self.hits += 1
+            return cached.encodings
+
+        self.misses += 1
+        encodings = backend.encode(frame, locations)
+        self._put(backend.name, key, CachedFaces(locations, encodings))
+        return encodings
+
+    def clear(self) -> None:
+        """Forget every cached result and reset the counters."""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, backend: str, key: np.ndarray) -> Optional[CachedFaces]:
+        for index in range(len(self._entries) - 1, -1, -1):
+            entry = self._entries[index]
+            if entry.backend == backend and _matches(entry.fingerprint, key):
+                self._entries.append(self._entries.pop(index))
+                return entry.faces
+        return None
+
+    def _put(self, backend: str, key: np.ndarray, cached: CachedFaces) -> None:
+        self._entries = [
+            entry
+            for entry in self._entries
+            if entry.backend != backend or not _matches(entry.fingerprint, key)
+        ]
+        self._entries.append(_Entry(backend, key, cached))
+        if len(self._entries) > self._max_entries:
+            self._entries.pop(0)
+
+
+def fingerprint(frame: np.ndarray) -> np.ndarray:
+    """
+    Args:
+        frame: Image in the shape HxWxC.
+
+    Returns:
+        Greyscale thumbnail of the frame, each pixel the mean of a FINGERPRINT_BLOCK square block.
+    """
+    rows = frame.shape[0] // FINGERPRINT_BLOCK
+    cols = frame.shape[1] // FINGERPRINT_BLOCK
+    cropped = frame[: rows * FINGERPRINT_BLOCK, : cols * FINGERPRINT_BLOCK]
+    blocks = cropped.reshape(rows, FINGERPRINT_BLOCK, cols, FINGERPRINT_BLOCK, -1)
+    return blocks.mean(axis=(1, 3, 4), dtype=np.float32)
+
+
+def _matches(a: np.ndarray, b: np.ndarray) -> bool:
+    return a.shape == b.shape and float(np.abs(a - b).max()) <= FINGERPRINT_TOLERANCE
+
+
+#: Cache shared by face recognition in this process.
+FACE_CACHE = EncodingCache()
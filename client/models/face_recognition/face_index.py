@@ -0,0 +1,212 @@
+"""
+Approximate nearest-neighbour index over registered face embeddings.
+
+Matching a face by comparing it against every registered embedding gets slow with thousands of
+users, so users are grouped into inverted lists (IVF). Each user is summarised by the centroid of
+their embeddings and the radius of those embeddings around it; the centroids are clustered with
+k-means, and each cluster keeps a list of its users. A query only searches the users in the
+`probes` clusters closest to it, and skips any user whose centroid is too far away for one of
+their embeddings to beat the best match found so far.
+"""
+
+import math
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+#: Number of clusters searched per query.
+DEFAULT_PROBES = 8
+#: Number of k-means iterations when clustering.
+KMEANS_ITERATIONS = 10
+#: The clusters are rebuilt when the number of users grows by this factor since the last build.
+REBUILD_GROWTH = 2.0
+#: Below this many users, everything goes in a single cluster.
+MIN_USERS_TO_CLUSTER = 64
+
+
+class Match(NamedTuple):
+    """Closest registered user to a face.
+
+    Attributes:
+        user_id: Id of the user.
+        distance: Euclidean distance from the face to the user's closest embedding.
+    """
+
+    user_id: int
+    distance: float
+
+
+class _User(NamedTuple):
+    embeddings: np.ndarray
+    centroid: np.ndarray
+    radius: float
+
+
+class _Cluster:
+    """Users whose centroids are closest to one cluster centre."""
+
+    def __init__(self, dimensions: int) -> None:
+        self.user_ids: list[int] = []
+        self.centroids = np.empty((0, dimensions))
+        self.radii = np.empty(0)
+
+    def add(self, user_id: int, user: _User) -> None:
+        self.user_ids.append(user_id)
+        self.centroids = np.vstack((self.centroids, user.centroid))
+        self.radii = np.append(self.radii, user.radius)
+
+    def remove(self, user_id: int) -> None:
+        position = self.user_ids.index(user_id)
+        del self.user_ids[position]
+        self.centroids = np.delete(self.centroids, position, axis=0)
+        self.radii = np.delete(self.radii, position)
+
+
+class FaceIndex:
+    """IVF index from face embeddings to user ids, supporting incremental changes.
+
+    Attributes:
+        probes: Number of clusters searched per query. More is slower but less likely to miss the
+            closest user.
+    """
+
+    def __init__(self, dimensions: int = 128, probes: int = DEFAULT_PROBES) -> None:
+        """
+        Args:
+            dimensions: Length of each embedding.
+            probes: Number of clusters searched per query.
+        """
+        self.probes = probes
+        self._dimensions = dimensions
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._users
+
+    def add(self, user_id: int, embeddings: list[np.ndarray]) -> None:
+        """Add a user, replacing any embeddings they already have.
+
+        Args:
+            user_id: Id of the user.
+            embeddings: The user's face embeddings.
+        """
+        if user_id in self._users:
+            self.remove(user_id)
+
+        stacked = np.vstack(embeddings)
+        centroid = stacked.mean(axis=0)
+        radius = float(np.linalg.norm(stacked - centroid, axis=1).max())
+        user = _User(stacked, centroid, radius)
+        self._users[user_id] = user
+
+        if (
+            len(self._users) >= MIN_USERS_TO_CLUSTER
+            and len(self._users) >= REBUILD_GROWTH * self._built_size
+        ):
+            self.rebuild()
+        else:
+            self._assign(user_id, user)
+
+    def embeddings(self, user_id: int) -> np.ndarray:
+        """
+        Args:
+            user_id: Id of a user in the index.
+
+        Returns:
+            The user's embeddings, in the order they were added.
+        """
+        return self._users[user_id].embeddings
+
+    def remove(self, user_id: int) -> None:
+        """Remove a user if they are in the index.
+
+        Args:
+            user_id: Id of the user.
+        """
+        if self._users.pop(user_id, None) is None:
+            return
+        self._clusters[self._assignments.pop(user_id)].remove(user_id)
+
+    def clear(self) -> None:
+        """Remove every user."""
+        self._users: dict[int, _User] = {}
+        self._assignments: dict[int, int] = {}
+        self._centres = np.zeros((1, self._dimensions))
+        self._clusters = [_Cluster(self._dimensions)]
+        self._built_size = 0
+
+    def rebuild(self) -> None:
+        """Recluster every user. Done automatically as users are added."""
+        count = len(self._users)
+        cluster_count = max(1, round(math.sqrt(count)))
+        if count < MIN_USERS_TO_CLUSTER:
+            cluster_count = 1
+
+        user_ids = list(self._users)
+        centroids = np.vstack([self._users[user_id].centroid for user_id in user_ids])
+        self._centres = _kmeans(centroids, cluster_count)
+        self._clusters = [_Cluster(self._dimensions) for _ in range(cluster_count)]
+        self._assignments = {}
+        for user_id in user_ids:
+            self._assign(user_id, self._users[user_id])
+        self._built_size = count
+
+    def closest(self, embedding: np.ndarray) -> Optional[Match]:
+        """Find the registered user with the embedding closest to the given one.
+
+        Args:
+            embedding: Face embedding to look up.
+
+        Returns:
+            The closest user and their distance, or None if the index is empty.
+        """
+        centre_distances = np.linalg.norm(self._centres - embedding, axis=1)
+        probed = np.argsort(centre_distances)[: self.probes]
+
+        best: Optional[Match] = None
+        for cluster_index in probed:
+            cluster = self._clusters[cluster_index]
+            if len(cluster.user_ids) == 0:
+                continue
+
+            # No embedding of a user can be closer than this, by the triangle inequality
+            lower_bounds = (
+                np.linalg.norm(cluster.centroids - embedding, axis=1) - cluster.radii
+            )
+            for position in np.argsort(lower_bounds):
+                if best is not None and lower_bounds[position] >= best.distance:
+                    break
+
+                user_id = cluster.user_ids[position]
+                distances = np.linalg.norm(
+                    self._users[user_id].embeddings - embedding, axis=1
+                )
+                distance = float(distances.min())
+                if best is None or distance < best.distance:
+                    best = Match(user_id, distance)
+
+        return best
+
+    def _assign(self, user_id: int, user: _User) -> None:
+        cluster_index = int(
+            np.argmin(np.linalg.norm(self._centres - user.centroid, axis=1))
+        )
+        self._clusters[cluster_index].add(user_id, user)
+        self._assignments[user_id] = cluster_index
+
+
+def _kmeans(points: np.ndarray, count: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    centres = points[rng.choice(len(points), size=count, replace=False)]
+    for _ in range(KMEANS_ITERATIONS):
+        # |p - c|^2 = |p|^2 - 2 p.c + |c|^2, and |p|^2 doesn't affect the argmin
+        scores = (centres**2).sum(axis=1) - 2 * points @ centres.T
+        labels = scores.argmin(axis=1)
+        for index in range(count):
+            members = points[labels == index]
+            if len(members) != 0:
+                centres[index] = members.mean(axis=0)
+    return centres
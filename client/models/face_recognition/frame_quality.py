@@ -0,0 +1,129 @@
+"""
+Cheap quality scores for picking the best frames of a burst to encode.
+
+Every frame gets a sharpness and exposure score using only numpy. Face detection is slower, so it
+only runs on the best few of those, to prefer frames with exactly one, large, face.
+"""
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from models.face_recognition.backends import EmbeddingBackend
+from models.face_recognition.detection import FaceLocation
+from models.face_recognition.encoding_cache import FACE_CACHE
+
+#: Weights converting RGB to luminance.
+LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+#: Frames are subsampled by this factor in each direction before scoring.
+SCORE_SUBSAMPLE = 2
+#: Pixels at or below this luminance count as crushed.
+DARK_CLIP = 5
+#: Pixels at or above this luminance count as blown out.
+BRIGHT_CLIP = 250
+
+
+class FrameScore(NamedTuple):
+    """Quality of one frame.
+
+    Attributes:
+        index: Position of the frame in its burst.
+        sharpness: Variance of the Laplacian of the frame's luminance. Higher is sharper.
+        exposure: 1 for a well exposed frame, falling to 0 for one that is black or white.
+        faces: Number of faces found, or None if face detection wasn't run.
+        face_size: Area of the largest face as a proportion of the frame.
+        face_locations: Boxes around the faces found, for reuse when encoding.
+    """
+
+    index: int
+    sharpness: float
+    exposure: float
+    faces: Optional[int] = None
+    face_size: float = 0.0
+    face_locations: Optional[list[FaceLocation]] = None
+
+    @property
+    def image_quality(self) -> float:
+        """Combined sharpness and exposure score."""
+        return self.sharpness * self.exposure
+
+
+def score_image(index: int, frame: np.ndarray) -> FrameScore:
+    """Score a frame's sharpness and exposure.
+
+    Args:
+        index: Position of the frame in its burst.
+        frame: Image in the shape HxWxC where (C)hannels are in RGB
+
+    Returns:
+        Score without face information.
+    """
+    small = frame[::SCORE_SUBSAMPLE, ::SCORE_SUBSAMPLE]
+    luma = small.astype(np.float32) @ LUMA_WEIGHTS
+
+    laplacian = (
+        4 * luma[1:-1, 1:-1]
+        - luma[:-2, 1:-1]
+        - luma[2:, 1:-1]
+        - luma[1:-1, :-2]
+        - luma[1:-1, 2:]
+    )
+    sharpness = float(laplacian.var())
+
+    clipped = np.count_nonzero((luma <= DARK_CLIP) | (luma >= BRIGHT_CLIP)) / luma.size
+    brightness = float(luma.mean())
+    exposure = max(0.0, 1 - abs(brightness - 127.5) / 127.5) * (1 - float(clipped))
+
+    return FrameScore(index, sharpness, exposure)
+
+
+def score_faces(
+    score: FrameScore, frame: np.ndarray, backend: EmbeddingBackend
+) -> FrameScore:
+    """Add face count and size to a frame's score.
+
+    Args:
+        score: Score from score_image().
+        frame: Image the score is for.
+        backend: Backend to detect faces with.
+
+    Returns:
+        Score with face information.
+    """
+    locations = FACE_CACHE.detect(frame, backend)
+    face_size = 0.0
+    for top, right, bottom, left in locations:
+        area = (bottom - top) * (right - left) / (frame.shape[0] * frame.shape[1])
+        face_size = max(face_size, area)
+
+    return score._replace(
+        faces=len(locations), face_size=face_size, face_locations=locations
+    )
+
+
+def rank_frames(
+    frames: list[np.ndarray], candidates: int, backend: EmbeddingBackend
+) -> list[FrameScore]:
+    """Find the frames of a burst most worth encoding.
+
+    Args:
+        frames: Images in the shape HxWxC where (C)hannels are in RGB
+        candidates: Maximum number of frames to return. Face detection runs on this many.
+        backend: Backend to detect faces with.
+
+    Returns:
+        Scores of the best frames, best first. Frames with exactly one face come first, then
+            larger faces, then sharper and better exposed frames.
+    """
+    scores = [score_image(index, frame) for index, frame in enumerate(frames)]
+    scores.sort(key=lambda score: score.image_quality, reverse=True)
+
+    best = [
+        score_faces(score, frames[score.index], backend)
+        for score in scores[:candidates]
+    ]
+    best.sort(
+        key=lambda score: (score.faces == 1, score.face_size, score.image_quality),
+        reverse=True,
+    )
+    return best
@@ -1,15 +1,41 @@
+import logging
 from enum import Enum
+from typing import Optional
 
 import numpy as np
-import face_recognition
 
-from data.routines import register_face_embeddings, iter_face_embeddings
-
-MODEL_NAME = "small"
-TOLERANCE = 0.3
+from data.routines import (
+    face_embeddings_version,
+    iter_face_embeddings,
+    register_face_embeddings,
+    update_face_embeddings,
+)
+from models.face_recognition.backends import (
+    DEFAULT_BACKEND,
+    EmbeddingBackend,
+    create_backend,
+)
+from models.face_recognition.detection import DetectionConfig, FaceLocation
+from models.face_recognition.encoding_cache import FACE_CACHE
+from models.face_recognition.face_index import FaceIndex
+from models.face_recognition.frame_quality import FrameScore, rank_frames
+from models.face_recognition.templates import CONFIDENT_FRACTION, fold_in
+
+#: Number of the best frames of a burst to run face detection on.
+BURST_CANDIDATES = 2
+#: Whether confident logins refine the matched user's stored embeddings.
+UPDATE_TEMPLATES = True
+
+#: Backend used to detect and encode faces in this process.
+_backend: EmbeddingBackend = create_backend(DEFAULT_BACKEND)
+#: Index of the registered faces, loaded on first use.
+_face_index: Optional[FaceIndex] = None
+#: face_embeddings_version() when _face_index was last in sync with the registered faces.
+_face_index_version: Optional[int] = None
 
 
 class Status(Enum):
+    TIMED_OUT = -7
     ALREADY_REGISTERED = -4
     NO_FACES = -3
     TOO_MANY_FACES = -2
@@ -17,17 +43,50 @@ class Status(Enum):
     OK = 0
 
 
-def get_face_match(login_face: np.ndarray) -> int:
+logger = logging.getLogger(__name__)
+
+
+def set_backend(name: str, detection: Optional[DetectionConfig] = None) -> None:
+    """Choose the backend used to detect and encode faces. Faces registered with a different
+    backend are ignored.
+
+    Args:
+        name: One of models.face_recognition.backends.BACKENDS.
+        detection: Scale, detector and upsampling to search for faces with, for face_recognition
+            backends. Their defaults if None.
+    """
+    global _backend, _face_index
+
+    _backend = create_backend(name, detection)
+    _face_index = None
+    # Faces found with the previous detection settings may differ
+    FACE_CACHE.clear()
+
+
+def get_backend() -> EmbeddingBackend:
+    """
+    Returns:
+        Backend used to detect and encode faces in this process.
+    """
+    return _backend
+
+
+def get_face_match(
+    login_face: np.ndarray, face_locations: Optional[list[FaceLocation]] = None
+) -> int:
     """
     Matches the given face to one of the user ids in the database.
 
     Args:
         login_face: Image of user's face as an array
+        face_locations: Faces already found in the image by the backend, if any.
 
     Returns:
         Matching user id, or one of Status values.
     """
-    login_embeddings = face_recognition.face_encodings(login_face, model=MODEL_NAME)
+    if face_locations is None:
+        face_locations = FACE_CACHE.detect(login_face, _backend)
+    login_embeddings = FACE_CACHE.encode(login_face, face_locations, _backend)
 
     # Should only detect exactly one face
     if len(login_embeddings) == 0:
@@ -35,17 +94,35 @@ def get_face_match(login_face: np.ndarray) -> int:
     if len(login_embeddings) > 1:
         return Status.TOO_MANY_FACES.value
 
-    login_embedding = login_embeddings[0]
+    face_index = _registered_faces()
+    match = face_index.closest(login_embeddings[0])
+    if match is None or match.distance > _backend.threshold:
+        return Status.NO_MATCH.value
 
-    for user_id, user_embeddings in iter_face_embeddings():
-        matches = face_recognition.compare_faces(
-            user_embeddings, login_embedding, tolerance=TOLERANCE
-        )
+    if UPDATE_TEMPLATES and match.distance <= CONFIDENT_FRACTION * _backend.threshold:
+        templates = fold_in(face_index.embeddings(match.user_id), login_embeddings[0])
+        if templates is not None:
+            update_face_embeddings(match.user_id, templates)
+            face_index.add(match.user_id, list(templates))
+            _mark_face_index_current()
 
-        if any(matches):
-            return user_id
+    return match.user_id
 
-    return Status.NO_MATCH.value
+
+def match_best_face(frames: list[np.ndarray]) -> int:
+    """Match the best frame of a burst to one of the user ids in the database.
+
+    Args:
+        frames: Burst of images of the user's face as arrays
+
+    Returns:
+        Matching user id, or one of Status values.
+    """
+    ranked = rank_frames(frames, BURST_CANDIDATES, _backend)
+    best = ranked[0]
+    if best.faces != 1:
+        return _face_count_status(ranked)
+    return get_face_match(frames[best.index], best.face_locations)
 
 
 def register_faces(user_id: int, faces: list[np.ndarray]) -> int:
@@ -60,34 +137,117 @@ def register_faces(user_id: int, faces: list[np.ndarray]) -> int:
     """
     face_embeddings = []
     for face in faces:
-        all_faces_embed = face_recognition.face_encodings(face, model=MODEL_NAME)
+        status, face_embedding = encode_face(face)
+        if face_embedding is None:
+            return status
+        face_embeddings.append(face_embedding)
 
-        # Should only detect exactly one face
-        if len(all_faces_embed) == 0:
-            return Status.NO_FACES.value
-        if len(all_faces_embed) > 1:
-            return Status.TOO_MANY_FACES.value
+    return register_embeddings(user_id, face_embeddings)
 
-        face_embedding = all_faces_embed[0]
-        face_embeddings.append(face_embedding)
 
+def encode_face(
+    face: np.ndarray, face_locations: Optional[list[FaceLocation]] = None
+) -> tuple[int, Optional[np.ndarray]]:
+    """Compute the embedding of the face in an image, which should contain exactly one face.
+
+    Args:
+        face: Face image in the shape HxWxC where (C)hannels are in RGB
+        face_locations: Faces already found in the image by the backend, if any.
+
+    Returns:
+        (status, embedding), where embedding is None unless status is OK.
+    """
+    if face_locations is None:
+        face_locations = FACE_CACHE.detect(face, _backend)
+    all_faces_embed = FACE_CACHE.encode(face, face_locations, _backend)
+
+    # Should only detect exactly one face
+    if len(all_faces_embed) == 0:
+        return Status.NO_FACES.value, None
+    if len(all_faces_embed) > 1:
+        return Status.TOO_MANY_FACES.value, None
+
+    return Status.OK.value, all_faces_embed[0]
+
+
+def encode_best_face(frames: list[np.ndarray]) -> tuple[int, Optional[np.ndarray]]:
+    """Compute the embedding of the face in the best frame of a burst.
+
+    Args:
+        frames: Burst of face images in the shape HxWxC where (C)hannels are in RGB
+
+    Returns:
+        (status, embedding), where embedding is None unless status is OK.
+    """
+    ranked = rank_frames(frames, BURST_CANDIDATES, _backend)
+    best = ranked[0]
+    if best.faces != 1:
+        return _face_count_status(ranked), None
+    return encode_face(frames[best.index], best.face_locations)
+
+
+def register_embeddings(user_id: int, face_embeddings: list[np.ndarray]) -> int:
+    """Store face embeddings from encode_face() in the database, if they all belong to the same
+    face and that face isn't already registered.
+
+    Args:
+        user_id: Id of the user who belongs to the faces
+        face_embeddings: Embeddings of each face
+
+    Returns:
+        Registration status
+    """
     # Ensure that all images contain the same face
-    matches = face_recognition.compare_faces(
-        face_embeddings[1:], face_embeddings[0], tolerance=TOLERANCE
-    )
-    if not all(matches):
-        return Status.TOO_MANY_FACES.value
+    if len(face_embeddings) > 1:
+        distances = _backend.distances(
+            np.vstack(face_embeddings[1:]), face_embeddings[0]
+        )
+        if (distances > _backend.threshold).any():
+            return Status.TOO_MANY_FACES.value
 
     # Ensure user is not already registered
-    for _, other_user_embeddings in iter_face_embeddings():
-        for embedding in face_embeddings:
-            matches = face_recognition.compare_faces(
-                other_user_embeddings, embedding, tolerance=TOLERANCE
-            )
-
-            if any(matches):
-                return Status.ALREADY_REGISTERED.value
+    face_index = _registered_faces()
+    for embedding in face_embeddings:
+        match = face_index.closest(embedding)
+        if match is not None and match.distance <= _backend.threshold:
+            return Status.ALREADY_REGISTERED.value
 
     register_face_embeddings(user_id, face_embeddings)
+    face_index.add(user_id, face_embeddings)
+    _mark_face_index_current()
 
     return Status.OK.value
+
+
+def _registered_faces() -> FaceIndex:
+    """
+    Returns:
+        Index of the registered faces, reloaded if they have changed since it was last used, for
+            example by a garden reset in another process.
+    """
+    global _face_index
+
+    if _face_index is None or face_embeddings_version() != _face_index_version:
+        _face_index = FaceIndex(_backend.dimensions)
+        for user_id, user_embeddings in iter_face_embeddings():
+            if len(user_embeddings[0]) != _backend.dimensions:
+                logger.warning(
+                    "Ignoring faces of user %d, registered with another backend",
+                    user_id,
+                )
+                continue
+            _face_index.add(user_id, user_embeddings)
+        _mark_face_index_current()
+
+    return _face_index
+
+
+def _mark_face_index_current() -> None:
+    global _face_index_version
+    _face_index_version = face_embeddings_version()
+
+
+def _face_count_status(ranked: list[FrameScore]) -> int:
+    if any(score.faces is not None and score.faces > 1 for score in ranked):
+        return Status.TOO_MANY_FACES.value
+    return Status.NO_FACES.value
@@ -0,0 +1,70 @@
+"""
+Online refinement of the embeddings stored for each user.
+
+Registration only stores the embeddings of the registration photos, so a user whose appearance
+drifts (a haircut, glasses, a new desk lamp) slowly stops matching. Confident logins are folded
+into the user's set of embeddings, which is kept to a fixed size so matching cost doesn't grow:
+when the set is full, it is reduced with k-medoids, which keeps the embeddings that best cover
+the ways the user has looked.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+#: Maximum number of embeddings kept per user.
+MAX_TEMPLATES = 8
+#: Only logins within this fraction of the backend's threshold of the user's closest embedding
+#: are folded in, so a borderline match with someone else can't drift into their set.
+CONFIDENT_FRACTION = 2 / 3
+
+
+def fold_in(
+    templates: np.ndarray, embedding: np.ndarray, size: int = MAX_TEMPLATES
+) -> Optional[np.ndarray]:
+    """Add a confidently matched login embedding to a user's embeddings.
+
+    Args:
+        templates: The user's embeddings, oldest first, in the shape (N, D).
+        embedding: Embedding of the login, which must be a confident match for one of the
+            templates.
+        size: Maximum number of embeddings to keep.
+
+    Returns:
+        The user's new embeddings, or None if they are unchanged because the login added
+            nothing the existing embeddings didn't already cover.
+    """
+    candidates = np.vstack((templates, embedding))
+    if len(candidates) <= size:
+        return candidates
+
+    kept = select_medoids(candidates, size)
+    if len(candidates) - 1 not in kept:
+        return None
+    return candidates[kept]
+
+
+def select_medoids(points: np.ndarray, size: int) -> list[int]:
+    """Choose a subset of points which covers them all as closely as possible.
+
+    Greedy k-medoids: repeatedly drop the point closest to another kept point, which is the point
+    whose removal adds the least to the total distance from every point to its nearest kept
+    point. Of two equally close points, the older is dropped, so the set follows the user's
+    current appearance.
+
+    Args:
+        points: Points in the shape (N, D), oldest first.
+        size: Number of points to keep.
+
+    Returns:
+        Indices of the kept points, in their original order.
+    """
+    distances = np.linalg.norm(points[:, np.newaxis] - points[np.newaxis], axis=2)
+    np.fill_diagonal(distances, np.inf)
+
+    kept = list(range(len(points)))
+    while len(kept) > size:
+        nearest = distances[np.ix_(kept, kept)].min(axis=1)
+        dropped = kept[int(nearest.argmin())]
+        kept.remove(dropped)
+    return kept
@@ -0,0 +1,395 @@
+"""
+Face recognition in a dedicated, pre-warmed process.
+
+Loading the face detector and encoder is slow, so a RecognitionWorker loads them once when it
+starts instead of on the first login. Frames are copied into a shared memory block rather than
+pickled through the pipe, which matters for a Raspberry Pi copying several camera frames at a
+time. Requests that take too long are abandoned and the worker is restarted.
+
+On a Pi short of memory, the worker can instead be given an idle timeout: it is started when
+needed and stopped once it has been idle for that long, giving its models' memory back to the
+posture tracker while a user is logged in.
+"""
+
+import logging
+import multiprocessing.connection as connection
+from multiprocessing.process import BaseProcess
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Optional
+
+import numpy as np
+
+from drivers.clock import SYSTEM_CLOCK, Clock
+from drivers.process_tuning import ProcessTuning
+from models.face_recognition.backends import DEFAULT_BACKEND
+from models.face_recognition.detection import DetectionConfig
+from models.face_recognition.recognition import Status
+from models.pose_detection.posture_process import get_context
+
+#: Seconds to wait for the worker to load its models.
+STARTUP_TIMEOUT = 180
+#: Seconds to wait for a face match.
+MATCH_TIMEOUT = 30
+#: Seconds to wait for a registration, which encodes several faces.
+REGISTER_TIMEOUT = 120
+#: Seconds to wait for one face to be encoded.
+ENCODE_TIMEOUT = 30
+
+#: Message sent to the worker to make it exit.
+STOP_WORKER = "stop"
+#: Request for get_face_match(frame).
+MATCH = "match"
+#: Request for match_best_face(frames).
+MATCH_BEST = "match_best"
+#: Request for register_faces(user_id, frames).
+REGISTER = "register"
+#: Request for encode_best_face(frames).
+ENCODE = "encode"
+#: Request for register_embeddings(user_id, embeddings).
+REGISTER_EMBEDDINGS = "register_embeddings"
+
+#: Where a frame is in the shared memory block: (offset, shape, dtype).
+FrameLayout = tuple[int, tuple[int, ...], str]
+
+logger = logging.getLogger(__name__)
+
+
+class RecognitionWorker:
+    """Handle to a process which runs get_face_match(), match_best_face(), register_faces() and
+    register_embeddings() from models.face_recognition.recognition. These methods have the same
+    signatures and results, so it can be used in their place.
+
+    encode_best_face() is split into start_encoding() and collect_encoding(), so a face can be
+    encoded while the caller does something else. Only one request can be in progress at a time.
+
+    With an idle timeout, the process is only started by start() or the first request, and
+    stop_if_idle() stops it again. Requests made while it is stopped start it and wait for it.
+    """
+
+    def __init__(
+        self,
+        block: bool = True,
+        backend: str = DEFAULT_BACKEND,
+        idle_timeout: Optional[float] = None,
+        clock: Clock = SYSTEM_CLOCK,
+        tuning: Optional[ProcessTuning] = None,
+        detection: Optional[DetectionConfig] = None,
+    ) -> None:
+        """Start the worker process, unless it has an idle timeout.
+
+        Args:
+            block: Whether to wait for the models to load. If False, the first request waits
+                instead.
+            backend: Name of the face embedding backend to use.
+            idle_timeout: Seconds without requests after which stop_if_idle() stops the
+                process. If None, the process runs until stop().
+            clock: Clock to measure idle time with.
+            tuning: CPUs, priority and thread counts for the worker process. The worker inherits
+                this process's if None.
+            detection: Scale, detector and upsampling to search for faces with, for
+                face_recognition backends. Their defaults if None.
+        """
+        self._backend = backend
+        self._detection = detection
+        self._tuning = tuning
+        self._idle_timeout = idle_timeout
+        self._clock = clock
+        self._last_used = clock.monotonic()
+        self._shared: Optional[SharedMemory] = None
+        self._process: Optional[BaseProcess] = None
+        self._ready = False
+        self._request_id = 0
+        self._pending: Optional[str] = None
+        if idle_timeout is None:
+            self.start(block)
+
+    @property
+    def pid(self) -> Optional[int]:
+        """Process id of the worker, or None if it isn't running."""
+        if self._process is None:
+            return None
+        return self._process.pid
+
+    def start(self, block: bool = False) -> None:
+        """Start the worker process if it isn't running.
+
+        Args:
+            block: Whether to wait for the models to load.
+        """
+        if self._process is None:
+            self._start()
+        self._last_used = self._clock.monotonic()
+        if block:
+            self.wait_until_ready()
+
+    def stop_if_idle(self) -> bool:
+        """Stop the worker process if it has an idle timeout and has been idle for that long.
+
+        Returns:
+            Whether the process was stopped.
+        """
+        if (
+            self._idle_timeout is None
+            or self._process is None
+            or self._pending is not None
+            or self._clock.monotonic() - self._last_used < self._idle_timeout
+        ):
+            return False
+
+        logger.debug("Stopping idle face recognition worker")
+        self.stop()
+        return True
+
+    def wait_until_ready(self, timeout: float = STARTUP_TIMEOUT) -> bool:
+        """Block until the worker has loaded its models.
+
+        Args:
+            timeout: Seconds to wait.
+
+        Returns:
+            Whether the worker is ready.
+        """
+        if self._ready:
+            return True
+        if self._process is None:
+            return False
+
+        try:
+            if self._con.poll(timeout):
+                self._con.recv()
+                self._ready = True
+                logger.debug("Face recognition worker ready")
+        except (EOFError, OSError):
+            logger.error("Face recognition worker died while loading models")
+
+        return self._ready
+
+    def get_face_match(self, login_face: np.ndarray) -> int:
+        """See models.face_recognition.recognition.get_face_match().
+
+        Returns:
+            Matching user id, or one of Status values.
+        """
+        self._send(MATCH, None, [login_face])
+        return self._receive(MATCH_TIMEOUT, Status.TIMED_OUT.value)
+
+    def match_best_face(self, frames: list[np.ndarray]) -> int:
+        """See models.face_recognition.recognition.match_best_face().
+
+        Returns:
+            Matching user id, or one of Status values.
+        """
+        self._send(MATCH_BEST, None, frames)
+        return self._receive(MATCH_TIMEOUT, Status.TIMED_OUT.value)
+
+    def register_faces(self, user_id: int, faces: list[np.ndarray]) -> int:
+        """See models.face_recognition.recognition.register_faces().
+
+        Returns:
+            Registration status
+        """
+        self._send(REGISTER, user_id, faces)
+        return self._receive(REGISTER_TIMEOUT, Status.TIMED_OUT.value)
+
+    def register_embeddings(
+        self, user_id: int, face_embeddings: list[np.ndarray]
+    ) -> int:
+        """See models.face_recognition.recognition.register_embeddings().
+
+        Returns:
+            Registration status
+        """
+        self._send(REGISTER_EMBEDDINGS, (user_id, face_embeddings), [])
+        return self._receive(REGISTER_TIMEOUT, Status.TIMED_OUT.value)
+
+    def start_encoding(self, frames: list[np.ndarray]) -> None:
+        """Start encoding the face in the best frame of a burst in the background. Collect the
+        result with collect_encoding().
+
+        Args:
+            frames: Burst of face images in the shape HxWxC where (C)hannels are in RGB
+        """
+        self._send(ENCODE, None, frames)
+
+    def encoding_ready(self) -> bool:
+        """
+        Returns:
+            Whether collect_encoding() would return without waiting.
+        """
+        try:
+            return self._pending == ENCODE and self._con.poll()
+        except (EOFError, OSError):
+            # Let collect_encoding() deal with the dead worker
+            return True
+
+    def collect_encoding(self) -> tuple[int, Optional[np.ndarray]]:
+        """Wait for the face passed to start_encoding() to be encoded.
+
+        Returns:
+            See models.face_recognition.recognition.encode_best_face().
+        """
+        return self._receive(ENCODE_TIMEOUT, (Status.TIMED_OUT.value, None))
+
+    def stop(self) -> None:
+        """End the worker process and free the shared memory. A later request starts it again."""
+        if self._process is not None:
+            try:
+                self._con.send((STOP_WORKER,))
+            except (BrokenPipeError, OSError):
+                pass
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+            self._pending = None
+
+        if self._shared is not None:
+            self._shared.close()
+            self._shared.unlink()
+            self._shared = None
+
+    def _start(self) -> None:
+        context = get_context()
+        self._con, child_con = context.Pipe()
+        self._ready = False
+        self._process = context.Process(
+            target=_run_worker,
+            args=(child_con, self._backend, self._detection, self._tuning),
+            daemon=True,
+        )
+        self._process.start()
+
+    def _restart(self) -> None:
+        logger.warning("Restarting face recognition worker")
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+        self._start()
+
+    def _send(self, kind: str, argument: Any, frames: list[np.ndarray]) -> None:
+        if self._pending is not None:
+            raise RuntimeError(f"Face recognition {self._pending} request in progress")
+
+        self._pending = kind
+        self._request_id += 1
+        self.start()
+        if not self.wait_until_ready():
+            # _receive() will report the failure
+            return
+
+        name: Optional[str] = None
+        layout: list[FrameLayout] = []
+        if len(frames) != 0:
+            name, layout = self._share(frames)
+        self._con.send((kind, self._request_id, name, layout, argument))
+
+    def _receive(self, timeout: float, failed: Any) -> Any:
+        if self._pending is None:
+            raise RuntimeError("No face recognition request in progress")
+
+        kind, self._pending = self._pending, None
+        self._last_used = self._clock.monotonic()
+        if not self._ready:
+            self._restart()
+            return failed
+
+        try:
+            while self._con.poll(timeout):
+                request_id, result = self._con.recv()
+                # Replies to abandoned requests can still be in the pipe
+                if request_id == self._request_id:
+                    return result
+        except (EOFError, OSError):
+            logger.error("Face recognition worker died during %s request", kind)
+        else:
+            logger.error("Face recognition %s request timed out", kind)
+
+        self._restart()
+        return failed
+
+    def _share(self, frames: list[np.ndarray]) -> tuple[str, list[FrameLayout]]:
+        size = sum(frame.nbytes for frame in frames)
+        if self._shared is None or self._shared.size < size:
+            if self._shared is not None:
+                self._shared.close()
+                self._shared.unlink()
+            self._shared = SharedMemory(create=True, size=size)
+
+        shared = self._shared
+        layout = []
+        offset = 0
+        for frame in frames:
+            view = np.ndarray(
+                frame.shape, frame.dtype, buffer=shared.buf, offset=offset
+            )
+            view[...] = frame
+            layout.append((offset, frame.shape, frame.dtype.str))
+            offset += frame.nbytes
+        return shared.name, layout
+
+
+def _run_worker(
+    con: connection.Connection,
+    backend: str,
+    detection: Optional[DetectionConfig],
+    tuning: Optional[ProcessTuning],
+) -> None:
+    # Tune before loading the models, so their thread pools are sized for the pinned CPUs
+    if tuning is not None:
+        tuning.apply()
+
+    from models.face_recognition.encoding_cache import FACE_CACHE
+    from models.face_recognition.recognition import (
+        encode_best_face,
+        get_backend,
+        get_face_match,
+        match_best_face,
+        register_embeddings,
+        register_faces,
+        set_backend,
+    )
+
+    set_backend(backend, detection)
+    get_backend().warm_up()
+    con.send(True)
+
+    shared: Optional[SharedMemory] = None
+    while True:
+        message = con.recv()
+        if message[0] == STOP_WORKER:
+            break
+
+        kind, request_id, name, layout, argument = message
+        if name is not None and (shared is None or shared.name != name):
+            if shared is not None:
+                shared.close()
+            shared = SharedMemory(name=name)
+
+        frames = []
+        if shared is not None:
+            frames = [
+                np.ndarray(shape, np.dtype(dtype), buffer=shared.buf, offset=offset)
+                for offset, shape, dtype in layout
+            ]
+
+        result: Any
+        if kind == MATCH:
+            result = get_face_match(frames[0])
+        elif kind == MATCH_BEST:
+            result = match_best_face(frames)
+        elif kind == ENCODE:
+            result = encode_best_face(frames)
+        elif kind == REGISTER:
+            result = register_faces(argument, frames)
+        else:
+            result = register_embeddings(*argument)
+
+        # Views must be gone before the block can be closed
+        del frames
+        con.send((request_id, result))
+        logger.debug(
+            "<!> face cache: %d hits, %d misses", FACE_CACHE.hits, FACE_CACHE.misses
+        )
+
+    if shared is not None:
+        shared.close()
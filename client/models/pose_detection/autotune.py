@@ -0,0 +1,277 @@
+"""
+Choice of how the pose model runs inference, and a boot-time auto-tuner that picks the fastest
+choice for the device.
+
+Which delegate and thread count is fastest depends on the board: more threads help a Pi 4 but
+can slow a Pi Zero 2 down, and GPU delegates only work on some builds. The auto-tuner times a few
+hundred runs on a sample photo of a seated person with each candidate, and caches the winner under
+a fingerprint of the device, so it only runs on a device's first start. A person has to be in the
+photo, as the pose model skips its landmark stage when the detector finds nobody. Each candidate
+is timed in its own process, so one that crashes MediaPipe rather than raising is only skipped.
+
+MediaPipe is only imported when tuning, so processes that only pass configurations around don't
+load it.
+"""
+
+import json
+import logging
+import os
+import statistics
+import time
+from importlib import resources
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from data.routines import RESOURCES
+
+#: Delegates the pose model can run on. "cpu" is TensorFlow Lite's default kernels, "xnnpack" its
+#: optimised CPU kernels with a configurable thread count.
+DELEGATES = ("cpu", "xnnpack", "gpu")
+#: File tuned configurations are cached in, by device fingerprint.
+AUTOTUNE_CACHE = RESOURCES.joinpath("inference_tuning.json")
+#: Frames timed per configuration.
+AUTOTUNE_FRAMES = 200
+#: Frames run before timing each configuration, so one-off setup isn't counted.
+AUTOTUNE_WARM_UP = 10
+#: Photo of a seated person in models.resources to time the pose model on, downloaded with the
+#: model by deploy.sh.
+AUTOTUNE_SAMPLE = "pose_sample.jpg"
+#: Width and height the sample is resized to, matching the largest frames tracked.
+AUTOTUNE_SAMPLE_SIZE = (320, 240)
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceConfig(NamedTuple):
+    """How the pose model runs inference.
+
+    Attributes:
+        delegate: One of DELEGATES.
+        threads: Threads for the "xnnpack" delegate, or None for its default. Must be None for
+            the others, which don't take a thread count.
+    """
+
+    delegate: str = "cpu"
+    threads: Optional[int] = None
+
+
+def candidate_configs(cpus: Optional[int] = None) -> list[InferenceConfig]:
+    """
+    Args:
+        cpus: Number of CPUs the tracker may run on. Those of this process if None.
+
+    Returns:
+        Configurations worth trying on a device with that many CPUs. Only "xnnpack" is tried
+            with each thread count, as the others don't take one.
+    """
+    if cpus is None:
+        cpus = len(os.sched_getaffinity(0))
+    return (
+        [InferenceConfig("cpu")]
+        + [InferenceConfig("xnnpack", threads) for threads in range(1, cpus + 1)]
+        + [InferenceConfig("gpu")]
+    )
+
+
+def device_fingerprint() -> str:
+    """
+    Returns:
+        The CPU model and number of CPUs this process may use, identifying devices that tune the
+            same way.
+    """
+    model = "unknown"
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            for line in cpuinfo:
+                key, _, value = line.partition(":")
+                # x86 has "model name", Raspberry Pis have "Model"
+                if key.strip() in ("model name", "Model"):
+                    model = value.strip()
+    except OSError:
+        pass
+    return f"{model} x{len(os.sched_getaffinity(0))}"
+
+
+def load_sample() -> np.ndarray:
+    """
+    Returns:
+        The sample photo resized to AUTOTUNE_SAMPLE_SIZE, in the shape HxWxC where (C)hannels are
+            in RGB.
+
+    Raises:
+        FileNotFoundError: The sample hasn't been downloaded.
+    """
+    import cv2
+
+    # Resolved here, as models.resources only exists once deployed
+    path = resources.files("models.resources").joinpath(AUTOTUNE_SAMPLE)
+    frame = cv2.imread(str(path))
+    if frame is None:
+        raise FileNotFoundError(f"No pose tuning sample at {path}")
+    frame = cv2.resize(frame, AUTOTUNE_SAMPLE_SIZE, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+
+def time_config(
+    config: InferenceConfig, frames: Sequence[np.ndarray], count: int
+) -> float:
+    """
+    Args:
+        config: Configuration to time.
+        frames: Frames to run the pose model on, in the shape HxWxC where (C)hannels are in RGB.
+        count: Number of frames to time, cycling through `frames`.
+
+    Returns:
+        Median seconds per frame.
+
+    Raises:
+        RuntimeError: No pose was found in a frame, so only the detector would be timed.
+    """
+    import mediapipe as mp
+
+    from models.pose_detection.routines import create_pose_landmarker
+
+    with create_pose_landmarker(config) as landmarker:
+        images = [
+            mp.Image(image_format=mp.ImageFormat.SRGB, data=frame) for frame in frames
+        ]
+        for i in range(AUTOTUNE_WARM_UP):
+            if not landmarker.detect(images[i % len(images)]).pose_landmarks:
+                raise RuntimeError("No pose found in the tuning frames")
+
+        times = []
+        for i in range(count):
+            start = time.perf_counter()
+            landmarker.detect(images[i % len(images)])
+            times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def autotune(
+    configs: Optional[Sequence[InferenceConfig]] = None,
+    frames: int = AUTOTUNE_FRAMES,
+    timer: Callable[[InferenceConfig, Sequence[np.ndarray], int], float] = time_config,
+) -> InferenceConfig:
+    """Time each configuration on the sample photo, each in its own process.
+
+    Args:
+        configs: Configurations to try. Those from candidate_configs() if None.
+        frames: Number of frames to time each configuration over.
+        timer: Returns the seconds per frame of a configuration, given frames to cycle through
+            and how many to time. Must be picklable, as it runs in a child process.
+
+    Returns:
+        The fastest configuration that works on this device.
+    """
+    sample = [load_sample()]
+
+    best: Optional[tuple[float, InferenceConfig]] = None
+    for config in configs or candidate_configs():
+        try:
+            seconds = _time_in_process(timer, config, sample, frames)
+        except Exception as error:
+            logger.info("Pose inference with %s doesn't work here: %s", config, error)
+            continue
+
+        logger.info("Pose inference with %s: %.1f ms", config, 1000 * seconds)
+        if best is None or seconds < best[0]:
+            best = (seconds, config)
+
+    if best is None:
+        raise RuntimeError("No pose inference configuration works on this device")
+    return best[1]
+
+
+def _time_in_process(
+    timer: Callable[[InferenceConfig, Sequence[np.ndarray], int], float],
+    config: InferenceConfig,
+    frames: Sequence[np.ndarray],
+    count: int,
+) -> float:
+    # Delegates can abort the whole process rather than raise, so time them in a child
+    from models.pose_detection.posture_process import get_context
+
+    context = get_context()
+    parent_con, child_con = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_run_timer, args=(child_con, timer, config, frames, count)
+    )
+    process.start()
+    child_con.close()
+    try:
+        seconds, error = parent_con.recv()
+    except EOFError:
+        process.join()
+        raise RuntimeError(
+            f"Timing process exited with code {process.exitcode}"
+        ) from None
+    finally:
+        parent_con.close()
+    process.join()
+
+    if error is not None:
+        raise RuntimeError(error)
+    return seconds
+
+
+def _run_timer(
+    con: Connection,
+    timer: Callable[[InferenceConfig, Sequence[np.ndarray], int], float],
+    config: InferenceConfig,
+    frames: Sequence[np.ndarray],
+    count: int,
+) -> None:
+    # Errors are sent as text, as MediaPipe's exceptions don't all pickle
+    try:
+        con.send((timer(config, frames, count), None))
+    except Exception as error:
+        con.send((None, f"{type(error).__name__}: {error}"))
+    finally:
+        con.close()
+
+
+def tuned_config(
+    fallback: InferenceConfig = InferenceConfig(),
+    cache: Path = AUTOTUNE_CACHE,
+    frames: int = AUTOTUNE_FRAMES,
+) -> InferenceConfig:
+    """Get the fastest configuration for this device, tuning and caching it if this device hasn't
+    been tuned before.
+
+    Args:
+        fallback: Configuration to use if tuning fails, such as when the sample photo is missing
+            or no configuration works. Nothing is cached then, so the next start tries again.
+        cache: JSON file of tuned configurations by device fingerprint.
+        frames: Number of frames to time each configuration over, if tuning.
+
+    Returns:
+        The fastest configuration, or `fallback` if tuning failed.
+    """
+    fingerprint = device_fingerprint()
+    try:
+        tuned = json.loads(Path(cache).read_text())
+    except (OSError, ValueError):
+        tuned = {}
+
+    if fingerprint in tuned:
+        config = InferenceConfig(**tuned[fingerprint])
+        logger.debug("Using tuned pose inference %s for %s", config, fingerprint)
+        return config
+
+    logger.info("Tuning pose inference for %s", fingerprint)
+    try:
+        config = autotune(frames=frames)
+    except Exception:
+        logger.warning(
+            "<!> Couldn't tune pose inference, using %s", fallback, exc_info=True
+        )
+        return fallback
+    tuned[fingerprint] = config._asdict()
+
+    temporary_path = Path(f"{cache}.tmp")
+    temporary_path.write_text(json.dumps(tuned, indent=4))
+    os.replace(temporary_path, cache)
+    return config
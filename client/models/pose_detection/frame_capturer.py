@@ -1,13 +1,55 @@
 import time
 import os
+import logging
+import threading
+from pathlib import Path
 from abc import ABC, abstractmethod
+from typing import NamedTuple, Optional
 
 import numpy as np
-import cv2
+
+from drivers.camera_demand import (
+    DEFAULT_LEASE,
+    FrameSize,
+    cancel_capture,
+    request_capture,
+)
+from drivers.frame_stream import read_frame, to_rgb
+
+#: Factors JPEGs can be downscaled by while decoding, using libjpeg's DCT-domain scaling.
+DECODE_SCALES = (1, 2, 4, 8)
+#: Seconds to wait for a camera's first frame before giving up.
+FIRST_FRAME_TIMEOUT = 10.0
+#: Seconds to wait before grabbing again after the camera fails to deliver a frame.
+GRAB_RETRY_INTERVAL = 0.1
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureStats(NamedTuple):
+    """How well a capturer is keeping up with its camera.
+
+    Attributes:
+        grabbed: Frames read from the camera.
+        returned: Frames returned by get_frame().
+        dropped: Frames replaced by a newer one before anyone asked for them.
+        mean_age: Mean seconds between a returned frame being grabbed and being returned.
+        max_age: Most seconds between a returned frame being grabbed and being returned.
+    """
+
+    grabbed: int
+    returned: int
+    dropped: int
+    mean_age: float
+    max_age: float
 
 
 class FrameCapturer(ABC):
-    """Provides an interface to video frames for a PostureTracker."""
+    """Provides an interface to video frames for a PostureTracker.
+
+    OpenCV is imported by the capturers that use it, when they are used, so that processes which
+    only pass capturer classes around don't have to load it.
+    """
 
     @abstractmethod
     def get_frame(self) -> tuple[np.ndarray, int]:
@@ -17,33 +59,267 @@ class FrameCapturer(ABC):
                 in RGB format. Timestamp is in milliseconds.
         """
 
+    def get_burst(self, count: int) -> list[tuple[np.ndarray, int]]:
+        """Capture consecutive frames, so the best of them can be used.
+
+        Args:
+            count: Number of frames to capture.
+
+        Returns:
+            Up to `count` (frame, timestamp) pairs, as returned by get_frame().
+        """
+        return [self.get_frame() for _ in range(count)]
+
+    def subscribe(self, name: str, fps: float, size: FrameSize) -> None:
+        """Ask for frames at a rate and size until unsubscribe(). Capturers which don't share a
+        camera with other processes ignore this.
+
+        Args:
+            name: Name of the consumer, unique across processes.
+            fps: Frames per second wanted.
+            size: Frame width and height wanted.
+        """
+
+    def unsubscribe(self, name: str) -> None:
+        """Withdraw a subscribe() request.
+
+        Args:
+            name: Name the request was made under.
+        """
+
+    def stats(self) -> Optional[CaptureStats]:
+        """
+        Returns:
+            Frame delivery statistics since the capturer was created, or None if the capturer
+                doesn't keep them.
+        """
+        return None
+
 
 class OpenCVCapturer(FrameCapturer):
-    """FrameCapturer using OpenCV to read from camera."""
+    """FrameCapturer using OpenCV to read from camera.
 
-    def __init__(self) -> None:
-        self._cam = cv2.VideoCapture(0)
+    A background thread grabs frames as fast as the camera delivers them and keeps only the
+    latest, so the driver's queue never fills with stale frames while inference is slower than
+    the camera. get_frame() returns the latest frame without waiting for the camera, except for
+    the very first frame, so it may return the same frame twice if called faster than the camera
+    runs.
+    """
+
+    def __init__(self, device: int = 0) -> None:
+        """
+        Args:
+            device: Index of the camera to read from.
+        """
+        import cv2
+
+        self._cam = cv2.VideoCapture(device)
+
+        # Double buffer: the grabber retrieves into the back buffer, then swaps it to the front
+        # under the lock, so it never writes to a frame that is being read
+        self._lock = threading.Condition()
+        self._front: Optional[np.ndarray] = None
+        self._back: Optional[np.ndarray] = None
+        self._front_timestamp = 0
+        self._front_grabbed_at = 0.0
+        self._front_returned = True
+
+        self._grabbed = 0
+        self._returned = 0
+        self._dropped = 0
+        self._total_age = 0.0
+        self._max_age = 0.0
+
+        self._stopping = threading.Event()
+        self._grabber = threading.Thread(
+            target=self._grab_forever, name="frame-grabber", daemon=True
+        )
+        self._grabber.start()
 
     def get_frame(self) -> tuple[np.ndarray, int]:
-        _, frame = self._cam.read()
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        timestamp = self._cam.get(cv2.CAP_PROP_POS_MSEC)
-        return frame, int(timestamp)
+        import cv2
+
+        with self._lock:
+            if not self._lock.wait_for(
+                lambda: self._front is not None, FIRST_FRAME_TIMEOUT
+            ):
+                raise TimeoutError("No frames from the camera")
+
+            frame = cv2.cvtColor(self._front, cv2.COLOR_BGR2RGB)
+            age = time.monotonic() - self._front_grabbed_at
+            self._returned += 1
+            self._front_returned = True
+            self._total_age += age
+            self._max_age = max(self._max_age, age)
+            return frame, self._front_timestamp
+
+    def stats(self) -> CaptureStats:
+        with self._lock:
+            return CaptureStats(
+                self._grabbed,
+                self._returned,
+                self._dropped,
+                self._total_age / max(self._returned, 1),
+                self._max_age,
+            )
 
     def release(self) -> None:
-        """Release the camera."""
+        """Stop grabbing frames and release the camera."""
+        self._stopping.set()
+        self._grabber.join()
         self._cam.release()
 
+    def _grab_forever(self) -> None:
+        import cv2
+
+        while not self._stopping.is_set():
+            if not self._cam.grab():
+                logger.debug("<!> Camera didn't deliver a frame")
+                time.sleep(GRAB_RETRY_INTERVAL)
+                continue
+            grabbed_at = time.monotonic()
+
+            # Decoding into the back buffer reuses its memory once it has the right shape
+            success, back = self._cam.retrieve(self._back)
+            if not success:
+                continue
+            timestamp = int(self._cam.get(cv2.CAP_PROP_POS_MSEC))
+
+            with self._lock:
+                self._back, self._front = self._front, back
+                self._front_timestamp = timestamp
+                self._front_grabbed_at = grabbed_at
+                self._grabbed += 1
+                if not self._front_returned:
+                    self._dropped += 1
+                self._front_returned = False
+                self._lock.notify_all()
+
+
+class JpegDecoder:
+    """Decodes JPEG files to RGB, optionally downscaled as part of decoding.
+
+    libjpeg can skip most of the work of decoding when asked for a 1/2, 1/4 or 1/8 size image,
+    which is far cheaper than decoding at full size and resizing. The file is read into a buffer
+    that is reused between frames, and the colour conversion is either done by the decoder (on
+    OpenCV versions that can decode straight to RGB) or in place.
+
+    Attributes:
+        scale: Factor images are downscaled by, one of DECODE_SCALES.
+    """
+
+    def __init__(self, scale: int = 1) -> None:
+        """
+        Args:
+            scale: Factor to downscale images by, one of DECODE_SCALES.
+        """
+        import cv2
+
+        if scale not in DECODE_SCALES:
+            raise ValueError(f"Decode scale must be one of {DECODE_SCALES}")
+        self.scale = scale
+        self._encoded = np.empty(0, dtype=np.uint8)
+
+        self._flags = {
+            1: cv2.IMREAD_COLOR,
+            2: cv2.IMREAD_REDUCED_COLOR_2,
+            4: cv2.IMREAD_REDUCED_COLOR_4,
+            8: cv2.IMREAD_REDUCED_COLOR_8,
+        }[scale]
+        # OpenCV 4.10 and later can decode straight to RGB
+        self._decodes_rgb = hasattr(cv2, "IMREAD_COLOR_RGB")
+        if self._decodes_rgb:
+            self._flags = (self._flags & ~cv2.IMREAD_COLOR) | cv2.IMREAD_COLOR_RGB
+
+    def decode(self, path: str) -> Optional[np.ndarray]:
+        """
+        Args:
+            path: JPEG file to decode.
+
+        Returns:
+            The image in the shape HxWxC where (C)hannels are in RGB, or None if the file is
+                missing, empty or not a valid image.
+        """
+        import cv2
+
+        try:
+            with open(path, "rb") as file:
+                size = os.fstat(file.fileno()).st_size
+                if len(self._encoded) < size:
+                    # Leave room for the next frame to be a little bigger
+                    self._encoded = np.empty(size + size // 4, dtype=np.uint8)
+                read = file.readinto(self._encoded[:size])
+        except FileNotFoundError:
+            return None
+        if read == 0:
+            return None
+
+        image = cv2.imdecode(self._encoded[:read], self._flags)
+        if image is not None and not self._decodes_rgb:
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+        return image
+
 
 class RaspCapturer(FrameCapturer):
     """FrameCapturer using a temp file to read from the camera.
-    File is created using client/drivers/camera_overlord.py"""
+    File is created using client/drivers/camera_overlord.py, as a raw frame in stream mode or a
+    JPEG snapshot in still mode.
+
+    Capture requests are renewed by a background thread for as long as they are subscribed, so
+    the camera keeps running while a consumer waits between frames, such as for a button press.
+    The thread stops once nothing is subscribed.
+    """
+
+    #: File the camera overlord writes snapshots to in still mode.
+    SNAPSHOT_PATH = "/tmp/snapshot.jpg"
+    #: File the camera overlord publishes raw frames to in stream mode.
+    FRAME_PATH = "/tmp/frame.raw"
+    #: Seconds to wait for the camera overlord to write a new snapshot during a burst.
+    NEW_SNAPSHOT_TIMEOUT = 1.0
+    #: Seconds between checks for a new snapshot.
+    NEW_SNAPSHOT_POLL = 0.05
+
+    def __init__(self, decode_scale: int = 1) -> None:
+        """
+        Args:
+            decode_scale: Factor to downscale JPEG snapshots by while decoding them, one of
+                DECODE_SCALES.
+        """
+        self._decoder = JpegDecoder(decode_scale)
+        # Time at which to renew each capture request, with what was requested
+        self._subscriptions: dict[str, tuple[float, float, FrameSize]] = {}
+        self._renewing = threading.Condition()
+        self._renewer: Optional[threading.Thread] = None
+
+    def subscribe(self, name: str, fps: float, size: FrameSize) -> None:
+        with self._renewing:
+            request_capture(name, fps, size)
+            self._subscriptions[name] = (
+                time.monotonic() + DEFAULT_LEASE / 2,
+                fps,
+                size,
+            )
+            if self._renewer is None:
+                self._renewer = threading.Thread(
+                    target=self._renew_subscriptions, name="lease-renewer", daemon=True
+                )
+                self._renewer.start()
+            self._renewing.notify()
+
+    def unsubscribe(self, name: str) -> None:
+        with self._renewing:
+            self._subscriptions.pop(name, None)
+            cancel_capture(name)
+            self._renewing.notify()
 
     def get_frame(self) -> tuple[np.ndarray, int]:
+        if os.path.exists(self.FRAME_PATH):
+            pixels, header = read_frame(self.FRAME_PATH)
+            return to_rgb(pixels, header), header.timestamp // 1_000_000
+
         tries = 0
         while True:
-            array = cv2.imread("/tmp/snapshot.jpg")
-            array = cv2.cvtColor(array, cv2.COLOR_BGR2RGB)
+            array = self._decoder.decode(self.SNAPSHOT_PATH)
             if array is None:
                 tries += 1
                 if tries > 5:
@@ -51,5 +327,72 @@ class RaspCapturer(FrameCapturer):
                 time.sleep(0.05)
             else:
                 tries = 0
-                finfo = os.stat("/tmp/snapshot.jpg")
+                finfo = os.stat(self.SNAPSHOT_PATH)
                 return (array, int(finfo.st_mtime))
+
+    def get_burst(self, count: int) -> list[tuple[np.ndarray, int]]:
+        # The snapshot only changes every so often, so wait for each new one. Give up early
+        # rather than return the same image twice. Frames from before the burst was asked for
+        # are skipped too, as the camera may have been idle and they can be seconds old.
+        burst = []
+        last_modified = time.time_ns()
+        while len(burst) < count:
+            deadline = time.monotonic() + self.NEW_SNAPSHOT_TIMEOUT
+            modified = self._source_modified()
+            while modified <= last_modified:
+                if time.monotonic() > deadline:
+                    return burst
+                time.sleep(self.NEW_SNAPSHOT_POLL)
+                modified = self._source_modified()
+
+            burst.append(self.get_frame())
+            last_modified = modified
+        return burst
+
+    def _source_modified(self) -> int:
+        try:
+            return os.stat(self.FRAME_PATH).st_mtime_ns
+        except FileNotFoundError:
+            return os.stat(self.SNAPSHOT_PATH).st_mtime_ns
+
+    def _renew_subscriptions(self) -> None:
+        # Requests expire unless renewed, in case this process dies without unsubscribing
+        with self._renewing:
+            while self._subscriptions:
+                now = time.monotonic()
+                for name, (renew_at, fps, size) in self._subscriptions.items():
+                    if now >= renew_at:
+                        request_capture(name, fps, size)
+                        self._subscriptions[name] = (now + DEFAULT_LEASE / 2, fps, size)
+
+                next_renewal = min(
+                    renew_at for renew_at, _, _ in self._subscriptions.values()
+                )
+                self._renewing.wait(next_renewal - now)
+            self._renewer = None
+
+
+class SimulatedCapturer(FrameCapturer):
+    """FrameCapturer for running without a camera. Cycles through the JPEG images in
+    SIMULATED_FRAMES_DIR, or returns blank frames if there are none."""
+
+    #: Directory of images to replay.
+    SIMULATED_FRAMES_DIR = Path("/tmp/sim_frames")
+    #: Shape of the blank frame returned when there are no images to replay.
+    BLANK_FRAME_SHAPE = (480, 640, 3)
+
+    def __init__(self) -> None:
+        self._paths = sorted(self.SIMULATED_FRAMES_DIR.glob("*.jpg"))
+        self._index = 0
+
+    def get_frame(self) -> tuple[np.ndarray, int]:
+        timestamp = int(time.time() * 1000)
+        if len(self._paths) == 0:
+            return np.zeros(self.BLANK_FRAME_SHAPE, dtype=np.uint8), timestamp
+
+        import cv2
+
+        path = self._paths[self._index % len(self._paths)]
+        self._index += 1
+        array = cv2.cvtColor(cv2.imread(str(path)), cv2.COLOR_BGR2RGB)
+        return array, timestamp
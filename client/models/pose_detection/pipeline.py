@@ -0,0 +1,270 @@
+"""
+Posture tracking as a pipeline of threads, so the camera, the pose model and the database are
+all kept busy at once.
+
+Frames flow through three stages:
+    capture: Gets (and decodes) frames from the frame capturer, at the rate asked of the camera.
+    inference: Runs the prefilter, pose model and posture algorithm on each frame.
+    aggregation: Adds each verdict to the current period and saves finished periods.
+
+Stages are connected by single-slot queues in which a newer item replaces one that hasn't been
+taken yet, so a slow stage always works on the freshest input rather than a backlog. Each item
+carries the user it was captured for, and items for a user who is no longer tracked are dropped.
+"""
+
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Generic, NamedTuple, Optional, TypeVar
+
+from drivers.clock import SYSTEM_CLOCK, Clock
+from models.pose_detection.posture_process import NO_USER
+
+if TYPE_CHECKING:
+    from models.pose_detection.routines import PostureTracker
+
+#: Seconds the capture stage waits between frames by default.
+CAPTURE_INTERVAL = 0.5
+#: Seconds a stage waits for input before checking whether it should stop.
+POLL_INTERVAL = 0.5
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class LatestSlot(Generic[T]):
+    """Single-slot queue between two threads, in which putting an item replaces any item that
+    hasn't been taken yet.
+
+    Attributes:
+        replaced: Number of items replaced before being taken.
+    """
+
+    def __init__(self) -> None:
+        self.replaced = 0
+        self._item: Optional[T] = None
+        self._full = False
+        self._condition = threading.Condition()
+
+    def put(self, item: T) -> None:
+        """
+        Args:
+            item: Item to hand over, replacing any item not yet taken.
+        """
+        with self._condition:
+            if self._full:
+                self.replaced += 1
+            self._item = item
+            self._full = True
+            self._condition.notify()
+
+    def get(self, timeout: float) -> Optional[T]:
+        """
+        Args:
+            timeout: Seconds to wait for an item.
+
+        Returns:
+            The latest item, or None if none was put within the timeout.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._full, timeout):
+                return None
+            item = self._item
+            self._item = None
+            self._full = False
+            return item
+
+
+class StageStats(NamedTuple):
+    """How busy a pipeline stage has been.
+
+    Attributes:
+        name: Name of the stage.
+        items: Items the stage has finished.
+        dropped: Items the stage produced which were replaced before the next stage took them.
+        busy: Seconds spent working, rather than waiting for input or pacing itself.
+        elapsed: Seconds since the pipeline started.
+    """
+
+    name: str
+    items: int
+    dropped: int
+    busy: float
+    elapsed: float
+
+    @property
+    def utilisation(self) -> float:
+        """Fraction of the time the stage has been working."""
+        return self.busy / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class _Stage:
+    # step() waits for input, processes it and returns the seconds spent processing, or None if
+    # there was no input
+    def __init__(
+        self,
+        name: str,
+        step: Callable[[], Optional[float]],
+        output: Optional[LatestSlot],
+    ) -> None:
+        self.name = name
+        self.step = step
+        self.output = output
+        self.items = 0
+        self.busy = 0.0
+
+
+class PosturePipeline:
+    """Runs a PostureTracker's capture, inference and aggregation on separate threads.
+
+    The tracker's judge() state is only touched by the inference thread and its record() state
+    only by the aggregation thread, except when the tracked user changes, which holds both
+    stages' locks.
+
+    Attributes:
+        capture_interval: Seconds between frames captured. May be changed while running.
+    """
+
+    def __init__(
+        self,
+        tracker: "PostureTracker",
+        capture_interval: float = CAPTURE_INTERVAL,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        """
+        Args:
+            tracker: Tracker to run, with a frame capturer set.
+            capture_interval: Seconds between frames captured.
+            clock: Clock to time the stages with.
+        """
+        if tracker.frame_capturer is None:
+            raise ValueError("Please set a frame capturer before running a pipeline")
+
+        self._tracker = tracker
+        self._clock = clock
+        self.capture_interval = capture_interval
+        self._user_id = NO_USER
+
+        self._frames: LatestSlot[tuple[int, Any]] = LatestSlot()
+        self._verdicts: LatestSlot[tuple[int, tuple[bool, bool]]] = LatestSlot()
+        self._judging = threading.Lock()
+        self._recording = threading.Lock()
+        self._tracking = threading.Event()
+        self._stopping = threading.Event()
+        self._error: Optional[BaseException] = None
+
+        self._stages = [
+            _Stage("capture", self._capture, self._frames),
+            _Stage("inference", self._infer, self._verdicts),
+            _Stage("aggregation", self._aggregate, None),
+        ]
+        self._start_time = self._clock.monotonic()
+        self._threads = [
+            threading.Thread(
+                target=self._run_stage, args=(stage,), name=stage.name, daemon=True
+            )
+            for stage in self._stages
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def track(self, user_id: int) -> None:
+        """Start tracking a user's posture, or stop tracking with NO_USER.
+
+        Args:
+            user_id: The user to associate posture data with in the database.
+        """
+        with self._judging, self._recording:
+            self._user_id = user_id
+            self._tracker.user_id = user_id
+        if user_id == NO_USER:
+            self._tracking.clear()
+        else:
+            self._tracking.set()
+
+    def check(self) -> None:
+        """Raise any error which stopped a stage.
+
+        Raises:
+            RuntimeError: A stage failed, stopping the pipeline.
+        """
+        if self._error is not None:
+            raise RuntimeError("A posture pipeline stage failed") from self._error
+
+    def stop(self) -> None:
+        """Stop every stage, waiting for any work in progress to finish."""
+        self._stopping.set()
+        self._tracking.set()
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self) -> list[StageStats]:
+        """
+        Returns:
+            How busy each stage has been, in pipeline order.
+        """
+        elapsed = self._clock.monotonic() - self._start_time
+        return [
+            StageStats(
+                stage.name,
+                stage.items,
+                stage.output.replaced if stage.output is not None else 0,
+                stage.busy,
+                elapsed,
+            )
+            for stage in self._stages
+        ]
+
+    def _run_stage(self, stage: _Stage) -> None:
+        try:
+            while not self._stopping.is_set():
+                busy = stage.step()
+                if busy is not None:
+                    stage.items += 1
+                    stage.busy += busy
+        except Exception as error:
+            logger.exception("<!> Posture pipeline %s stage failed", stage.name)
+            self._error = error
+            self._stopping.set()
+            self._tracking.set()
+
+    def _capture(self) -> Optional[float]:
+        self._tracking.wait()
+        user_id = self._user_id
+        if user_id == NO_USER or self._stopping.is_set():
+            return None
+
+        start = self._clock.monotonic()
+        frame, _ = self._tracker.frame_capturer.get_frame()
+        self._frames.put((user_id, frame))
+        busy = self._clock.monotonic() - start
+
+        self._stopping.wait(max(0.0, self.capture_interval - busy))
+        return busy
+
+    def _infer(self) -> Optional[float]:
+        item = self._frames.get(POLL_INTERVAL)
+        if item is None:
+            return None
+
+        start = self._clock.monotonic()
+        user_id, frame = item
+        with self._judging:
+            if user_id != self._user_id:
+                return None
+            verdict = self._tracker.judge(frame)
+        self._verdicts.put((user_id, verdict))
+        return self._clock.monotonic() - start
+
+    def _aggregate(self) -> Optional[float]:
+        item = self._verdicts.get(POLL_INTERVAL)
+        if item is None:
+            return None
+
+        start = self._clock.monotonic()
+        user_id, verdict = item
+        with self._recording:
+            if user_id != self._user_id:
+                return None
+            self._tracker.record(*verdict)
+        return self._clock.monotonic() - start
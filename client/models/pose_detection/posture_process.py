@@ -0,0 +1,297 @@
+"""
+Parent-side handles for posture tracking processes.
+
+This module deliberately avoids importing MediaPipe or OpenCV, so the control program can start
+posture tracking without loading the model's libraries into its own address space. The child is
+started with the "forkserver" (or "spawn") start method, so it also doesn't inherit a copy of
+the parent's heap; it imports models.pose_detection.routines itself once it starts.
+
+A PosturePool runs one PostureProcess per camera, for boards watching more than one desk.
+"""
+
+import logging
+import multiprocessing as multp
+import multiprocessing.connection as connection
+import queue
+from typing import Callable, Collection, NamedTuple, Optional, Sequence
+
+from data.routines import Posture
+from drivers.process_tuning import ProcessTuning
+from models.pose_detection.autotune import InferenceConfig
+from models.pose_detection.frame_capturer import FrameCapturer, OpenCVCapturer
+
+NO_USER = -1
+STOP_CHILD = -2
+
+#: Preferred process start methods, in order. Neither copies the parent's memory into the child.
+START_METHODS = ("forkserver", "spawn")
+
+logger = logging.getLogger(__name__)
+
+
+class StreamResult(NamedTuple):
+    """A posture period saved by one of a PosturePool's workers.
+
+    Attributes:
+        stream: Index of the worker's camera stream.
+        posture: The saved period.
+    """
+
+    stream: int
+    posture: Posture
+
+
+class PostureProcess:
+    """Handles starting and managing a new process that runs posture recognition. Data from this
+    process gets written to the sqlite database that can be interfaced with using the data/routines
+    API.
+    """
+
+    def __init__(
+        self,
+        frame_capturer: Callable[[], FrameCapturer] = OpenCVCapturer,
+        block: bool = True,
+        prefilter: bool = True,
+        stream: int = 0,
+        tuning: Optional[ProcessTuning] = None,
+        results: Optional[multp.Queue] = None,
+        inference: InferenceConfig = InferenceConfig(),
+        autotune: bool = False,
+    ) -> None:
+        """Create a new process which loads the MediaPipe Pose model and runs periodic posture
+        tracking. By default, this initializer blocks until the model is loaded.
+
+        WARNING: The default `frame_capturer` is `OpenCVCapturer`, which doesn't work on the
+        Raspberry Pi! Use `RaspCapturer` on the Raspberry Pi instead.
+
+        Args:
+            frame_capturer: Class reference to capturer for child process to construct, or any
+                other picklable callable returning one, such as functools.partial(OpenCVCapturer,
+                device).
+            block: Whether to wait for the model to load. If False, the caller can get on with
+                other work; messages sent in the meantime are handled once the model is loaded.
+            prefilter: Whether to skip landmarking frames that carry no new information, such as
+                frames of an empty chair or of a user who hasn't moved.
+            stream: Index of the camera stream, unique among processes sharing a camera
+                overlord.
+            tuning: CPUs, priority and thread counts for the child process, so it doesn't
+                contend with other processes. The child inherits the parent's if None.
+            results: Queue to put a StreamResult on for every posture period saved.
+            inference: Delegate and thread count to run the pose model with.
+            autotune: Whether to use the fastest delegate and thread count for this device
+                instead of `inference`. The first start on a device times each of them, which
+                delays the model being ready.
+        """
+        context = get_context()
+        self._parent_con, child_con = context.Pipe()
+        self._ready = False
+
+        args = (
+            child_con,
+            frame_capturer,
+            prefilter,
+            stream,
+            tuning,
+            results,
+            inference,
+            autotune,
+        )
+        self._process = context.Process(target=_run_posture, args=args)
+        self._process.start()
+
+        if block:
+            self.wait_until_ready()
+
+    @property
+    def pid(self) -> Optional[int]:
+        """Process id of the child process, or None if it has exited."""
+        if not self._process.is_alive():
+            return None
+        return self._process.pid
+
+    def wait_until_ready(self) -> None:
+        """Block until the child process has loaded the model."""
+        if self._ready:
+            return
+
+        # Blocks until something is recieved from child
+        self._parent_con.recv()
+        self._ready = True
+
+        logger.debug("Done loading model and communicated to parent.")
+
+    def track_user(self, user_id: int) -> None:
+        """Starts tracking posture and writing to database.
+
+        Args:
+            user_id: The user to associate posture data with in the database.
+        """
+        self._parent_con.send(user_id)
+
+    def untrack_user(self) -> None:
+        """Stop tracking posture for the current user if one exists."""
+        self._parent_con.send(NO_USER)
+
+    def stop(self) -> None:
+        """Gracefully end the process."""
+        self._parent_con.send(STOP_CHILD)
+
+
+class PosturePool:
+    """Runs a posture tracking process per camera stream, and tracks users on any of them.
+
+    Each user can be tracked on at most one stream at a time, so assigning a user to a stream
+    moves them off any other. Saved posture periods from every stream are collected on a shared
+    queue, read with results().
+    """
+
+    def __init__(
+        self,
+        frame_capturers: Sequence[Callable[[], FrameCapturer]],
+        cpus: Optional[Sequence[Collection[int]]] = None,
+        block: bool = True,
+        prefilter: bool = True,
+        tuning: Optional[ProcessTuning] = None,
+    ) -> None:
+        """Start a worker process per camera stream. By default, this initializer blocks until
+        every worker has loaded the model.
+
+        Args:
+            frame_capturers: Class reference to the capturer for each stream, or any other
+                picklable callable returning one.
+            cpus: CPUs to pin each stream's worker to. Workers may run on any CPU if None.
+            block: Whether to wait for the models to load.
+            prefilter: Whether to skip landmarking frames that carry no new information.
+            tuning: Priority and thread counts for every worker, and their CPUs unless `cpus` is
+                given.
+        """
+        if cpus is not None and len(cpus) != len(frame_capturers):
+            raise ValueError("Give a set of CPUs for every frame capturer")
+
+        tunings = [tuning] * len(frame_capturers)
+        if cpus is not None:
+            tunings = [
+                (tuning or ProcessTuning())._replace(cpus=frozenset(stream_cpus))
+                for stream_cpus in cpus
+            ]
+
+        self._results = get_context().Queue()
+        self._workers = [
+            PostureProcess(
+                frame_capturer,
+                block=False,
+                prefilter=prefilter,
+                stream=stream,
+                tuning=tunings[stream],
+                results=self._results,
+            )
+            for stream, frame_capturer in enumerate(frame_capturers)
+        ]
+        self._assignments: dict[int, int] = {}
+
+        if block:
+            self.wait_until_ready()
+
+    @property
+    def assignments(self) -> dict[int, int]:
+        """Users currently being tracked, keyed by the stream tracking them."""
+        return dict(self._assignments)
+
+    @property
+    def pids(self) -> list[Optional[int]]:
+        """Process id of each stream's worker, or None if it has exited."""
+        return [worker.pid for worker in self._workers]
+
+    def wait_until_ready(self) -> None:
+        """Block until every worker has loaded the model."""
+        for worker in self._workers:
+            worker.wait_until_ready()
+
+    def assign(self, stream: int, user_id: int) -> None:
+        """Start tracking a user on a stream, in place of anyone it was tracking, and stop
+        tracking them on any other stream.
+
+        Args:
+            stream: Index of the stream.
+            user_id: The user to associate the stream's posture data with.
+        """
+        for other, other_user in list(self._assignments.items()):
+            if other_user == user_id and other != stream:
+                self.unassign(other)
+
+        self._workers[stream].track_user(user_id)
+        self._assignments[stream] = user_id
+        logger.debug("Tracking user %d on stream %d", user_id, stream)
+
+    def unassign(self, stream: int) -> None:
+        """Stop tracking whoever a stream is tracking.
+
+        Args:
+            stream: Index of the stream.
+        """
+        if self._assignments.pop(stream, None) is not None:
+            self._workers[stream].untrack_user()
+
+    def results(self) -> list[StreamResult]:
+        """
+        Returns:
+            Posture periods saved by any stream since the last call, oldest first.
+        """
+        results = []
+        while True:
+            try:
+                results.append(self._results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def stop(self) -> None:
+        """Gracefully end every worker."""
+        for worker in self._workers:
+            worker.stop()
+        self._assignments.clear()
+
+
+def get_context() -> multp.context.BaseContext:
+    """
+    Returns:
+        Multiprocessing context using the first available start method in START_METHODS.
+    """
+    available = multp.get_all_start_methods()
+    for method in START_METHODS:
+        if method in available:
+            return multp.get_context(method)
+    return multp.get_context()
+
+
+def _run_posture(
+    con: connection.Connection,
+    frame_capturer: Callable[[], FrameCapturer],
+    prefilter: bool,
+    stream: int,
+    tuning: Optional[ProcessTuning],
+    results: Optional[multp.Queue],
+    inference: InferenceConfig,
+    autotune: bool,
+) -> None:
+    # Tune before loading the model, so its thread pools are sized for the pinned CPUs
+    if tuning is not None:
+        tuning.apply()
+
+    # Only the child pays for importing MediaPipe
+    from models.pose_detection.routines import run_posture
+
+    on_period = None
+    if results is not None:
+
+        def on_period(posture: Posture) -> None:
+            results.put(StreamResult(stream, posture))
+
+    run_posture(
+        con,
+        frame_capturer,
+        prefilter,
+        stream,
+        on_period,
+        inference=inference,
+        autotune=autotune,
+    )
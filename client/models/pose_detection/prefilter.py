@@ -0,0 +1,185 @@
+"""
+Cheap checks that decide whether a frame is worth running the pose landmarker on.
+
+Most frames at a desk carry no new information: the user hasn't moved since the last frame that
+was landmarked, the chair is empty, or the lights are off. Each frame is shrunk to a tiny
+grayscale thumbnail, which is compared against the last landmarked frame and against a model of
+the empty scene, learnt from frames in which the landmarker found nobody usable. Inference is
+still forced every so often, so a wrong skip can't last long.
+"""
+
+import math
+from enum import Enum
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from drivers.clock import SYSTEM_CLOCK, Clock
+
+#: Width and height frames are shrunk to before being compared.
+THUMBNAIL_SIZE = (64, 48)
+#: Seconds after which a frame is landmarked regardless of the checks.
+FORCE_INTERVAL = 10.0
+#: Mean absolute difference in gray level from the last landmarked frame below which a frame is
+#: considered unchanged.
+MOTION_THRESHOLD = 4.0
+#: Mean absolute difference in gray level from the empty scene below which the chair is
+#: considered empty.
+EMPTY_THRESHOLD = 6.0
+#: Mean gray level below which a frame is too dark for anyone to be seen in it.
+MIN_BRIGHTNESS = 20.0
+#: Variance of the thumbnail's Laplacian below which a frame is too blurred to landmark.
+MIN_SHARPNESS = 20.0
+#: Weight of each new empty frame in the running average of the empty scene.
+BACKGROUND_RATE = 0.1
+
+
+class Decision(Enum):
+    """What to do with a frame."""
+
+    #: Run the pose landmarker on the frame.
+    INFER = 0
+    #: The frame shows nothing new, so reuse the verdict of the last landmarked frame.
+    REUSE = 1
+    #: Nobody can be in the frame, so mark the user as not in frame.
+    NOT_IN_FRAME = 2
+
+
+class PrefilterStats(NamedTuple):
+    """What a Prefilter has decided so far.
+
+    Attributes:
+        frames: Frames checked.
+        inferred: Frames passed on to the pose landmarker.
+        unchanged: Frames skipped as too similar to the last landmarked frame.
+        blurred: Frames skipped as too blurred.
+        empty: Frames skipped as showing the empty scene.
+        dark: Frames skipped as too dark.
+    """
+
+    frames: int
+    inferred: int
+    unchanged: int
+    blurred: int
+    empty: int
+    dark: int
+
+    @property
+    def skip_ratio(self) -> float:
+        """Fraction of frames that skipped the pose landmarker."""
+        return 1 - self.inferred / max(self.frames, 1)
+
+
+class Prefilter:
+    """Decides which frames the pose landmarker needs to see.
+
+    Call check() with each frame, and after landmarking a frame it passed, observe() with whether
+    anyone usable was found in it.
+
+    Attributes:
+        clock: Clock used to time forced inference.
+        force_interval: Seconds after which a frame is landmarked regardless of the checks.
+        motion_threshold: Difference from the last landmarked frame below which a frame is
+            unchanged.
+        empty_threshold: Difference from the empty scene below which the chair is empty.
+        min_brightness: Mean gray level below which a frame is too dark.
+        min_sharpness: Laplacian variance below which a frame is too blurred.
+    """
+
+    def __init__(
+        self,
+        clock: Clock = SYSTEM_CLOCK,
+        force_interval: float = FORCE_INTERVAL,
+        motion_threshold: float = MOTION_THRESHOLD,
+        empty_threshold: float = EMPTY_THRESHOLD,
+        min_brightness: float = MIN_BRIGHTNESS,
+        min_sharpness: float = MIN_SHARPNESS,
+    ) -> None:
+        self.clock = clock
+        self.force_interval = force_interval
+        self.motion_threshold = motion_threshold
+        self.empty_threshold = empty_threshold
+        self.min_brightness = min_brightness
+        self.min_sharpness = min_sharpness
+
+        self._thumbnail: Optional[np.ndarray] = None
+        self._reference: Optional[np.ndarray] = None
+        self._background: Optional[np.ndarray] = None
+        self._last_inference = -math.inf
+        self._counts = dict.fromkeys(PrefilterStats._fields, 0)
+
+    def check(self, frame: np.ndarray) -> Decision:
+        """
+        Args:
+            frame: Frame in the shape HxWxC where (C)hannels are in RGB.
+
+        Returns:
+            What to do with the frame.
+        """
+        thumbnail = cv2.cvtColor(
+            cv2.resize(frame, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA),
+            cv2.COLOR_RGB2GRAY,
+        )
+        self._thumbnail = thumbnail
+        self._counts["frames"] += 1
+
+        now = self.clock.monotonic()
+        if self._reference is None or now - self._last_inference >= self.force_interval:
+            return self._infer(thumbnail, now)
+
+        if thumbnail.mean() < self.min_brightness:
+            return self._skip("dark", Decision.NOT_IN_FRAME)
+        if (
+            self._background is not None
+            and _difference(thumbnail, self._background) < self.empty_threshold
+        ):
+            return self._skip("empty", Decision.NOT_IN_FRAME)
+        if _difference(thumbnail, self._reference) < self.motion_threshold:
+            return self._skip("unchanged", Decision.REUSE)
+        if cv2.Laplacian(thumbnail, cv2.CV_32F).var() < self.min_sharpness:
+            # The user is moving; wait until they settle
+            return self._skip("blurred", Decision.REUSE)
+        return self._infer(thumbnail, now)
+
+    def observe(self, in_frame: bool) -> None:
+        """Learn from the landmarker's verdict on the last frame check() passed.
+
+        Args:
+            in_frame: Whether the landmarker found anyone usable in the frame. Frames without
+                anyone are learnt as the empty scene.
+        """
+        if in_frame or self._thumbnail is None:
+            return
+
+        if self._background is None:
+            self._background = self._thumbnail.astype(np.float32)
+        else:
+            cv2.accumulateWeighted(self._thumbnail, self._background, BACKGROUND_RATE)
+
+    def reset(self) -> None:
+        """Forget the last landmarked frame, so the next frame is landmarked. The empty scene is
+        kept.
+        """
+        self._reference = None
+
+    def stats(self) -> PrefilterStats:
+        """
+        Returns:
+            Counts of the decisions made since the prefilter was created.
+        """
+        return PrefilterStats(**self._counts)
+
+    def _infer(self, thumbnail: np.ndarray, now: float) -> Decision:
+        self._reference = thumbnail
+        self._last_inference = now
+        self._counts["inferred"] += 1
+        return Decision.INFER
+
+    def _skip(self, reason: str, decision: Decision) -> Decision:
+        self._counts[reason] += 1
+        return decision
+
+
+def _difference(thumbnail: np.ndarray, other: np.ndarray) -> float:
+    return float(cv2.absdiff(thumbnail, other.astype(np.uint8)).mean())
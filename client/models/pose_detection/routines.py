@@ -1,16 +1,15 @@
 """Routines that can be integrated into a main control flow."""
 
+import dataclasses
 import statistics
-import time
 import logging
-import multiprocessing as multp
 import multiprocessing.connection as connection
 from importlib import resources
-from typing import Callable, Mapping, Optional, Type
-from datetime import datetime
+from typing import Callable, Mapping, Optional
 
 import cv2
 import mediapipe as mp
+import numpy as np
 from mediapipe.framework import calculator_pb2
 from mediapipe.python._framework_bindings.packet import Packet
 from mediapipe.tasks.python.core.base_options import BaseOptions
@@ -24,64 +23,64 @@ from mediapipe.tasks.python.vision.pose_landmarker import (
 )
 
 from data.routines import Posture, save_posture
+from drivers.clock import SYSTEM_CLOCK, Clock
+from drivers.governor import Governor
+from models.pose_detection.autotune import DELEGATES, InferenceConfig, tuned_config
 from models.pose_detection.landmarking import AnnotatedImage, display_landmarking
 from models.pose_detection.camera import is_camera_aligned
 from models.pose_detection.classification import posture_classify
-from models.pose_detection.frame_capturer import FrameCapturer, OpenCVCapturer
+from models.pose_detection.frame_capturer import FrameCapturer
+from models.pose_detection.pipeline import PosturePipeline
+from models.pose_detection.posture_process import NO_USER, STOP_CHILD
+from models.pose_detection.prefilter import Decision, Prefilter
 
 POSE_LANDMARKER_FILE = resources.files("models.resources").joinpath(
     "pose_landmarker_lite.task"
 )
 
 PERIOD_SECONDS = 5
-NO_USER = -1
-STOP_CHILD = -2
+#: Frames per second requested from the camera while tracking a user, unless the governor
+#: lowers it.
+POSTURE_CAPTURE_FPS = 2
+#: Lowest frames per second the governor may lower posture tracking to.
+MIN_POSTURE_CAPTURE_FPS = 0.25
+#: Frame sizes requested from the camera while tracking a user, largest first. The governor moves
+#: to smaller sizes when the Pi runs hot at the lowest rate. Pose landmarking runs on a 256x256
+#: input, so larger frames only cost time.
+POSTURE_CAPTURE_SIZES = ((320, 240), (256, 192), (192, 144))
+#: Name posture tracking requests camera frames under.
+POSTURE_CONSUMER = "posture"
+#: Seconds between checks that the posture pipeline is still running.
+PIPELINE_CHECK_INTERVAL = 1
+#: Seconds between logs of how busy each stage of the posture pipeline is.
+PIPELINE_STATS_INTERVAL = 60
+#: Seconds between the governor's adjustments of the posture rate.
+GOVERNOR_INTERVAL = 15
 
 logger = logging.getLogger(__name__)
 
 
-class PostureProcess:
-    """Handles starting and managing a new process that runs posture recognition. Data from this
-    process gets written to the sqlite database that can be interfaced with using the data/routines
-    API.
-    """
-
-    def __init__(self, frame_capturer: Type[FrameCapturer] = OpenCVCapturer) -> None:
-        """Create a new process which loads the MediaPipe Pose model and runs periodic posture
-        tracking. This initializer blocks until the model is loaded.
-
-        WARNING: The default `frame_capturer` is `OpenCVCapturer`, which doesn't work on the
-        Raspberry Pi! Use `RaspCapturer` on the Raspberry Pi instead.
-
-        Args:
-            frame_capturer: Class reference to capturer for child process to construct
-        """
-        self._parent_con, child_con = multp.Pipe()
+@dataclasses.dataclass
+class _InferenceBaseOptions(BaseOptions):
+    """BaseOptions which can also run the model on the XNNPACK delegate, with a given number of
+    threads. MediaPipe's Python API only offers "CPU" and "GPU", but its options protobuf has a
+    field for XNNPACK.
 
-        args = (child_con, frame_capturer)
-        self._process = multp.Process(target=_run_posture, args=args)
-        self._process.start()
-
-        # Blocks until something is recieved from child
-        self._parent_con.recv()
-
-        logger.debug("Done loading model and communicated to parent.")
-
-    def track_user(self, user_id: int) -> None:
-        """Starts tracking posture and writing to database.
-
-        Args:
-            user_id: The user to associate posture data with in the database.
-        """
-        self._parent_con.send(user_id)
+    Attributes:
+        xnnpack: Whether to use the XNNPACK delegate.
+        xnnpack_threads: Threads for the XNNPACK delegate, or None for its default.
+    """
 
-    def untrack_user(self) -> None:
-        """Stop tracking posture for the current user if one exists."""
-        self._parent_con.send(NO_USER)
+    xnnpack: bool = False
+    xnnpack_threads: Optional[int] = None
 
-    def stop(self) -> None:
-        """Gracefully end the process."""
-        self._parent_con.send(STOP_CHILD)
+    def to_pb2(self):
+        options = super().to_pb2()
+        if self.xnnpack:
+            options.acceleration.xnnpack.SetInParent()
+            if self.xnnpack_threads is not None:
+                options.acceleration.xnnpack.num_threads = self.xnnpack_threads
+        return options
 
 
 class PostureTracker(PoseLandmarker):
@@ -90,6 +89,9 @@ class PostureTracker(PoseLandmarker):
     Attributes:
         user_id: Id for the user currently being tracked.
         frame_capturer: Captures frames to be tracked by model.
+        clock: Clock used to time and timestamp posture periods.
+        prefilter: Decides which frames are worth landmarking. Every frame is landmarked if None.
+        on_period: Called with each posture period once it is saved, if set.
     """
 
     def __init__(
@@ -100,13 +102,18 @@ class PostureTracker(PoseLandmarker):
     ) -> None:
         super().__init__(graph_config, running_mode, packet_callback)
         self.frame_capturer: Optional[FrameCapturer] = None
+        self.clock: Clock = SYSTEM_CLOCK
+        self.prefilter: Optional[Prefilter] = None
+        self.on_period: Optional[Callable[[Posture], None]] = None
 
         self._user_id = NO_USER
+        # (aligned, good posture) for the last landmarked frame
+        self._last_verdict = (False, False)
 
         self._posture_scores: list[bool] = []
         self._in_frames: list[bool] = []
-        self._start_time = time.time()
-        self._period_start = datetime.now()
+        self._start_time = self.clock.monotonic()
+        self._period_start = self.clock.now()
 
     @property
     def user_id(self) -> int:
@@ -116,6 +123,8 @@ class PostureTracker(PoseLandmarker):
     @user_id.setter
     def user_id(self, user_id: int) -> None:
         self._user_id = user_id
+        if self.prefilter is not None:
+            self.prefilter.reset()
         self._new_period()
 
     def track_posture(self) -> None:
@@ -131,22 +140,57 @@ class PostureTracker(PoseLandmarker):
             return
 
         frame, _ = self.frame_capturer.get_frame()
+        self.record(*self.judge(frame))
+
+    def judge(self, frame: np.ndarray) -> tuple[bool, bool]:
+        """Run the pose model and posture algorithm on a frame, unless the prefilter decides it
+        carries no new information.
+
+        Args:
+            frame: Frame in the shape HxWxC where (C)hannels are in RGB.
+
+        Returns:
+            (aligned, good), whether the user is in frame with the camera aligned, and whether
+                their posture is good.
+        """
+        decision = Decision.INFER
+        if self.prefilter is not None:
+            decision = self.prefilter.check(frame)
+
+        if decision == Decision.REUSE:
+            return self._last_verdict
+        if decision == Decision.NOT_IN_FRAME:
+            return False, False
 
         mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame)
         result = self.detect(mp_image)
 
         aligned = bool(is_camera_aligned(result))
+        good = aligned and bool(posture_classify(result))
+        self._last_verdict = (aligned, good)
+        if self.prefilter is not None:
+            self.prefilter.observe(aligned)
+        return aligned, good
+
+    def record(self, aligned: bool, good: bool) -> None:
+        """Add a verdict from judge() to the current period, saving the period to the database
+        once it is over.
+
+        Args:
+            aligned: Whether the user was in frame with the camera aligned.
+            good: Whether their posture was good.
+        """
         self._in_frames.append(aligned)
         if aligned:
-            self._posture_scores.append(bool(posture_classify(result)))
+            self._posture_scores.append(good)
 
         self._save_period()
 
     def _save_period(self) -> None:
-        if time.time() - self._start_time <= PERIOD_SECONDS:
+        if self.clock.monotonic() - self._start_time <= PERIOD_SECONDS:
             return
 
-        period_end = datetime.now()
+        period_end = self.clock.now()
         posture = Posture(
             id_=None,
             user_id=self.user_id,
@@ -157,12 +201,32 @@ class PostureTracker(PoseLandmarker):
         )
         save_posture(posture)
         self._new_period()
+        if self.on_period is not None:
+            self.on_period(posture)
+
+        stats = self.frame_capturer.stats() if self.frame_capturer else None
+        if stats is not None:
+            logger.debug(
+                "Frames: %d grabbed, %d used, %d dropped; age %.0f ms mean, %.0f ms max",
+                stats.grabbed,
+                stats.returned,
+                stats.dropped,
+                1000 * stats.mean_age,
+                1000 * stats.max_age,
+            )
+        if self.prefilter is not None:
+            prefilter_stats = self.prefilter.stats()
+            logger.debug(
+                "Prefilter skipped %.0f%% of frames: %s",
+                100 * prefilter_stats.skip_ratio,
+                prefilter_stats,
+            )
 
     def _new_period(self) -> None:
         self._posture_scores = []
         self._in_frames = []
-        self._start_time = time.time()
-        self._period_start = datetime.now()
+        self._start_time = self.clock.monotonic()
+        self._period_start = self.clock.now()
 
 
 class DebugPostureTracker(PoseLandmarker):
@@ -204,25 +268,52 @@ class DebugPostureTracker(PoseLandmarker):
         super().__exit__(unused_exc_type, unused_exc_value, unused_traceback)
 
 
-def create_posture_tracker(frame_capturer: FrameCapturer) -> PostureTracker:
+def create_posture_tracker(
+    frame_capturer: FrameCapturer,
+    clock: Clock = SYSTEM_CLOCK,
+    prefilter: Optional[Prefilter] = None,
+    inference: InferenceConfig = InferenceConfig(),
+) -> PostureTracker:
     """Handles config of single image frame input and model loading.
 
     Args:
         frame_capturer: Interface for posture tracker to get frames for to feed into posture model.
+        clock: Clock used to time and timestamp posture periods.
+        prefilter: Decides which frames are worth landmarking. Every frame is landmarked if None.
+        inference: Delegate and thread count to run the pose model with.
 
     Returns:
         Tracker object which acts as context manager.
     """
     options = PoseLandmarkerOptions(
-        base_options=BaseOptions(model_asset_path=POSE_LANDMARKER_FILE),
-        running_mode=RunningMode.IMAGE,
+        base_options=_base_options(inference), running_mode=RunningMode.IMAGE
     )
 
     tracker = PostureTracker.create_from_options(options)
     tracker.frame_capturer = frame_capturer
+    tracker.clock = clock
+    tracker.prefilter = prefilter
+    tracker._new_period()
     return tracker
 
 
+def create_pose_landmarker(
+    inference: InferenceConfig = InferenceConfig(),
+) -> PoseLandmarker:
+    """Load the pose model on its own, for benchmarking.
+
+    Args:
+        inference: Delegate and thread count to run the pose model with.
+
+    Returns:
+        Landmarker for single images, which acts as context manager.
+    """
+    options = PoseLandmarkerOptions(
+        base_options=_base_options(inference), running_mode=RunningMode.IMAGE
+    )
+    return PoseLandmarker.create_from_options(options)
+
+
 def create_debug_posture_tracker() -> DebugPostureTracker:
     """Handles config of livestreamed input and model loading.
 
@@ -243,24 +334,121 @@ def create_debug_posture_tracker() -> DebugPostureTracker:
     return tracker
 
 
-def _run_posture(
-    con: connection.Connection, frame_capturer: Type[FrameCapturer]
+def run_posture(
+    con: connection.Connection,
+    frame_capturer: Callable[[], FrameCapturer],
+    prefilter: bool = True,
+    stream: int = 0,
+    on_period: Optional[Callable[[Posture], None]] = None,
+    governor: Optional[Governor] = None,
+    inference: InferenceConfig = InferenceConfig(),
+    autotune: bool = False,
 ) -> None:
+    """Body of the posture tracking process. Loads the model, tells the parent it is ready, then
+    tracks posture for whichever user the parent last sent until told to stop. Frames are
+    captured, landmarked and recorded by a PosturePipeline, while this thread handles messages
+    and lets the governor adjust the rate and frame size.
+
+    Args:
+        con: Child end of the pipe to the parent PostureProcess.
+        frame_capturer: Class reference to capturer to construct, or other callable returning one.
+        prefilter: Whether to skip landmarking frames that carry no new information.
+        stream: Index of the camera stream, used to request frames under a unique name.
+        on_period: Called with each posture period once it is saved, if set.
+        governor: Sets the rate and frame size tier from the system's temperature and load. One
+            that reads the system is made if None.
+        inference: Delegate and thread count to run the pose model with.
+        autotune: Whether to use the fastest delegate and thread count for this device instead
+            of `inference`. The first start on a device times each of them, which takes a while.
+            `inference` is still used if tuning fails.
+    """
+    if autotune:
+        inference = tuned_config(inference)
+    if governor is None:
+        governor = Governor(
+            POSTURE_CAPTURE_FPS, MIN_POSTURE_CAPTURE_FPS, len(POSTURE_CAPTURE_SIZES)
+        )
+    consumer = POSTURE_CONSUMER if stream == 0 else f"{POSTURE_CONSUMER}-{stream}"
+
     # Instantiate frame capturer in subprocess to avoid pickling errors.
     frame_capturer_obj = frame_capturer()
-    with create_posture_tracker(frame_capturer_obj) as tracker:
+    frame_filter = Prefilter() if prefilter else None
+    with create_posture_tracker(
+        frame_capturer_obj, prefilter=frame_filter, inference=inference
+    ) as tracker:
+        tracker.on_period = on_period
+        pipeline = PosturePipeline(tracker, 1 / governor.fps, tracker.clock)
         con.send(True)
-        while True:
-            # Handle message from parent
-            if con.poll():
-                parent_msg = con.recv()
+        tracking = False
+        next_stats = tracker.clock.monotonic() + PIPELINE_STATS_INTERVAL
+        next_governor = tracker.clock.monotonic() + GOVERNOR_INTERVAL
+        try:
+            while True:
+                pipeline.check()
+                now = tracker.clock.monotonic()
+                if now >= next_stats:
+                    next_stats += PIPELINE_STATS_INTERVAL
+                    for stage in pipeline.stats():
+                        logger.debug(
+                            "%s: %d items, %d dropped, %.0f%% busy",
+                            stage.name,
+                            stage.items,
+                            stage.dropped,
+                            100 * stage.utilisation,
+                        )
+                    logger.debug("Governor: %s", governor.stats())
+
+                if now >= next_governor:
+                    next_governor += GOVERNOR_INTERVAL
+                    previous = (governor.fps, governor.tier)
+                    decision = governor.update()
+                    pipeline.capture_interval = 1 / decision.fps
+                    if tracking and (decision.fps, decision.tier) != previous:
+                        frame_capturer_obj.subscribe(
+                            consumer,
+                            decision.fps,
+                            POSTURE_CAPTURE_SIZES[decision.tier],
+                        )
+
+                # Handle message from parent
+                if not con.poll(PIPELINE_CHECK_INTERVAL):
+                    continue
 
+                parent_msg = con.recv()
                 if parent_msg == STOP_CHILD:
                     break
 
-                tracker.user_id = parent_msg
+                pipeline.track(parent_msg)
+                tracking = parent_msg != NO_USER
+                if tracking:
+                    frame_capturer_obj.subscribe(
+                        consumer, governor.fps, POSTURE_CAPTURE_SIZES[governor.tier]
+                    )
+                else:
+                    frame_capturer_obj.unsubscribe(consumer)
+        finally:
+            pipeline.stop()
+
+    frame_capturer_obj.unsubscribe(consumer)
+
+
+def _base_options(inference: InferenceConfig) -> BaseOptions:
+    if inference.delegate not in DELEGATES:
+        raise ValueError(f"Pose inference delegate must be one of {DELEGATES}")
+    if inference.threads is not None and inference.delegate != "xnnpack":
+        raise ValueError(
+            "Only the xnnpack pose inference delegate takes a thread count"
+        )
 
-            tracker.track_posture()
+    delegate = BaseOptions.Delegate.CPU
+    if inference.delegate == "gpu":
+        delegate = BaseOptions.Delegate.GPU
+    return _InferenceBaseOptions(
+        model_asset_path=POSE_LANDMARKER_FILE,
+        delegate=delegate,
+        xnnpack=inference.delegate == "xnnpack",
+        xnnpack_threads=inference.threads,
+    )
 
 
 def _safe_mean(data: list[bool]) -> float:
@@ -8,19 +8,32 @@ import multiprocessing
 import os
 import signal
 import subprocess
+from pathlib import Path
+
+from drivers.process_tuning import CAMERA, load_tuning
 
 PYTHON_DEFAULT = "python3.10"
 PYTHON_CAMERA = "python3.11"
 
 
-def spawn_camera_overlord():
-    subprocess.run([PYTHON_CAMERA, "client/drivers/camera_overlord.py"])
+def spawn_camera_overlord(camera_mode, tuning):
+    # The camera overlord inherits this process's CPUs, priority and environment
+    if tuning is not None:
+        tuning.apply()
+    subprocess.run(
+        [PYTHON_CAMERA, "client/drivers/camera_overlord.py", "--mode", camera_mode]
+    )
 
 
-def spawn_pi_overlord(no_posture_model):
+def spawn_pi_overlord(no_posture_model, simulate, tuning_path):
     cmd = [PYTHON_DEFAULT, "client/drivers/pi_overlord.py"]
     if no_posture_model:
         cmd.append("--no-posture-model")
+    if simulate:
+        cmd += ["--hardware", "sim"]
+    # The pi overlord tunes itself and its children
+    if tuning_path is not None:
+        cmd += ["--tuning", str(tuning_path)]
     subprocess.run(cmd)
 
 
@@ -28,17 +41,41 @@ def main():
     logger = logging.getLogger(__name__)
     parser = argparse.ArgumentParser()
     parser.add_argument("--no-posture-model", action="store_true")
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="Run on simulated hardware, without the camera overlord.",
+    )
+    parser.add_argument(
+        "--camera-mode",
+        choices=("still", "stream"),
+        default="still",
+        help="Have the camera overlord save JPEG stills, or stream raw frames.",
+    )
+    parser.add_argument(
+        "--tuning",
+        type=Path,
+        help="JSON file of CPU affinity, priority and thread counts for each process. See "
+        "client/drivers/process_tuning.py.",
+    )
     args = parser.parse_args()
     logger.info(args)
 
+    # Load now, so a bad file stops everything before anything starts
+    tuning = {} if args.tuning is None else load_tuning(args.tuning)
+
     # Spawn a new process to run the camera indefinitely
-    camera_overlord = multiprocessing.Process(target=spawn_camera_overlord, args=())
-    logger.info("Starting camera overlord")
-    camera_overlord.start()
+    if not args.simulate:
+        camera_overlord = multiprocessing.Process(
+            target=spawn_camera_overlord, args=(args.camera_mode, tuning.get(CAMERA))
+        )
+        logger.info("Starting camera overlord")
+        camera_overlord.start()
 
     # Spawn a new process to run the Raspberry Pi code
     pi_overlord = multiprocessing.Process(
-        target=spawn_pi_overlord, args=(args.no_posture_model,)
+        target=spawn_pi_overlord,
+        args=(args.no_posture_model, args.simulate, args.tuning),
     )
     logger.info("Starting pi overlord")
     pi_overlord.start()
@@ -48,6 +85,10 @@ def main():
     pi_overlord_exit_code = os.waitstatus_to_exitcode(pi_overlord_wait_status)
     logger.info(f"Reaped pi overlord with exit code {pi_overlord_exit_code}")
 
+    if args.simulate:
+        logger.info("Exiting")
+        return
+
     os.kill(camera_overlord.pid, signal.SIGINT)
     _, camera_overlord_wait_status = os.waitpid(camera_overlord.pid, 0)
     camera_overlord_exit_code = os.waitstatus_to_exitcode(camera_overlord_wait_status)
@@ -2,7 +2,7 @@ import logging
 import pprint
 import argparse
 
-from models.pose_detection.routines import PostureProcess
+from models.pose_detection.posture_process import PostureProcess
 from models.pose_detection.frame_capturer import RaspCapturer, OpenCVCapturer
 from data.routines import destroy_database, init_database, create_user, get_postures
 
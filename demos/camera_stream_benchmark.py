@@ -0,0 +1,103 @@
+"""
+Compare the camera overlord's still and stream modes: the frame rate each reaches, the CPU time
+the camera overlord spends per frame, and how long a consumer takes to read a frame.
+
+Runs against the real camera with `--camera pi`, or against the simulated camera otherwise,
+which is enough to check both modes work end to end and compare the cost of publishing and
+reading frames.
+"""
+
+import argparse
+import logging
+import os
+import time
+
+from drivers import camera_overlord
+from drivers.camera_demand import cancel_capture, request_capture
+from drivers.simulation import SimulatedPicamera2
+from models.pose_detection.frame_capturer import RaspCapturer
+
+#: Name the benchmark requests frames under.
+CONSUMER = "benchmark"
+
+logger = logging.getLogger(__name__)
+
+
+def benchmark(
+    camera, mode: str, frames: int, fps: float, size: tuple[int, int]
+) -> None:
+    """Capture frames in one mode, then read them back as a consumer would.
+
+    Args:
+        camera: Picamera2 or SimulatedPicamera2.
+        mode: camera_overlord.STILL_MODE or camera_overlord.STREAM_MODE.
+        frames: Number of frames to capture and read.
+        fps: Frames per second to request.
+        size: Frame size to request.
+    """
+    # Consumers read whichever file exists, so start from neither
+    for path in (camera_overlord.SNAPSHOT_PATH, RaspCapturer.FRAME_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+    request_capture(CONSUMER, fps, size)
+    start = time.perf_counter()
+    start_cpu = time.process_time()
+    if mode == camera_overlord.STREAM_MODE:
+        camera_overlord.stream_forever(camera, frames)
+    else:
+        camera_overlord.capture_forever(camera, frames)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - start_cpu
+    cancel_capture(CONSUMER)
+
+    capturer = RaspCapturer()
+    start = time.perf_counter()
+    for _ in range(frames):
+        frame, _ = capturer.get_frame()
+    read_time = (time.perf_counter() - start) / frames
+
+    logger.info(
+        "%s %dx%d: %.1f fps, %.1f ms CPU per frame; consumer read %.2f ms for a %s frame",
+        mode,
+        *size,
+        frames / elapsed,
+        1000 * cpu / frames,
+        1000 * read_time,
+        "x".join(str(length) for length in frame.shape),
+    )
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--camera", choices=("sim", "pi"), default="sim")
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=["320x240", "640x480"],
+        help="Frame sizes to request, as WIDTHxHEIGHT.",
+    )
+    args = parser.parse_args()
+
+    if args.camera == "pi":
+        from picamera2 import Picamera2
+
+        camera = Picamera2()
+    else:
+        camera = SimulatedPicamera2()
+    camera.options["quality"] = camera_overlord.JPEG_QUALITY
+
+    for size_text in args.sizes:
+        width, height = (int(length) for length in size_text.split("x"))
+        for mode in (camera_overlord.STILL_MODE, camera_overlord.STREAM_MODE):
+            benchmark(camera, mode, args.frames, args.fps, (width, height))
+            camera.stop()
+
+    camera.close()
+
+
+if __name__ == "__main__":
+    main()
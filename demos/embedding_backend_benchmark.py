@@ -0,0 +1,148 @@
+"""
+Compare face embedding backends by speed, memory and accuracy, to pick the fastest one accurate
+enough for a Pi.
+
+Uses the same directory of labelled photos as face_detection_benchmark.py. Each backend runs in a
+fresh process, so its memory use isn't mixed up with the others'. Every pair of photos where one
+face was found is compared: pairs of the same person further apart than the backend's threshold
+are false rejects, and pairs of different people within it are false accepts.
+"""
+
+import argparse
+import logging
+import resource
+import statistics
+import time
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from face_detection_benchmark import Photo, load_photos
+from models.face_recognition.backends import BACKENDS, create_backend
+from models.pose_detection.posture_process import get_context
+
+logger = logging.getLogger(__name__)
+
+
+class Result(NamedTuple):
+    """Results for one backend.
+
+    Attributes:
+        load_time: Seconds taken to load the backend's models.
+        max_rss_kb: Peak resident set size of the process running the backend.
+        detect_times: Seconds taken to detect faces in each photo.
+        encode_times: Seconds taken to encode each photo with one face found.
+        detected: Number of photos with exactly one face found.
+        false_accepts: Pairs of different people within the threshold.
+        impostor_pairs: Pairs of different people compared.
+        false_rejects: Pairs of the same person outside the threshold.
+        genuine_pairs: Pairs of the same person compared.
+    """
+
+    load_time: float
+    max_rss_kb: int
+    detect_times: list[float]
+    encode_times: list[float]
+    detected: int
+    false_accepts: int
+    impostor_pairs: int
+    false_rejects: int
+    genuine_pairs: int
+
+
+def benchmark(name: str, photos: list[Photo]) -> Result:
+    """Detect and encode every photo with a backend, then compare every pair.
+
+    Args:
+        name: Backend to benchmark.
+        photos: Photos from load_photos().
+
+    Returns:
+        Speed, memory and accuracy of the backend.
+    """
+    backend = create_backend(name)
+    start = time.perf_counter()
+    backend.warm_up()
+    load_time = time.perf_counter() - start
+
+    detect_times = []
+    encode_times = []
+    people = []
+    embeddings = []
+    for photo in photos:
+        start = time.perf_counter()
+        locations = backend.detect(photo.image)
+        detect_times.append(time.perf_counter() - start)
+        if len(locations) != 1:
+            continue
+
+        start = time.perf_counter()
+        embeddings.append(backend.encode(photo.image, locations)[0])
+        encode_times.append(time.perf_counter() - start)
+        people.append(photo.person)
+
+    false_accepts = impostor_pairs = false_rejects = genuine_pairs = 0
+    for index in range(1, len(embeddings)):
+        distances = backend.distances(np.vstack(embeddings[:index]), embeddings[index])
+        for other, distance in enumerate(distances):
+            if people[other] == people[index]:
+                genuine_pairs += 1
+                false_rejects += distance > backend.threshold
+            else:
+                impostor_pairs += 1
+                false_accepts += distance <= backend.threshold
+
+    return Result(
+        load_time,
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        detect_times,
+        encode_times,
+        len(embeddings),
+        false_accepts,
+        impostor_pairs,
+        false_rejects,
+        genuine_pairs,
+    )
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("faces", type=Path, help="Directory of photos per person.")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    args = parser.parse_args()
+
+    photos = load_photos(args.faces)
+    logger.info("Loaded %d photos", len(photos))
+
+    context = get_context()
+    for name in args.backends:
+        with context.Pool(1) as pool:
+            try:
+                result = pool.apply(benchmark, (name, photos))
+            except Exception:
+                logger.exception("%s failed", name)
+                continue
+
+        logger.info(
+            "%s: loaded in %.1f s, peak RSS %.0f MiB; detect %.1f ms, encode %.1f ms; "
+            "one face found in %d/%d; FAR %.2f%% (%d/%d), FRR %.2f%% (%d/%d)",
+            name,
+            result.load_time,
+            result.max_rss_kb / 1024,
+            1000 * statistics.mean(result.detect_times),
+            1000 * statistics.mean(result.encode_times or [0]),
+            result.detected,
+            len(photos),
+            100 * result.false_accepts / max(result.impostor_pairs, 1),
+            result.false_accepts,
+            result.impostor_pairs,
+            100 * result.false_rejects / max(result.genuine_pairs, 1),
+            result.false_rejects,
+            result.genuine_pairs,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark face detection latency against match accuracy for different detection scales and
+models.
+
+Expects a directory of face photos with one subdirectory per person:
+```
+faces/
+├── alice/  1.jpg 2.jpg ...
+└── bob/    1.jpg 2.jpg ...
+```
+For each setting, every person's first photo is registered and the rest are matched against all
+registered people, the same way login works. Photos should be taken with the Pi camera at desk
+distance for the numbers to mean anything.
+"""
+
+import argparse
+import logging
+import statistics
+import time
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from models.face_recognition.backends import FaceRecognitionBackend
+from models.face_recognition.detection import DETECTION_MODEL, detect_faces
+
+#: Detection scales benchmarked by default.
+DEFAULT_SCALES = (1.0, 0.5, 0.25)
+
+logger = logging.getLogger(__name__)
+
+
+class Photo(NamedTuple):
+    """A labelled photo."""
+
+    person: str
+    image: np.ndarray
+
+
+class Result(NamedTuple):
+    """Results for one detection setting.
+
+    Attributes:
+        detect_times: Seconds taken to detect faces in each photo.
+        detected: Number of photos with exactly one face found.
+        correct: Number of non-registration photos matched to the right person.
+        wrong: Number of non-registration photos matched to the wrong person.
+        probes: Number of non-registration photos.
+    """
+
+    detect_times: list[float]
+    detected: int
+    correct: int
+    wrong: int
+    probes: int
+
+
+def load_photos(directory: Path) -> list[Photo]:
+    """
+    Args:
+        directory: Directory with one subdirectory of photos per person.
+
+    Returns:
+        Every photo, in RGB, grouped by person.
+    """
+    photos = []
+    for person in sorted(path for path in directory.iterdir() if path.is_dir()):
+        for path in sorted(person.glob("*.jpg")):
+            image = cv2.cvtColor(cv2.imread(str(path)), cv2.COLOR_BGR2RGB)
+            photos.append(Photo(person.name, image))
+    return photos
+
+
+def benchmark(photos: list[Photo], scale: float, model: str) -> Result:
+    """Detect, encode and match every photo using one detection setting.
+
+    Args:
+        photos: Photos from load_photos().
+        scale: Detection scale.
+        model: Detection model.
+
+    Returns:
+        Latency and accuracy of the setting.
+    """
+    backend = FaceRecognitionBackend()
+    detect_times = []
+    encodings: list[Optional[np.ndarray]] = []
+    for photo in photos:
+        start = time.perf_counter()
+        locations = detect_faces(photo.image, scale=scale, model=model)
+        detect_times.append(time.perf_counter() - start)
+
+        encoding = None
+        if len(locations) == 1:
+            encoding = backend.encode(photo.image, locations)[0]
+        encodings.append(encoding)
+
+    # Register each person's first photo, and match the rest
+    registered: dict[str, Optional[np.ndarray]] = {}
+    correct = wrong = probes = 0
+    for photo, encoding in zip(photos, encodings):
+        if photo.person not in registered:
+            registered[photo.person] = encoding
+            continue
+
+        probes += 1
+        if encoding is None:
+            continue
+
+        people = [person for person, known in registered.items() if known is not None]
+        if len(people) == 0:
+            continue
+        distances = backend.distances(
+            np.vstack([registered[person] for person in people]), encoding
+        )
+        if distances.min() > backend.threshold:
+            continue
+
+        if people[int(distances.argmin())] == photo.person:
+            correct += 1
+        else:
+            wrong += 1
+
+    detected = sum(encoding is not None for encoding in encodings)
+    return Result(detect_times, detected, correct, wrong, probes)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("faces", type=Path, help="Directory of photos per person.")
+    parser.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--models", nargs="+", default=[DETECTION_MODEL])
+    args = parser.parse_args()
+
+    photos = load_photos(args.faces)
+    logger.info("Loaded %d photos", len(photos))
+
+    for model in args.models:
+        for scale in args.scales:
+            result = benchmark(photos, scale, model)
+            times = sorted(result.detect_times)
+            logger.info(
+                "%s x%.2f: detect mean %.1f ms, p95 %.1f ms; one face found in %d/%d; "
+                "matched %d/%d correctly, %d wrongly",
+                model,
+                scale,
+                1000 * statistics.mean(times),
+                1000 * times[int(0.95 * (len(times) - 1))],
+                result.detected,
+                len(photos),
+                result.correct,
+                result.probes,
+                result.wrong,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark FaceIndex against comparing a face with every registered embedding, using synthetic
+embeddings.
+
+Each synthetic user has a random centre and a few embeddings scattered around it, spread so that
+distances between users and between a user's own faces are roughly what dlib's encoder gives.
+Queries are fresh embeddings of random registered users. For each number of users, the mean
+query time of both methods is reported, along with how often the index finds the same closest
+user as the exhaustive search.
+"""
+
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from models.face_recognition.face_index import DEFAULT_PROBES, FaceIndex
+
+#: Numbers of users benchmarked by default.
+DEFAULT_SIZES = (1000, 2000, 5000, 10000)
+#: Length of each embedding.
+DIMENSIONS = 128
+#: Embeddings registered per user.
+EMBEDDINGS_PER_USER = 5
+#: Standard deviation of each component of a user's centre.
+USER_SPREAD = 0.06
+#: Standard deviation of each component of a user's embeddings around their centre.
+FACE_SPREAD = 0.015
+
+logger = logging.getLogger(__name__)
+
+
+def make_users(count: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Args:
+        count: Number of users.
+        rng: Random number generator.
+
+    Returns:
+        Centre of each user's embeddings, in the shape (count, DIMENSIONS).
+    """
+    return rng.normal(0, USER_SPREAD, (count, DIMENSIONS))
+
+
+def make_faces(centres: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Args:
+        centres: Centres of the users to make faces for.
+        count: Number of faces per user.
+        rng: Random number generator.
+
+    Returns:
+        Embeddings in the shape (users, count, DIMENSIONS).
+    """
+    noise = rng.normal(0, FACE_SPREAD, (len(centres), count, DIMENSIONS))
+    return centres[:, np.newaxis, :] + noise
+
+
+def linear_closest(embeddings: np.ndarray, query: np.ndarray) -> int:
+    """
+    Args:
+        embeddings: Every registered embedding, in the shape (users, faces, DIMENSIONS).
+        query: Embedding to look up.
+
+    Returns:
+        Index of the user with the closest embedding.
+    """
+    distances = np.linalg.norm(embeddings - query, axis=2)
+    return int(distances.min(axis=1).argmin())
+
+
+def benchmark(users: int, queries: int, probes: int, seed: int) -> None:
+    """Build an index of synthetic users, then time queries against it and a linear scan.
+
+    Args:
+        users: Number of users to register.
+        queries: Number of faces to look up.
+        probes: Clusters searched per query.
+        seed: Random seed.
+    """
+    rng = np.random.default_rng(seed)
+    centres = make_users(users, rng)
+    embeddings = make_faces(centres, EMBEDDINGS_PER_USER, rng)
+
+    start = time.perf_counter()
+    index = FaceIndex(DIMENSIONS, probes)
+    for user_id, user_embeddings in enumerate(embeddings):
+        index.add(user_id, list(user_embeddings))
+    build_time = time.perf_counter() - start
+
+    targets = rng.integers(0, users, queries)
+    faces = make_faces(centres[targets], 1, rng)[:, 0]
+
+    start = time.perf_counter()
+    linear = [linear_closest(embeddings, face) for face in faces]
+    linear_time = (time.perf_counter() - start) / queries
+
+    start = time.perf_counter()
+    matches = [index.closest(face) for face in faces]
+    index_time = (time.perf_counter() - start) / queries
+
+    agreed = sum(
+        match is not None and match.user_id == expected
+        for match, expected in zip(matches, linear)
+    )
+    logger.info(
+        "%6d users: built in %.2f s; query %.2f ms indexed vs %.2f ms linear (%.1fx); "
+        "same closest user %d/%d",
+        users,
+        build_time,
+        1000 * index_time,
+        1000 * linear_time,
+        linear_time / index_time,
+        agreed,
+        queries,
+    )
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--probes", type=int, default=DEFAULT_PROBES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for users in args.sizes:
+        benchmark(users, args.queries, args.probes, args.seed)
+
+
+if __name__ == "__main__":
+    main()
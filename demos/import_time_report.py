@@ -0,0 +1,126 @@
+"""
+Report how long importing the control program's entry points takes, which imports dominate,
+and which heavy libraries get pulled in.
+
+Each module is imported in a fresh interpreter with `-X importtime`, so results aren't skewed by
+modules this script has already loaded. Run it on the Pi before and after changing imports to
+compare time-to-first-screen and baseline memory.
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+from typing import NamedTuple
+
+#: Modules imported by default: the control program and the posture tracking child.
+DEFAULT_MODULES = ("drivers.pi_overlord", "models.pose_detection.routines")
+#: Libraries that should only be loaded by the process that uses them.
+HEAVY_MODULES = ("cv2", "mediapipe", "face_recognition", "dlib", "google.protobuf")
+
+#: Run after the import under test. Prints the peak RSS, then every heavy module that was loaded.
+_REPORT_CODE = (
+    "import resource, sys; "
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss); "
+    "print(*[m for m in {heavy!r} if m in sys.modules])"
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ImportTime(NamedTuple):
+    """One line of `-X importtime` output. Times are in microseconds."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+class ImportReport(NamedTuple):
+    """Result of importing one module in a fresh interpreter.
+
+    Attributes:
+        module: Module that was imported.
+        times: Import time of every module loaded along the way.
+        heavy: Which of HEAVY_MODULES were loaded.
+        max_rss_kb: Peak resident set size of the interpreter.
+        error: Standard error output if the import failed, otherwise None.
+    """
+
+    module: str
+    times: list[ImportTime]
+    heavy: list[str]
+    max_rss_kb: int
+    error: str | None
+
+
+def measure(module: str) -> ImportReport:
+    """Import a module in a fresh interpreter and measure it.
+
+    Args:
+        module: Dotted name of the module to import.
+
+    Returns:
+        Measurements of the import.
+    """
+    code = f"import {module}; " + _REPORT_CODE.format(heavy=HEAVY_MODULES)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        times.append(ImportTime(name.strip(), int(self_us), int(cumulative_us)))
+
+    if result.returncode != 0:
+        return ImportReport(module, times, [], 0, result.stderr)
+
+    max_rss_kb, heavy = (result.stdout.splitlines() + [""])[:2]
+    return ImportReport(module, times, heavy.split(), int(max_rss_kb), None)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument(
+        "--top", type=int, default=10, help="Number of slowest imports to list."
+    )
+    args = parser.parse_args()
+
+    for module in args.modules:
+        report = measure(module)
+        if report.error is not None:
+            logger.error("Importing %s failed:\n%s", module, report.error.strip())
+            continue
+
+        total = next(t for t in report.times if t.module == module).cumulative_us
+        logger.info(
+            "%s: %.1f ms, %d modules, peak RSS %.1f MiB",
+            module,
+            total / 1000,
+            len(report.times),
+            report.max_rss_kb / 1024,
+        )
+        logger.info("  heavy libraries loaded: %s", ", ".join(report.heavy) or "none")
+
+        slowest = sorted(report.times, key=lambda t: t.self_us, reverse=True)
+        for entry in slowest[: args.top]:
+            logger.info(
+                "  %8.1f ms self %8.1f ms cumulative  %s",
+                entry.self_us / 1000,
+                entry.cumulative_us / 1000,
+                entry.module,
+            )
+
+
+if __name__ == "__main__":
+    main()
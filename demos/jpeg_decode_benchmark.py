@@ -0,0 +1,107 @@
+"""
+Micro-benchmark of decoding camera snapshots: OpenCV's imread followed by a colour conversion,
+against JpegDecoder at 1/1, 1/2 and 1/4 scale.
+
+Reports the mean time per decode and the memory allocated per decode, as traced by tracemalloc.
+Uses the given JPEG, or a synthetic 640x480 one encoded at the camera overlord's quality.
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from models.pose_detection.frame_capturer import JpegDecoder
+
+#: Decode scales benchmarked.
+SCALES = (1, 2, 4)
+#: JPEG quality of the synthetic snapshot, matching the camera overlord's.
+JPEG_QUALITY = 80
+
+logger = logging.getLogger(__name__)
+
+
+def make_snapshot(directory: Path) -> Path:
+    """
+    Args:
+        directory: Directory to write the snapshot to.
+
+    Returns:
+        Path of a synthetic 640x480 JPEG with some texture, so it doesn't compress to nothing.
+    """
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, 640, dtype=np.float32)
+    image = np.empty((480, 640, 3), dtype=np.uint8)
+    for channel in range(3):
+        noise = rng.normal(0, 20, (480, 640))
+        image[:, :, channel] = np.clip(gradient[::-1] if channel else gradient, 0, 255)
+        image[:, :, channel] = np.clip(image[:, :, channel] + noise, 0, 255)
+    path = directory / "snapshot.jpg"
+    cv2.imwrite(str(path), image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    return path
+
+
+def imread_rgb(path: str) -> np.ndarray:
+    """What RaspCapturer used to do: decode at full size, then convert to a new RGB array."""
+    return cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2RGB)
+
+
+def measure(decode: Callable[[str], Optional[np.ndarray]], path: str, runs: int):
+    """
+    Args:
+        decode: Decoder to measure.
+        path: JPEG to decode.
+        runs: Number of timed decodes.
+
+    Returns:
+        (mean seconds per decode, bytes allocated per decode, decoded shape)
+    """
+    # Warm up, so buffers that are reused between frames are already allocated
+    image = decode(path)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        decode(path)
+    elapsed = (time.perf_counter() - start) / runs
+
+    tracemalloc.start()
+    decode(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, image.shape
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--image", type=Path, help="JPEG to decode.")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = str(args.image or make_snapshot(Path(directory)))
+        cv2.setNumThreads(1)
+
+        decoders = {"imread + cvtColor": imread_rgb}
+        for scale in SCALES:
+            decoders[f"JpegDecoder 1/{scale}"] = JpegDecoder(scale).decode
+
+        for name, decode in decoders.items():
+            elapsed, allocated, shape = measure(decode, path, args.runs)
+            logger.info(
+                "%s: %.2f ms, %.0f KiB allocated per frame, %s",
+                name,
+                1000 * elapsed,
+                allocated / 1024,
+                "x".join(str(length) for length in shape),
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark drawing the control messages with PiicoDev's pixel-by-pixel text() against the
+cached text line blit, using the simulated display so no I2C hardware is needed.
+"""
+
+import argparse
+import logging
+import timeit
+
+from drivers.simulation import SimulatedDisplay
+from drivers.text_cache import TextLineCache
+
+LINE_HEIGHT = 15
+LINE_WIDTH = 16
+MESSAGES = [
+    "Left: logout",
+    "ID: 12",
+    "Left: login",
+    "Right: register",
+    "Double press right: reset data",
+]
+
+logger = logging.getLogger(__name__)
+
+
+def draw_uncached(display: SimulatedDisplay, texts: list[str], y: int = 0) -> None:
+    """The previous HardwareComponents.oled_display_texts() path."""
+    for text in texts:
+        chunks = [text[i : i + LINE_WIDTH] for i in range(0, len(text), LINE_WIDTH)]
+        for index, chunk in enumerate(chunks):
+            display.text(chunk, 0, y + index * LINE_HEIGHT, 1)
+        y += len(chunks) * LINE_HEIGHT
+
+
+def draw_cached(
+    display: SimulatedDisplay, cache: TextLineCache, texts: list[str], y: int = 0
+) -> None:
+    for text in texts:
+        y = cache.draw(display, text, 0, y, 1, LINE_WIDTH, LINE_HEIGHT)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--number", type=int, default=200)
+    args = parser.parse_args()
+
+    # Check both paths produce the same pixels, including for lines that straddle pages
+    cache = TextLineCache()
+    for y in range(0, 8):
+        for colour in (1, 0):
+            expected, actual = SimulatedDisplay(), SimulatedDisplay()
+            expected.fill(1 - colour)
+            actual.fill(1 - colour)
+            for text in MESSAGES:
+                chunks = [
+                    text[i : i + LINE_WIDTH] for i in range(0, len(text), LINE_WIDTH)
+                ]
+                for index, chunk in enumerate(chunks):
+                    expected.text(chunk, 3, y + index * LINE_HEIGHT, colour)
+                cache.draw(actual, text, 3, y, colour, LINE_WIDTH, LINE_HEIGHT)
+            if expected.buffer != actual.buffer:
+                raise AssertionError(f"Framebuffers differ at {y=}, {colour=}")
+    logger.info("Cached and uncached framebuffers match")
+
+    uncached_display = SimulatedDisplay()
+    uncached = timeit.timeit(
+        lambda: draw_uncached(uncached_display, MESSAGES), number=args.number
+    )
+    logger.info(
+        "uncached: %.3f ms per refresh, %d I2C commands per refresh",
+        1000 * uncached / args.number,
+        uncached_display.commands // args.number,
+    )
+
+    cache = TextLineCache()
+    cached_display = SimulatedDisplay()
+    cached = timeit.timeit(
+        lambda: draw_cached(cached_display, cache, MESSAGES), number=args.number
+    )
+    logger.info(
+        "cached: %.3f ms per refresh, %d I2C commands per refresh, %d hits, %d misses",
+        1000 * cached / args.number,
+        cached_display.commands // args.number,
+        cache.hits,
+        cache.misses,
+    )
+    logger.info("speedup: %.1fx", uncached / cached)
+
+
+if __name__ == "__main__":
+    main()
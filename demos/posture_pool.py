@@ -0,0 +1,62 @@
+"""
+Track posture on several OpenCV cameras at once, with a PosturePool. Each camera's worker can be
+pinned to its own CPU with --pin.
+"""
+
+import argparse
+import logging
+import os
+from functools import partial
+
+from data.routines import create_user, destroy_database, init_database
+from models.pose_detection.frame_capturer import OpenCVCapturer
+from models.pose_detection.posture_process import PosturePool
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.DEBUG)
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "devices", type=int, nargs="+", help="Indices of the cameras to use."
+    )
+    parser.add_argument(
+        "--pin", action="store_true", help="Pin each camera's worker to its own CPU."
+    )
+    args = parser.parse_args()
+
+    destroy_database()
+    init_database()
+    users = [create_user() for _ in args.devices]
+
+    cpus = None
+    if args.pin:
+        available = sorted(os.sched_getaffinity(0))
+        cpus = [{available[i % len(available)]} for i in range(len(args.devices))]
+    pool = PosturePool(
+        [partial(OpenCVCapturer, device) for device in args.devices], cpus=cpus
+    )
+    logger.debug("Workers %s", pool.pids)
+
+    for stream, user_id in enumerate(users):
+        pool.assign(stream, user_id)
+
+    while True:
+        command = input(
+            "'s <stream> <user>' to reassign, enter for results, q to quit: "
+        )
+        if command == "q":
+            break
+        if command.startswith("s "):
+            _, stream, user_id = command.split()
+            pool.assign(int(stream), int(user_id))
+            logger.debug("Assignments %s", pool.assignments)
+        for result in pool.results():
+            logger.debug("Stream %d: %s", result.stream, result.posture)
+
+    pool.stop()
+
+
+if __name__ == "__main__":
+    main()
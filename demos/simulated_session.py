@@ -0,0 +1,134 @@
+"""
+Run the logged-in user session jobs on simulated hardware and report their cost and
+punctuality. Synthetic posture records stand in for the posture tracking process.
+
+With --virtual-time the session runs against a virtual clock, so an 8 hour soak test takes
+as long as the CPU needs rather than 8 hours. The CPU cost of each session job is reported per
+hour of session time to show any growth over the day. Records are saved to a temporary database,
+so the garden's own users and posture history are left alone.
+"""
+
+import argparse
+import logging
+import random
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+
+import data.routines
+from data.routines import Posture, create_user, init_database, save_posture
+from drivers import pi_overlord
+from drivers.data_structures import ControlledData
+from drivers.hardware_backend import SIMULATED_BACKEND, load_backend
+
+#: Length of each synthetic posture record, matching the posture tracker's period.
+SYNTHETIC_PERIOD = timedelta(seconds=5)
+#: Session time covered by each row of the job cost report.
+REPORT_BUCKET = timedelta(hours=1)
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=float, default=0.05)
+    parser.add_argument("--virtual-time", action="store_true")
+    parser.add_argument("--frame-dir", type=Path)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as database_dir:
+        data.routines.DATABASE_RESOURCE = Path(database_dir, "database.db")
+        init_database()
+        run_session(args.hours, args.virtual_time, args.frame_dir)
+
+
+def run_session(hours: float, virtual_time: bool, frame_dir: Optional[Path]) -> None:
+    """Run the session jobs with a new user, then log their cost and punctuality.
+
+    Args:
+        hours: Session hours to run for.
+        virtual_time: Whether to run against a virtual clock.
+        frame_dir: Folder to save simulated OLED frames in, if any.
+    """
+    user_id = create_user()
+
+    pi_overlord.backend = load_backend(
+        SIMULATED_BACKEND, frame_dir=frame_dir, virtual_time=virtual_time
+    )
+    pi_overlord.hardware = pi_overlord.initialise_hardware()
+    clock = pi_overlord.backend.clock
+    hardware = pi_overlord.hardware
+    user = ControlledData.make_empty(user_id)
+    hardware.initialise_posture_graph(user_id)
+
+    scheduler = pi_overlord.create_session_scheduler(user)
+    period_start = clock.now()
+
+    def save_synthetic_posture() -> None:
+        nonlocal period_start
+        now = clock.now()
+        posture = Posture(
+            None, user_id, random.random(), random.random(), period_start, now
+        )
+        save_posture(posture)
+        period_start = now
+
+    last_cpu_time: dict[str, tuple[int, float]] = {}
+
+    def report() -> None:
+        hour = (clock.now() - session_start) / REPORT_BUCKET
+        for name, stats in scheduler.stats.items():
+            runs, cpu_time = last_cpu_time.get(name, (0, 0.0))
+            if stats.runs > runs:
+                logger.info(
+                    "hour %.0f: %s mean cost %.3f ms over %d runs",
+                    hour,
+                    name,
+                    1000 * (stats.cpu_time - cpu_time) / (stats.runs - runs),
+                    stats.runs - runs,
+                )
+            last_cpu_time[name] = (stats.runs, stats.cpu_time)
+
+    session_start = clock.now()
+    scheduler.add_job(
+        "synthetic_posture", SYNTHETIC_PERIOD.total_seconds(), save_synthetic_posture
+    )
+    scheduler.add_job("report", REPORT_BUCKET.total_seconds(), report)
+    scheduler.add_job("end", timedelta(hours=hours).total_seconds(), scheduler.stop)
+
+    loop_start = time.perf_counter()
+    scheduler.run()
+    elapsed = time.perf_counter() - loop_start
+
+    stats = scheduler.stats
+    wakeups = sum(job.runs for job in stats.values())
+    logger.info(
+        "%.2f session hours in %.1fs wall time, %d job runs",
+        hours,
+        elapsed,
+        wakeups,
+    )
+    for name, job in stats.items():
+        logger.info(
+            "%s: %d runs, mean cost %.3f ms, max %.1f ms, max late %.1f ms, %d overruns",
+            name,
+            job.runs,
+            1000 * job.cpu_time / max(job.runs, 1),
+            1000 * job.max_time,
+            1000 * job.max_lateness,
+            job.overruns,
+        )
+    logger.info(
+        "display: %d frames, %d I2C commands; servo ran %.1fs; %d GPIO calls",
+        hardware.display.frames,
+        hardware.display.commands,
+        hardware.plant_mover.running_time(),
+        len(pi_overlord.backend.gpio.log),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Measure how punctual the UI loop's ticks are while inference keeps every core busy, with and
+without process tuning (see drivers/process_tuning.py).
+
+A Scheduler ticks at UI_TICK in one process while a CPU-bound stand-in for pose inference runs in
+one process per core. Each tick's lateness is measured from its deadline. Three scenarios are
+run: no load, load with default scheduling, and load with the UI pinned to the first CPU and the
+inference processes kept off it at a lower priority.
+"""
+
+import argparse
+import logging
+import math
+import os
+import statistics
+import time
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from drivers.process_tuning import ProcessTuning
+from drivers.scheduler import Scheduler
+from models.pose_detection.posture_process import get_context
+
+#: Seconds between UI loop ticks.
+UI_TICK = 0.05
+#: Side of the square matrices multiplied by the inference stand-in.
+MATRIX_SIZE = 256
+#: Seconds to let the inference processes start before measuring.
+LOAD_WARM_UP = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+class Jitter(NamedTuple):
+    """Lateness of the UI loop's ticks, in seconds.
+
+    Attributes:
+        mean: Mean lateness.
+        p99: 99th percentile lateness.
+        max: Greatest lateness.
+        overruns: Ticks skipped because the loop fell a whole tick behind.
+    """
+
+    mean: float
+    p99: float
+    max: float
+    overruns: int
+
+
+def run_ui_loop(seconds: float, tuning: Optional[ProcessTuning]) -> Jitter:
+    """
+    Args:
+        seconds: How long to tick for.
+        tuning: Tuning to apply to the UI loop's process, if any.
+
+    Returns:
+        Lateness of the ticks.
+    """
+    if tuning is not None:
+        tuning.apply()
+
+    scheduler = Scheduler()
+    start = time.monotonic()
+    lateness = []
+
+    def tick() -> None:
+        elapsed = time.monotonic() - start
+        lateness.append(elapsed - math.floor(elapsed / UI_TICK) * UI_TICK)
+
+    scheduler.add_job("tick", UI_TICK, tick, delay=0)
+    scheduler.add_job("stop", seconds, scheduler.stop)
+    scheduler.run()
+
+    lateness.sort()
+    return Jitter(
+        statistics.mean(lateness),
+        lateness[int(0.99 * (len(lateness) - 1))],
+        lateness[-1],
+        scheduler.stats["tick"].overruns,
+    )
+
+
+def infer_forever(tuning: Optional[ProcessTuning]) -> None:
+    """Keep a CPU busy with matrix multiplications, like a pose model's convolutions.
+
+    Args:
+        tuning: Tuning to apply to the process, if any.
+    """
+    if tuning is not None:
+        tuning.apply()
+
+    rng = np.random.default_rng()
+    a = rng.random((MATRIX_SIZE, MATRIX_SIZE), dtype=np.float32)
+    b = rng.random((MATRIX_SIZE, MATRIX_SIZE), dtype=np.float32)
+    while True:
+        a = np.tanh(a @ b)
+
+
+def measure(
+    seconds: float,
+    workers: int,
+    ui_tuning: Optional[ProcessTuning],
+    inference_tuning: Optional[ProcessTuning],
+) -> Jitter:
+    """
+    Args:
+        seconds: How long to tick for.
+        workers: Number of inference processes to run alongside the UI loop.
+        ui_tuning: Tuning for the UI loop's process.
+        inference_tuning: Tuning for the inference processes.
+
+    Returns:
+        Lateness of the UI loop's ticks.
+    """
+    context = get_context()
+    load = [
+        context.Process(target=infer_forever, args=(inference_tuning,), daemon=True)
+        for _ in range(workers)
+    ]
+    for process in load:
+        process.start()
+    if workers:
+        time.sleep(LOAD_WARM_UP)
+    try:
+        with context.Pool(1) as pool:
+            return pool.apply(run_ui_loop, (seconds, ui_tuning))
+    finally:
+        for process in load:
+            process.terminate()
+            process.join()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=len(os.sched_getaffinity(0)),
+        help="Inference processes to run, one per CPU by default.",
+    )
+    args = parser.parse_args()
+
+    cpus = sorted(os.sched_getaffinity(0))
+    ui_tuning = ProcessTuning(cpus=frozenset(cpus[:1]), nice=0)
+    inference_tuning = ProcessTuning(nice=10, policy="batch")
+    if len(cpus) > 1:
+        inference_tuning = inference_tuning._replace(cpus=frozenset(cpus[1:]))
+    else:
+        logger.warning("Only one CPU, so only priorities can be tuned")
+
+    scenarios = {
+        "idle": (0, None, None),
+        "loaded": (args.workers, None, None),
+        "loaded, tuned": (args.workers, ui_tuning, inference_tuning),
+    }
+    for name, (workers, ui, inference) in scenarios.items():
+        jitter = measure(args.seconds, workers, ui, inference)
+        logger.info(
+            "%s: tick lateness mean %.2f ms, p99 %.2f ms, max %.2f ms; %d overruns",
+            name,
+            1000 * jitter.mean,
+            1000 * jitter.p99,
+            1000 * jitter.max,
+            jitter.overruns,
+        )
+
+
+if __name__ == "__main__":
+    main()
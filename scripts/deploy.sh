@@ -101,7 +101,9 @@ fi
 echo -e "$INFO Downloading Models"
 $SSH_GO "mkdir build/client/models/resources &&
 curl -o build/client/models/resources/pose_landmarker_lite.task \
-https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_lite/float16/latest/pose_landmarker_lite.task"
+https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_lite/float16/latest/pose_landmarker_lite.task &&
+curl -o build/client/models/resources/pose_sample.jpg \
+https://cdn.pixabay.com/photo/2019/03/12/20/39/girl-4051811_960_720.jpg"
 
 echo -e $INFO Installing the package
 $SSH_GO "cd build && pip install -e . && cd .."
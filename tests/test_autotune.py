@@ -0,0 +1,11 @@
+from models.pose_detection import autotune
+from models.pose_detection.autotune import InferenceConfig, tuned_config
+
+
+def test_tuned_config_falls_back_without_sample(tmp_path, monkeypatch):
+    monkeypatch.setattr(autotune, "AUTOTUNE_SAMPLE", "missing.jpg")
+    cache = tmp_path / "inference_tuning.json"
+    fallback = InferenceConfig("xnnpack", 2)
+
+    assert tuned_config(fallback, cache=cache) == fallback
+    assert not cache.exists()
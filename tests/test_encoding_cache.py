@@ -0,0 +1,56 @@
+import numpy as np
+
+from models.face_recognition.encoding_cache import EncodingCache
+
+
+class CountingBackend:
+    name = "counting"
+
+    def __init__(self):
+        self.detections = 0
+
+    def detect(self, frame):
+        self.detections += 1
+        return [(10, 40, 40, 10)]
+
+
+def test_same_frame_hits():
+    cache = EncodingCache()
+    backend = CountingBackend()
+    frame = np.full((480, 640, 3), 100, dtype=np.uint8)
+
+    cache.detect(frame, backend)
+    cache.detect(frame, backend)
+
+    assert backend.detections == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_different_face_misses():
+    cache = EncodingCache()
+    backend = CountingBackend()
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    first = background.copy()
+    first[200:260, 300:350] = 120
+    second = background.copy()
+    second[200:260, 300:350] = 150
+
+    cache.detect(first, backend)
+    cache.detect(second, backend)
+
+    assert backend.detections == 2
+
+
+def test_clear_resets_counters():
+    cache = EncodingCache()
+    backend = CountingBackend()
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    cache.detect(frame, backend)
+    cache.detect(frame, backend)
+
+    cache.clear()
+
+    assert (cache.hits, cache.misses) == (0, 0)
+    cache.detect(frame, backend)
+    assert backend.detections == 2
@@ -0,0 +1,52 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from models.pose_detection.frame_capturer import RaspCapturer
+
+STALE = 0
+FRESH = 200
+
+
+def write_snapshot(path, value):
+    temporary_path = f"{path}.tmp.jpg"
+    cv2.imwrite(temporary_path, np.full((48, 64, 3), value, dtype=np.uint8))
+    os.replace(temporary_path, path)
+
+
+def make_capturer(tmp_path):
+    capturer = RaspCapturer()
+    capturer.SNAPSHOT_PATH = str(tmp_path / "snapshot.jpg")
+    capturer.FRAME_PATH = str(tmp_path / "frame.raw")
+    capturer.NEW_SNAPSHOT_TIMEOUT = 0.5
+    return capturer
+
+
+def write_stale_snapshot(capturer):
+    write_snapshot(capturer.SNAPSHOT_PATH, STALE)
+    ten_seconds_ago = time.time() - 10
+    os.utime(capturer.SNAPSHOT_PATH, (ten_seconds_ago, ten_seconds_ago))
+
+
+def test_burst_skips_frame_from_before_burst(tmp_path):
+    capturer = make_capturer(tmp_path)
+    write_stale_snapshot(capturer)
+    writer = threading.Timer(0.1, write_snapshot, (capturer.SNAPSHOT_PATH, FRESH))
+    writer.start()
+
+    burst = capturer.get_burst(1)
+    writer.join()
+
+    assert len(burst) == 1
+    frame, _ = burst[0]
+    assert abs(int(frame.mean()) - FRESH) < 5
+
+
+def test_burst_is_empty_without_new_frames(tmp_path):
+    capturer = make_capturer(tmp_path)
+    write_stale_snapshot(capturer)
+
+    assert capturer.get_burst(2) == []